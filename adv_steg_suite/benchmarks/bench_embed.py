@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized LSB embedding engine against the original per-sample loop.
+
+Run from the adv_steg_suite directory:
+    python benchmarks/bench_embed.py --sizes 128 256 512 1024
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stego.image_stego import _embed_samples
+
+def legacy_embed(flat_pixels: np.ndarray, data: bytes, lsb_bits: int) -> None:
+    """The original string-of-bits embedding loop, kept for comparison."""
+    data_bits = ''.join(format(byte, '08b') for byte in data)
+    data_index = 0
+    clear_mask = 0xFF ^ ((1 << lsb_bits) - 1)
+    for i in range(len(flat_pixels)):
+        if data_index >= len(data_bits):
+            break
+        current_bits = data_bits[data_index:data_index + lsb_bits].ljust(lsb_bits, '0')
+        flat_pixels[i] = (flat_pixels[i] & clear_mask) | int(current_bits, 2)
+        data_index += lsb_bits
+
+def time_call(func, *args) -> float:
+    """Return the wall-clock seconds taken by a single call."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LSB embedding by image size")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[128, 256, 512, 1024, 2048],
+                        help='Square image edge lengths to test')
+    parser.add_argument('--lsb-bits', type=int, default=2, help='LSB bits per sample (1-4)')
+    parser.add_argument('--fill', type=float, default=0.5, help='Fraction of capacity to fill')
+    parser.add_argument('--legacy-limit', type=int, default=1024,
+                        help='Skip the slow legacy loop above this edge length')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>11} {'payload':>10} {'legacy (s)':>11} {'vector (s)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        capacity = pixels.size * args.lsb_bits // 8 - 4
+        payload = rng.bytes(int(capacity * args.fill))
+        data = struct.pack('>I', len(payload)) + payload
+
+        vector_time = time_call(_embed_samples, pixels.reshape(-1).copy(), data, args.lsb_bits)
+        if size <= args.legacy_limit:
+            legacy_time = time_call(legacy_embed, pixels.reshape(-1).copy(), data, args.lsb_bits)
+            legacy_col = f"{legacy_time:11.3f}"
+            speedup_col = f"{legacy_time / vector_time:7.0f}x"
+        else:
+            legacy_col, speedup_col = f"{'skipped':>11}", f"{'-':>8}"
+        print(f"{size:>5}x{size:<5} {len(payload):>10} {legacy_col} {vector_time:11.4f} {speedup_col}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-buffer and segmented parallel AES-GCM throughput by worker count.
+
+The first row is the single-buffer envelope; the others seal the same data
+as a segmented envelope with the given worker count, and speedups are
+relative to the first row. The key derivation uses a minimal scrypt cost so
+the timings show the cipher rather than the KDF. Speedups need as many
+cores as workers. Run from the adv_steg_suite directory:
+    python benchmarks/bench_encrypt.py --mib 64 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crypto.aes_gcm import PARALLEL_SEGMENT_SIZE, decrypt_bytes, encrypt_bytes
+
+# Cheapest scrypt cost accepted by the envelope
+BENCH_KDF_PARAMS = (2, 1, 1)
+
+def best_of(repeats: int, func, *args, **kwargs) -> float:
+    """Return the fastest wall-clock seconds over several calls."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AES-GCM envelope throughput by worker count")
+    parser.add_argument('--mib', type=float, default=64, help='Payload size in MiB')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Worker counts to test with the segmented format')
+    parser.add_argument('--segment-mib', type=float, default=PARALLEL_SEGMENT_SIZE / 2**20,
+                        help='Segment size in MiB (default: %(default)s)')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per measurement (best is kept)')
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.mib * 2**20))
+    mib = len(payload) / 2**20
+    segment_size = int(args.segment_mib * 2**20)
+
+    print(f"Payload {mib:.0f} MiB, {os.cpu_count()} CPUs, {args.segment_mib:g} MiB segments")
+    print(f"{'workers':>8} {'encrypt MiB/s':>14} {'speedup':>8} {'decrypt MiB/s':>14} {'speedup':>8}")
+    base_encrypt = base_decrypt = None
+    for workers in [None] + args.workers:  # None: the single-buffer envelope
+        options = {'workers': 1} if workers is None else {'workers': workers, 'segment_size': segment_size}
+        encrypted = encrypt_bytes(payload, "benchmark", kdf_params=BENCH_KDF_PARAMS, **options)
+        encrypt_time = best_of(args.repeats, encrypt_bytes, payload, "benchmark",
+                               kdf_params=BENCH_KDF_PARAMS, **options)
+        decrypt_time = best_of(args.repeats, decrypt_bytes, encrypted, "benchmark", workers=options['workers'])
+        base_encrypt = base_encrypt or encrypt_time
+        base_decrypt = base_decrypt or decrypt_time
+        label = 'single' if workers is None else workers
+        print(f"{label:>8} {mib / encrypt_time:14.0f} {base_encrypt / encrypt_time:7.2f}x "
+              f"{mib / decrypt_time:14.0f} {base_decrypt / decrypt_time:7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Report peak memory of the copying and in-place embedding paths on an RGBA carrier.
+
+Peak memory is measured with tracemalloc, which tracks NumPy allocations, and
+excludes the decoded carrier itself. Run from the adv_steg_suite directory:
+    python benchmarks/bench_memory.py --megapixels 24
+"""
+import argparse
+import os
+import struct
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stego.image_stego import _embed_samples, embed_lsb_array
+
+def legacy_path(pixels: np.ndarray, payload: bytes, lsb_bits: int) -> np.ndarray:
+    """The original slice, flatten and reshape sequence (drops alpha)."""
+    rgb = pixels[:, :, :3]
+    flat_pixels = rgb.flatten()
+    _embed_samples(flat_pixels, struct.pack('>I', len(payload)) + payload, lsb_bits)
+    return flat_pixels.reshape(rgb.shape)
+
+def peak_mib(func, *args, **kwargs) -> float:
+    """Peak traced allocation, in MiB, while func runs."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of LSB embedding paths")
+    parser.add_argument('--megapixels', type=float, default=24, help='Carrier size in megapixels')
+    parser.add_argument('--lsb-bits', type=int, default=1, help='LSB bits per sample (1-4)')
+    parser.add_argument('--payload-mib', type=float, default=1, help='Payload size in MiB')
+    args = parser.parse_args()
+
+    side = int((args.megapixels * 1e6) ** 0.5)
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (side, side, 4), dtype=np.uint8)
+    payload = rng.bytes(int(args.payload_mib * 2**20))
+
+    print(f"Carrier {side}x{side} RGBA ({pixels.nbytes / 2**20:.0f} MiB), "
+          f"payload {len(payload) / 2**20:.1f} MiB")
+    print(f"{'path':<28} {'peak (MiB)':>10}")
+    print(f"{'legacy flatten/reshape':<28} {peak_mib(legacy_path, pixels, payload, args.lsb_bits):10.1f}")
+    print(f"{'copy (embed_lsb_array)':<28} {peak_mib(embed_lsb_array, pixels, payload, args.lsb_bits):10.1f}")
+    print(f"{'in place':<28} "
+          f"{peak_mib(embed_lsb_array, pixels, payload, args.lsb_bits, in_place=True):10.1f}")
+
+if __name__ == '__main__':
+    main()
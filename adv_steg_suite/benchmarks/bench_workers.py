@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark striped multi-threaded embedding and extraction by worker count.
+
+Run from the adv_steg_suite directory:
+    python benchmarks/bench_workers.py --megapixels 100 --workers 1 2 4 8 16 32
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stego.image_stego import embed_lsb_array, extract_lsb_array
+
+def best_of(repeats: int, func, *args) -> float:
+    """Return the fastest wall-clock seconds over several calls."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LSB embedding by worker count")
+    parser.add_argument('--megapixels', type=float, default=25, help='Carrier size in megapixels')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Worker counts to test')
+    parser.add_argument('--lsb-bits', type=int, default=2, help='LSB bits per sample (1-4)')
+    parser.add_argument('--fill', type=float, default=0.9, help='Fraction of capacity to fill')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per measurement (best is kept)')
+    args = parser.parse_args()
+
+    side = int((args.megapixels * 1e6) ** 0.5)
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+    payload = rng.bytes(int((pixels.size * args.lsb_bits // 8 - 4) * args.fill))
+    stego = embed_lsb_array(pixels, payload, args.lsb_bits)
+
+    print(f"Carrier {side}x{side} RGB, payload {len(payload) / 2**20:.1f} MiB, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'embed (s)':>10} {'speedup':>8} {'extract (s)':>12} {'speedup':>8}")
+    base_embed = base_extract = None
+    for workers in args.workers:
+        embed_time = best_of(args.repeats, embed_lsb_array, pixels, payload, args.lsb_bits, workers)
+        extract_time = best_of(args.repeats, extract_lsb_array, stego, args.lsb_bits, workers)
+        base_embed = base_embed or embed_time
+        base_extract = base_extract or extract_time
+        print(f"{workers:>8} {embed_time:10.3f} {base_embed / embed_time:7.2f}x "
+              f"{extract_time:12.3f} {base_extract / extract_time:7.2f}x")
+
+if __name__ == '__main__':
+    main()
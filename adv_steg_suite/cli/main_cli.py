@@ -3,7 +3,17 @@ Command-Line Interface (CLI) for the Advanced Steganography Suite.
 Handles user arguments for encoding and decoding operations.
 """
 import argparse
-from stego.advanced_stego import encode_data_into_image, decode_data_from_image
+import sys
+from crypto.aes_gcm import (DECODE_MAX_KDF_COST, SCRYPT_N, SCRYPT_P, SCRYPT_R, calibrate_scrypt,
+                             kdf_cost)
+from stego.advanced_stego import (decode_data_from_image, decode_data_from_jpeg, encode_data_into_image,
+                                  encode_data_into_jpeg)
+from stego.jpeg_stego import is_jpeg
+from stego.scanner import scan_to_jsonl
+
+def _kdf_mib(params: tuple) -> int:
+    """scrypt cost of params in MiB, rounded up, as taken by decode --max-kdf-mb."""
+    return -(-kdf_cost(params) // (1 << 20))
 
 def main():
     """Main CLI entry point. Parses arguments and executes the chosen command."""
@@ -21,12 +31,50 @@ def main():
     encode_parser.add_argument('-f', '--file', help='Binary file to hide (alternative to --data)')
     encode_parser.add_argument('-p', '--password', required=True, help='Password for encryption')
     encode_parser.add_argument('-o', '--output', required=True, help='Path to save the stego image (output.png)')
+    encode_parser.add_argument('-b', '--lsb-bits', type=int, default=1, choices=range(1, 5),
+                               help='LSB bits per sample to embed into (default: 1)')
+    encode_parser.add_argument('--write-profile', choices=('fast', 'balanced', 'smallest'),
+                               default='balanced',
+                               help='PNG compression effort (default: balanced); .bmp, .tif and .npy outputs are uncompressed')
+    encode_parser.add_argument('--scrypt-n', type=int, default=SCRYPT_N,
+                               help=f'scrypt cost, a power of two (default: {SCRYPT_N}); see calibrate-kdf')
+    encode_parser.add_argument('--scrypt-r', type=int, default=SCRYPT_R,
+                               help=f'scrypt block size (default: {SCRYPT_R})')
+    encode_parser.add_argument('--scrypt-p', type=int, default=SCRYPT_P,
+                               help=f'scrypt parallelization (default: {SCRYPT_P})')
 
     # Parser for the 'decode' command
     decode_parser = subparsers.add_parser('decode', help='Decode a secret message from an image')
     decode_parser.add_argument('-s', '--stego', required=True, help='Path to the stego image (stego.png)')
     decode_parser.add_argument('-p', '--password', required=True, help='Password used during encoding')
     decode_parser.add_argument('-o', '--output', help='File to save the decoded output (optional)')
+    decode_parser.add_argument('-b', '--lsb-bits', type=int, choices=range(1, 5), default=1,
+                               help='LSB bits of images encoded without a stego header by older versions '
+                                    '(default: 1)')
+    decode_parser.add_argument('--max-kdf-mb', type=int, default=DECODE_MAX_KDF_COST >> 20,
+                               help='Refuse payloads whose scrypt cost (128 * n * r * p bytes) is above '
+                                    f'this many MiB (default: {DECODE_MAX_KDF_COST >> 20})')
+
+    # Parser for the 'scan' command
+    scan_parser = subparsers.add_parser('scan', help='Analyze every image under a directory (JSON lines)')
+    scan_parser.add_argument('directory', help='Directory tree to scan')
+    scan_parser.add_argument('-o', '--output', help='JSON-lines file to write (default: stdout)')
+    scan_parser.add_argument('--cache', help='Result cache index to reuse, e.g. .stego_scan.sqlite '
+                                             '(default: no cache)')
+    scan_parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: one per core)')
+    scan_parser.add_argument('--reference', help='Directory with the original carriers to compare against')
+
+    # Parser for the 'calibrate-kdf' command
+    calibrate_parser = subparsers.add_parser('calibrate-kdf',
+                                             help='Benchmark scrypt and suggest parameters for this machine')
+    calibrate_parser.add_argument('-t', '--target-ms', type=float, default=500,
+                                  help='Acceptable key derivation time (default: 500; about 20 for interactive use)')
+    calibrate_parser.add_argument('-m', '--max-memory-mb', type=int, default=256,
+                                  help='Memory budget for one derivation in MiB (default: 256)')
+    calibrate_parser.add_argument('--scrypt-r', type=int, default=SCRYPT_R,
+                                  help=f'scrypt block size (default: {SCRYPT_R})')
+    calibrate_parser.add_argument('--scrypt-p', type=int, default=SCRYPT_P,
+                                  help=f'scrypt parallelization (default: {SCRYPT_P})')
 
     args = parser.parse_args()
 
@@ -56,9 +104,18 @@ def main():
             print("Error: You must provide either --data or --file to encode.")
             return
 
-        # Perform the encoding
+        # Perform the encoding; a JPEG carrier written to a JPEG output keeps its DCT coefficients
+        kdf_params = (args.scrypt_n, args.scrypt_r, args.scrypt_p)
+        if kdf_cost(kdf_params) > DECODE_MAX_KDF_COST:
+            print(f"Warning: these scrypt parameters cost {_kdf_mib(kdf_params)} MiB, above the decoder "
+                  f"default; decode with --max-kdf-mb {_kdf_mib(kdf_params)}")
         try:
-            encode_data_into_image(args.carrier, payload, args.password, args.output)
+            if is_jpeg(args.carrier) and is_jpeg(args.output):
+                encode_data_into_jpeg(args.carrier, payload, args.password, args.output,
+                                      kdf_params=kdf_params)
+            else:
+                encode_data_into_image(args.carrier, payload, args.password, args.output, args.lsb_bits,
+                                       write_profile=args.write_profile, kdf_params=kdf_params)
             print(f"Encoding successful. Stego image saved to: {args.output}")
         except Exception as e:
             print(f"Encoding failed: {e}")
@@ -66,9 +123,16 @@ def main():
     # Execute the decode command
     elif args.command == 'decode':
         try:
-            decoded_data = decode_data_from_image(args.stego, args.password)
-            if decoded_data is None:
-                return  # Decryption failed, error already printed
+            max_kdf_cost = args.max_kdf_mb << 20
+            if is_jpeg(args.stego):
+                result = decode_data_from_jpeg(args.stego, args.password, max_kdf_cost)
+            else:
+                result = decode_data_from_image(args.stego, args.password, args.lsb_bits,
+                                                max_kdf_cost=max_kdf_cost)
+            if not result['success']:
+                print(result['error'])
+                return
+            decoded_data = result['data']
 
             # Handle the output (print to screen or save to file)
             if args.output:
@@ -96,5 +160,33 @@ def main():
         except Exception as e:
             print(f"Decoding failed: {e}")
 
+    # Execute the scan command
+    elif args.command == 'scan':
+        output = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            counts = scan_to_jsonl(args.directory, output, args.cache, args.workers, args.reference)
+        finally:
+            if args.output:
+                output.close()
+        print(f"Scanned {counts['scanned']} images ({counts['cached']} cached, {counts['errors']} errors)",
+              file=sys.stderr)
+
+    # Execute the calibrate-kdf command
+    elif args.command == 'calibrate-kdf':
+        try:
+            result = calibrate_scrypt(args.target_ms / 1000, args.max_memory_mb << 20,
+                                      args.scrypt_r, args.scrypt_p)
+        except ValueError as e:
+            print(f"Calibration failed: {e}")
+            return
+        n, r, p = result['params']
+        print(f"Suggested scrypt parameters: n={n} r={r} p={p} "
+              f"({result['seconds'] * 1000:.0f} ms, {result['memory_bytes'] >> 20} MiB)")
+        if not result['within_target']:
+            print("Warning: even the smallest cost tried exceeds the target on this machine")
+        print(f"Use with: encode --scrypt-n {n} --scrypt-r {r} --scrypt-p {p}")
+        if kdf_cost(result['params']) > DECODE_MAX_KDF_COST:
+            print(f"Decode with: decode --max-kdf-mb {_kdf_mib(result['params'])}")
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,36 +1,521 @@
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives import hashes
 from cryptography.exceptions import InvalidTag
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+import hashlib
+import hmac
+import itertools
 import os
+import struct
+import threading
+import time
 
-def derive_key(password: str, salt: bytes = None) -> tuple:
-    """Derives a cryptographic key from a password using Scrypt KDF."""
-    if salt is None:
+# Smallest valid envelope (legacy format): salt (16) + nonce (12) + GCM tag (16)
+MIN_ENVELOPE_SIZE = 16 + 12 + 16
+
+# Versioned envelope: [magic (4)][version (1)][mode (1)][KDF fields (4)][mode fields][nonce (12)][ciphertext]
+# Everything before the nonce is authenticated as associated data.
+ENVELOPE_MAGIC = b'AGCM'
+ENVELOPE_VERSION = 1
+MODE_PASSWORD = 0  # [salt (16)]: one scrypt per item
+MODE_SESSION = 1   # [master salt (16)][item salt (16)]: one scrypt per batch, HKDF per item
+MODE_STREAM = 2    # [salt (16)][nonce prefix (7)][segment size (4)]: chunked, see encrypt_stream
+MODE_SEGMENTED = 3  # [salt (16)][nonce prefix (8)][segment size (4)][segment count (4)]: parallel
+_ENVELOPE_PREFIX = struct.Struct('>4sBB')
+_MODE_FIELDS_SIZE = {MODE_PASSWORD: 16, MODE_SESSION: 32, MODE_STREAM: 27, MODE_SEGMENTED: 32}
+
+# KDF fields: [KDF id (1)][log2 n (1)][r (1)][p (1)]
+KDF_SCRYPT = 1
+_KDF_FIELDS = struct.Struct('>BBBB')
+
+# Plaintext bytes per segment of a streaming envelope
+STREAM_SEGMENT_SIZE = 1 << 16
+_STREAM_MAX_SEGMENT_SIZE = 1 << 24
+_STREAM_MAX_SEGMENTS = 1 << 32
+
+# Plaintext bytes per independently sealed segment of a segmented envelope
+PARALLEL_SEGMENT_SIZE = 1 << 20
+
+# Scrypt cost for new envelopes; see calibrate_scrypt for tuning
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+# The legacy format (no magic) always used this cost
+_LEGACY_KDF_PARAMS = (2**14, 8, 1)
+
+# Largest scrypt cost an envelope may ask the decoder for: 128 * n * r bytes
+# of memory, and p sequential passes
+KDF_MAX_MEMORY = 1 << 30
+KDF_MAX_P = 16
+
+# Default decoder budget on the scrypt cost an envelope may ask for, see
+# kdf_cost: the default memory budget of calibrate_scrypt with p = 1.
+# Envelopes above it are rejected before any key derivation runs.
+DECODE_MAX_KDF_COST = 1 << 28
+
+# Opt-in in-memory cache of derived keys, see enable_key_cache. Entries are
+# looked up by an HMAC under a per-process secret, so the cache never holds
+# passwords or plain hashes of them.
+_key_cache = OrderedDict()
+_key_cache_config = {'enabled': False, 'max_entries': 0, 'ttl': 0.0}
+_key_cache_stats = {'hits': 0, 'misses': 0}
+_key_cache_lock = threading.Lock()
+_key_cache_secret = os.urandom(32)
+
+def enable_key_cache(max_entries: int = 64, ttl: float = 300.0) -> None:
+    """Keeps up to max_entries derived keys in memory for ttl seconds (LRU)."""
+    if max_entries < 1 or ttl <= 0:
+        raise ValueError("max_entries and ttl must be positive")
+    with _key_cache_lock:
+        _key_cache_config.update(enabled=True, max_entries=max_entries, ttl=ttl)
+        while len(_key_cache) > max_entries:
+            _key_cache.popitem(last=False)
+
+def disable_key_cache() -> None:
+    """Turns the key cache off and purges it."""
+    with _key_cache_lock:
+        _key_cache_config['enabled'] = False
+    purge_key_cache()
+
+def purge_key_cache() -> None:
+    """Drops every cached key and resets the hit/miss counters."""
+    with _key_cache_lock:
+        _key_cache.clear()
+        _key_cache_stats.update(hits=0, misses=0)
+
+def key_cache_info() -> dict:
+    """Returns whether the key cache is on, its size and hit/miss counts."""
+    with _key_cache_lock:
+        _sweep_key_cache(time.monotonic())
+        return dict(_key_cache_config, size=len(_key_cache), **_key_cache_stats)
+
+def _sweep_key_cache(now: float) -> None:
+    """Drops expired keys; the caller holds _key_cache_lock."""
+    for cache_id in [cache_id for cache_id, (_, expires) in _key_cache.items() if expires <= now]:
+        del _key_cache[cache_id]
+
+def _key_cache_id(password: bytes, salt: bytes, params: tuple) -> bytes:
+    """HMAC of the length-prefixed password, salt and KDF parameters."""
+    message = struct.pack('>I', len(password)) + password + salt + struct.pack('>III', *params)
+    return hmac.new(_key_cache_secret, message, hashlib.sha256).digest()
+
+def _kdf_params(params: tuple) -> tuple:
+    """Validates scrypt (n, r, p), or returns the defaults for None."""
+    if params is None:
+        return SCRYPT_N, SCRYPT_R, SCRYPT_P
+    n, r, p = params
+    if n < 2 or n & (n - 1):
+        raise ValueError("scrypt n must be a power of two of at least 2")
+    if not 1 <= r <= 255 or not 1 <= p <= KDF_MAX_P:
+        raise ValueError(f"scrypt r must be between 1 and 255 and p between 1 and {KDF_MAX_P}")
+    if 128 * n * r > KDF_MAX_MEMORY:
+        raise ValueError(f"scrypt parameters need {128 * n * r >> 20} MiB, "
+                         f"more than the {KDF_MAX_MEMORY >> 20} MiB limit")
+    return n, r, p
+
+def kdf_cost(params: tuple) -> int:
+    """Cost of scrypt (n, r, p) in bytes: 128 * n * r of memory, for each of p passes."""
+    n, r, p = params
+    return 128 * n * r * p
+
+def check_kdf_budget(params: tuple, max_cost: int = None) -> None:
+    """Rejects scrypt params costing more than max_cost bytes (None for DECODE_MAX_KDF_COST)."""
+    max_cost = max_cost or DECODE_MAX_KDF_COST
+    if kdf_cost(params) > max_cost:
+        n, r, p = params
+        raise ValueError(f"Envelope asks for scrypt n={n} r={r} p={p} ({kdf_cost(params) >> 20} MiB), "
+                         f"above the decoder limit of {max_cost >> 20} MiB")
+
+def _kdf_fields(params: tuple) -> bytes:
+    """Serializes scrypt parameters into the envelope's KDF fields."""
+    n, r, p = params
+    return _KDF_FIELDS.pack(KDF_SCRYPT, n.bit_length() - 1, r, p)
+
+def _envelope_header(mode: int, params: tuple, fields: bytes) -> bytes:
+    """Header of a new envelope: prefix, KDF fields and mode fields."""
+    return _ENVELOPE_PREFIX.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, mode) + _kdf_fields(params) + fields
+
+def _parse_header(data: bytes) -> tuple:
+    """Returns (mode, scrypt params, header size) of a versioned envelope."""
+    _, version, mode = _ENVELOPE_PREFIX.unpack_from(data)
+    if version != ENVELOPE_VERSION or mode not in _MODE_FIELDS_SIZE:
+        raise ValueError(f"Unsupported envelope version {version} or mode {mode}")
+    kdf_id, log_n, r, p = _KDF_FIELDS.unpack_from(data, _ENVELOPE_PREFIX.size)
+    if kdf_id != KDF_SCRYPT:
+        raise ValueError(f"Unsupported KDF id {kdf_id}")
+    params = _kdf_params((1 << log_n, r, p))
+    return mode, params, _ENVELOPE_PREFIX.size + _KDF_FIELDS.size + _MODE_FIELDS_SIZE[mode]
+
+def derive_key(password: str, salt: bytes = None, params: tuple = None) -> tuple:
+    """
+    Derives a cryptographic key from a password using Scrypt KDF (params is (n, r, p)).
+    
+    Keys for a freshly generated salt (salt=None) can never be looked up
+    again by a decoder before the envelope exists, so they bypass the cache.
+    """
+    fresh_salt = salt is None
+    if fresh_salt:
         salt = os.urandom(16)
-    kdf = Scrypt(salt=salt, length=32, n=2**14, r=8, p=1)
+    params = _kdf_params(params)
+    cache_id = None
+    if _key_cache_config['enabled'] and not fresh_salt:
+        cache_id = _key_cache_id(password.encode(), salt, params)
+        with _key_cache_lock:
+            _sweep_key_cache(time.monotonic())
+            entry = _key_cache.get(cache_id)
+            if entry is not None:
+                _key_cache.move_to_end(cache_id)
+                _key_cache_stats['hits'] += 1
+                return entry[0], salt
+            _key_cache_stats['misses'] += 1
+    
+    kdf = Scrypt(salt=salt, length=32, n=params[0], r=params[1], p=params[2])
     key = kdf.derive(password.encode())
+    
+    if cache_id is not None:
+        with _key_cache_lock:
+            if _key_cache_config['enabled']:
+                _key_cache[cache_id] = (key, time.monotonic() + _key_cache_config['ttl'])
+                while len(_key_cache) > _key_cache_config['max_entries']:
+                    _key_cache.popitem(last=False)
     return key, salt
 
-def encrypt_bytes(data: bytes, password: str) -> bytes:
-    """Encrypts data using AES-GCM. Returns ciphertext, nonce, and salt."""
-    key, salt = derive_key(password)
-    aesgcm = AESGCM(key)
+def _item_key(master_key: bytes, item_salt: bytes) -> bytes:
+    """Derives a per-item key from a session master key with HKDF-SHA256."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=item_salt,
+                info=b'stego-aes-gcm item key').derive(master_key)
+
+def _seal(key: bytes, header: bytes, data: bytes) -> bytes:
+    """Encrypts data under key, authenticating the envelope header."""
     nonce = os.urandom(12)
-    ciphertext = aesgcm.encrypt(nonce, data, None)
-    # Pack the output: [salt (16)][nonce (12)][ciphertext]
-    return salt + nonce + ciphertext
-
-def decrypt_bytes(encrypted_data: bytes, password: str) -> bytes:
-    """Decrypts data encrypted with encrypt_bytes."""
-    # Unpack the input: [salt (16)][nonce (12)][ciphertext (rest)]
-    salt = encrypted_data[:16]
-    nonce = encrypted_data[16:28]
-    ciphertext = encrypted_data[28:]
-    
-    key, _ = derive_key(password, salt)
-    aesgcm = AESGCM(key)
+    return header + nonce + AESGCM(key).encrypt(nonce, data, header)
+
+class SessionKey:
+    """
+    A master key derived once with scrypt, for encrypting many items under one password.
+    
+    Each item gets a fresh random salt and its own HKDF-derived key, so a
+    batch pays for one scrypt run instead of one per item.
+    """
+    
+    def __init__(self, password: str, salt: bytes = None, kdf_params: tuple = None):
+        self.kdf_params = _kdf_params(kdf_params)
+        self.master_key, self.salt = derive_key(password, salt, self.kdf_params)
+    
+    def subkey(self, info: bytes) -> bytes:
+        """Derives a 32-byte key for another purpose than encryption with HKDF-SHA256."""
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=self.salt,
+                    info=info).derive(self.master_key)
+    
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypts data into a session-mode envelope."""
+        item_salt = os.urandom(16)
+        header = _envelope_header(MODE_SESSION, self.kdf_params, self.salt + item_salt)
+        return _seal(_item_key(self.master_key, item_salt), header, data)
+    
+    def decrypt(self, encrypted_data: bytes) -> bytes:
+        """Decrypts an envelope, reusing the master key when it was made with this session."""
+        return _decrypt(encrypted_data, None, self)
+
+def encrypt_bytes(data: bytes, password: str, session: SessionKey = None,
+                  kdf_params: tuple = None, workers: int = 1, segment_size: int = None) -> bytes:
+    """
+    Encrypts data using AES-GCM into a versioned envelope (session mode if a session is given).
+    
+    With segment_size set (e.g. PARALLEL_SEGMENT_SIZE), data is sealed as a
+    segmented envelope of independently authenticated segments, on a pool
+    of workers threads (None for all cores). workers alone never changes
+    the envelope format.
+    """
+    if segment_size is not None and not 1 <= segment_size <= _STREAM_MAX_SEGMENT_SIZE:
+        raise ValueError(f"segment_size must be between 1 and {_STREAM_MAX_SEGMENT_SIZE}")
+    if session is not None:
+        if segment_size is not None:
+            raise ValueError("Session envelopes cannot be segmented")
+        return session.encrypt(data)
+    kdf_params = _kdf_params(kdf_params)
+    key, salt = derive_key(password, None, kdf_params)
+    if segment_size is not None:
+        return _seal_segments(key, kdf_params, salt, data, segment_size, workers)
+    header = _envelope_header(MODE_PASSWORD, kdf_params, salt)
+    return _seal(key, header, data)
+
+def decrypt_bytes(encrypted_data: bytes, password: str, session: SessionKey = None,
+                  workers: int = 1, max_kdf_cost: int = None) -> bytes:
+    """
+    Decrypts data encrypted with encrypt_bytes, in the versioned or the legacy format.
+    
+    Envelopes whose scrypt parameters cost more than max_kdf_cost bytes
+    (see kdf_cost; default DECODE_MAX_KDF_COST) are rejected before the
+    key derivation runs.
+    """
+    return _decrypt(encrypted_data, password, session, workers, max_kdf_cost)
+
+def _decrypt(encrypted_data: bytes, password: str, session: SessionKey, workers: int = 1,
+             max_kdf_cost: int = None) -> bytes:
+    """Parses an envelope, derives its key and decrypts it."""
+    if len(encrypted_data) < MIN_ENVELOPE_SIZE:
+        # Too short to hold a tag; don't spend a key derivation on it
+        raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+    
+    if encrypted_data[:4] != ENVELOPE_MAGIC:
+        # Legacy format: [salt (16)][nonce (12)][ciphertext (rest)], no associated data
+        if password is None:
+            raise ValueError("Legacy envelopes need the password")
+        check_kdf_budget(_LEGACY_KDF_PARAMS, max_kdf_cost)
+        key, _ = derive_key(password, encrypted_data[:16], _LEGACY_KDF_PARAMS)
+        return _open(key, encrypted_data[16:28], encrypted_data[28:], None)
+    
+    mode, params, header_size = _parse_header(encrypted_data)
+    if mode == MODE_STREAM:
+        if password is None:
+            raise ValueError("Streaming envelopes need the password")
+        return b''.join(decrypt_stream((encrypted_data,), password, max_kdf_cost))
+    if mode == MODE_SEGMENTED:
+        if password is None:
+            raise ValueError("Segmented envelopes need the password")
+        offset = header_size - _MODE_FIELDS_SIZE[mode]
+        salt = encrypted_data[offset:offset + 16]
+        check_kdf_budget(params, max_kdf_cost)
+        key, _ = derive_key(password, salt, params)
+        return _open_segments(key, encrypted_data, header_size, workers)
+    if len(encrypted_data) < header_size + 12 + 16:
+        raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+    header = encrypted_data[:header_size]
+    salt = header[header_size - _MODE_FIELDS_SIZE[mode]:][:16]
+    
+    if mode == MODE_PASSWORD:
+        if password is None:
+            raise ValueError("Password-mode envelopes need the password")
+        check_kdf_budget(params, max_kdf_cost)
+        key, _ = derive_key(password, salt, params)
+    else:
+        if session is not None and session.salt == salt and session.kdf_params == params:
+            master_key = session.master_key
+        elif password is not None:
+            check_kdf_budget(params, max_kdf_cost)
+            master_key, _ = derive_key(password, salt, params)
+        else:
+            raise ValueError("Envelope was encrypted under a different session")
+        key = _item_key(master_key, header[-16:])
+    return _open(key, encrypted_data[header_size:header_size + 12],
+                 encrypted_data[header_size + 12:], header)
+
+def _open(key: bytes, nonce: bytes, ciphertext: bytes, associated_data: bytes) -> bytes:
+    """AES-GCM decryption with a uniform error for wrong keys and tampering."""
     try:
-        decrypted_data = aesgcm.decrypt(nonce, ciphertext, None)
-        return decrypted_data
+        return AESGCM(key).decrypt(nonce, ciphertext, associated_data)
     except InvalidTag:
-        raise ValueError("Decryption failed. Incorrect password or corrupted data.")
\ No newline at end of file
+        raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+
+def envelope_size(data_size: int, session: bool = False, segment_size: int = None) -> int:
+    """Size of the envelope encrypt_bytes writes for data_size plaintext bytes."""
+    prefix_size = _ENVELOPE_PREFIX.size + _KDF_FIELDS.size
+    if segment_size is not None:
+        segments = max(1, -(-data_size // segment_size))
+        return prefix_size + _MODE_FIELDS_SIZE[MODE_SEGMENTED] + data_size + segments * 16
+    mode = MODE_SESSION if session else MODE_PASSWORD
+    return prefix_size + _MODE_FIELDS_SIZE[mode] + 12 + data_size + 16
+
+def stream_envelope_size(data_size: int, segment_size: int = STREAM_SEGMENT_SIZE) -> int:
+    """Size of the streaming envelope encrypt_stream writes for data_size plaintext bytes."""
+    segments = max(1, -(-data_size // segment_size))
+    header_size = _ENVELOPE_PREFIX.size + _KDF_FIELDS.size + _MODE_FIELDS_SIZE[MODE_STREAM]
+    return header_size + data_size + segments * 16
+
+def _segment_nonce(nonce_prefix: bytes, counter: int, last: bool) -> bytes:
+    """STREAM nonce: [prefix (7)][segment counter (4)][last-segment flag (1)]."""
+    if counter >= _STREAM_MAX_SEGMENTS:
+        raise ValueError("Stream has too many segments; use a larger segment size")
+    return nonce_prefix + struct.pack('>IB', counter, last)
+
+def encrypt_stream(chunks: Iterable[bytes], password: str, segment_size: int = STREAM_SEGMENT_SIZE,
+                   kdf_params: tuple = None) -> Iterator[bytes]:
+    """
+    Encrypts an iterable of plaintext chunks into a streaming envelope, segment by segment.
+    
+    Segments of segment_size bytes are sealed under a counter nonce, and the
+    final (possibly short or empty) segment carries a last-segment flag, so
+    dropped, reordered or truncated segments fail to authenticate. Memory use
+    is bounded by the segment and chunk sizes, not the payload size.
+    
+    Yields:
+        The envelope header, then one sealed segment (plaintext + 16-byte tag) at a time
+    """
+    if not 1 <= segment_size <= _STREAM_MAX_SEGMENT_SIZE:
+        raise ValueError(f"segment_size must be between 1 and {_STREAM_MAX_SEGMENT_SIZE}")
+    kdf_params = _kdf_params(kdf_params)
+    key, salt = derive_key(password, None, kdf_params)
+    nonce_prefix = os.urandom(7)
+    header = _envelope_header(MODE_STREAM, kdf_params, salt + nonce_prefix + struct.pack('>I', segment_size))
+    yield header
+    
+    aead = AESGCM(key)
+    buffer = bytearray()
+    counter = 0
+    for chunk in chunks:
+        buffer += chunk
+        # Hold back a full segment until more data shows it is not the last
+        start = 0
+        while len(buffer) - start > segment_size:
+            yield aead.encrypt(_segment_nonce(nonce_prefix, counter, False),
+                               buffer[start:start + segment_size], header)
+            start += segment_size
+            counter += 1
+        del buffer[:start]
+    yield aead.encrypt(_segment_nonce(nonce_prefix, counter, True), bytes(buffer), header)
+
+def decrypt_stream(chunks: Iterable[bytes], password: str,
+                   max_kdf_cost: int = None) -> Iterator[bytes]:
+    """
+    Decrypts a streaming envelope from an iterable of chunks of any size.
+    
+    Each segment is yielded as soon as it authenticates. A truncated,
+    reordered or extended stream raises ValueError when the damage is
+    reached, so the output must not be trusted until the iterator finishes.
+    Scrypt costs above max_kdf_cost are rejected as in decrypt_bytes.
+    
+    Yields:
+        Plaintext segments
+    """
+    chunks = iter(chunks)
+    buffer = bytearray()
+    
+    def fill(size: int) -> None:
+        while len(buffer) < size:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+            buffer.extend(chunk)
+    
+    fill(_ENVELOPE_PREFIX.size)
+    if buffer[:4] != ENVELOPE_MAGIC:
+        raise ValueError("Not a streaming envelope")
+    fill(_ENVELOPE_PREFIX.size + _KDF_FIELDS.size)
+    mode, params, header_size = _parse_header(buffer)
+    if mode != MODE_STREAM:
+        raise ValueError("Not a streaming envelope")
+    fill(header_size)
+    header = bytes(buffer[:header_size])
+    fields = header[header_size - _MODE_FIELDS_SIZE[MODE_STREAM]:]
+    salt, nonce_prefix = fields[:16], fields[16:23]
+    segment_size = struct.unpack('>I', fields[23:])[0]
+    if not 1 <= segment_size <= _STREAM_MAX_SEGMENT_SIZE:
+        raise ValueError(f"Unsupported stream segment size {segment_size}")
+    check_kdf_budget(params, max_kdf_cost)
+    key, _ = derive_key(password, salt, params)
+    del buffer[:header_size]
+    
+    sealed_size = segment_size + 16
+    counter = 0
+    for chunk in itertools.chain((b'',), chunks):  # Start with what the header read left over
+        buffer += chunk
+        start = 0
+        while len(buffer) - start > sealed_size:
+            yield _open(key, _segment_nonce(nonce_prefix, counter, False),
+                        bytes(buffer[start:start + sealed_size]), header)
+            start += sealed_size
+            counter += 1
+        del buffer[:start]
+    # Only the final segment may be short; it must also carry the last flag
+    if len(buffer) > sealed_size:
+        raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+    yield _open(key, _segment_nonce(nonce_prefix, counter, True), bytes(buffer), header)
+
+def _segment_associated_data(header: bytes, index: int) -> bytes:
+    """Associated data of one segment: the header (which holds the count) and the index."""
+    return header + struct.pack('>I', index)
+
+def _seal_segments(key: bytes, kdf_params: tuple, salt: bytes, data: bytes,
+                   segment_size: int, workers: int) -> bytes:
+    """
+    Seals data as independently authenticated segments on a thread pool.
+    
+    Segment i uses nonce [prefix (8)][i (4)], so no nonce repeats under the
+    key, and its index and the segment count are authenticated with it;
+    reordered, dropped or duplicated segments fail to decrypt.
+    """
+    count = max(1, -(-len(data) // segment_size))
+    if count >= _STREAM_MAX_SEGMENTS:
+        raise ValueError("Too many segments; use a larger segment size")
+    nonce_prefix = os.urandom(8)
+    header = _envelope_header(MODE_SEGMENTED, kdf_params,
+                              salt + nonce_prefix + struct.pack('>II', segment_size, count))
+    aead = AESGCM(key)
+    view = memoryview(data)
+    
+    def seal(index: int) -> bytes:
+        return aead.encrypt(nonce_prefix + struct.pack('>I', index),
+                            view[index * segment_size:(index + 1) * segment_size],
+                            _segment_associated_data(header, index))
+    
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return b''.join(itertools.chain((header,), pool.map(seal, range(count))))
+
+def _open_segments(key: bytes, encrypted_data: bytes, header_size: int, workers: int) -> bytes:
+    """Decrypts a segmented envelope on a thread pool."""
+    header = encrypted_data[:header_size]
+    fields = header[header_size - _MODE_FIELDS_SIZE[MODE_SEGMENTED]:]
+    nonce_prefix = fields[16:24]
+    segment_size, count = struct.unpack('>II', fields[24:])
+    sealed_size = segment_size + 16
+    body = memoryview(encrypted_data)[header_size:]
+    if segment_size < 1 or count < 1 or -(-len(body) // sealed_size) != count:
+        raise ValueError("Decryption failed. Incorrect password or corrupted data.")
+    
+    def open_segment(index: int) -> bytes:
+        return _open(key, nonce_prefix + struct.pack('>I', index),
+                     body[index * sealed_size:(index + 1) * sealed_size],
+                     _segment_associated_data(header, index))
+    
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return b''.join(pool.map(open_segment, range(count)))
+
+def _time_scrypt(params: tuple) -> float:
+    """Seconds one scrypt derivation takes with params (best of three when fast)."""
+    timings = []
+    while not timings or (len(timings) < 3 and timings[0] < 0.05):
+        started = time.perf_counter()
+        Scrypt(salt=bytes(16), length=32, n=params[0], r=params[1], p=params[2]).derive(b'calibration')
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def calibrate_scrypt(target_seconds: float, max_memory: int = 1 << 28, r: int = 8, p: int = 1) -> dict:
+    """
+    Benchmarks scrypt on this machine and suggests n for a latency and memory budget.
+    
+    n is doubled from 2^10 while the derivation stays within target_seconds
+    and 128 * n * r bytes within max_memory, e.g. about 0.02 s for
+    interactive use or 0.5 s for archives.
+    
+    Args:
+        target_seconds: Longest acceptable key derivation
+        max_memory: Memory budget in bytes (capped at KDF_MAX_MEMORY)
+        r: scrypt block size
+        p: scrypt parallelization
+    
+    Returns:
+        Dictionary with the suggested 'params' (n, r, p), their 'memory_bytes',
+        the measured 'seconds' and whether they are 'within_target'
+    """
+    if target_seconds <= 0:
+        raise ValueError("target_seconds must be positive")
+    params = _kdf_params((1 << 10, r, p))
+    seconds = _time_scrypt(params)
+    memory_limit = min(max_memory, KDF_MAX_MEMORY)
+    while 256 * params[0] * r <= memory_limit and 2 * seconds <= target_seconds:
+        doubled = (params[0] * 2, r, p)
+        doubled_seconds = _time_scrypt(doubled)
+        if doubled_seconds > target_seconds:
+            break
+        params, seconds = doubled, doubled_seconds
+    
+    return {
+        'params': params,
+        'memory_bytes': 128 * params[0] * r,
+        'seconds': seconds,
+        'target_seconds': target_seconds,
+        'within_target': seconds <= target_seconds and 128 * params[0] * r <= memory_limit,
+    }
@@ -6,13 +6,14 @@ from flask import Flask, render_template_string, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import sys
-import tempfile
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from crypto.aes_gcm import encrypt_bytes, decrypt_bytes
-    from stego.advanced_stego import encode_data_into_image, decode_data_from_image
+    from crypto.aes_gcm import SCRYPT_N, SCRYPT_P, SCRYPT_R, encrypt_bytes, decrypt_bytes, kdf_cost
+    from stego.advanced_stego import (encode_data_to_bytes, decode_data_from_bytes,
+                                      encode_data_into_jpeg, decode_data_from_jpeg)
+    from stego.jpeg_stego import is_jpeg
     print("Steg modules imported successfully")
 except ImportError as e:
     print(f"Import error: {e}")
@@ -25,6 +26,9 @@ OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web_outpu
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 print(f"Output directory: {OUTPUT_DIR}")
 
+# Uploads may not ask for a costlier scrypt than the app itself encodes with
+MAX_KDF_COST = kdf_cost((SCRYPT_N, SCRYPT_R, SCRYPT_P))
+
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
 <html lang="en">
@@ -310,11 +314,11 @@ button.btn-download:hover {
     <p>Hide your message securely within an image.</p>
     <div class="form-group">
       <label for="encodeImage">Carrier Image</label>
-      <div class="upload-area" id="encodeUpload" tabindex="0" aria-label="Upload carrier image (PNG or BMP)">
+      <div class="upload-area" id="encodeUpload" tabindex="0" aria-label="Upload carrier image (PNG, BMP or JPEG)">
         <i class="fas fa-cloud-upload-alt"></i>
         <p>Drag & drop your image here or click to browse</p>
-        <small>Supports PNG, BMP formats • Max 10MB</small>
-        <input type="file" accept=".png,.bmp" id="encodeImage" aria-describedby="encodeImageDesc" />
+        <small>Supports PNG, BMP, JPEG formats • Max 10MB</small>
+        <input type="file" accept=".png,.bmp,.jpg,.jpeg" id="encodeImage" aria-describedby="encodeImageDesc" />
       </div>
       <div id="encodePreview" class="image-preview" aria-live="polite"></div>
     </div>
@@ -332,7 +336,7 @@ button.btn-download:hover {
     <div class="form-group">
       <label for="outputFilename">Output Filename</label>
       <input type="text" id="outputFilename" placeholder="secure_image" />
-      <small>Will be saved as: <span id="filenamePreview">secure_image.png</span></small>
+      <small>Will be saved as: <span id="filenamePreview">secure_image.png</span> (.jpg for JPEG carriers)</small>
     </div>
 
     <button class="btn-primary" id="encodeBtn"><i class="fas fa-lock"></i> Encode Message</button>
@@ -357,11 +361,11 @@ button.btn-download:hover {
     <p>Extract hidden messages from steganographic images.</p>
     <div class="form-group">
       <label for="decodeImage">Stego Image</label>
-      <div class="upload-area" id="decodeUpload" tabindex="0" aria-label="Upload stego image (PNG or BMP)">
+      <div class="upload-area" id="decodeUpload" tabindex="0" aria-label="Upload stego image (PNG, BMP or JPEG)">
         <i class="fas fa-cloud-upload-alt"></i>
         <p>Drag & drop stego image here or click to browse</p>
-        <small>Supports PNG, BMP formats with hidden data</small>
-        <input type="file" accept=".png,.bmp" id="decodeImage" />
+        <small>Supports PNG, BMP, JPEG formats with hidden data</small>
+        <input type="file" accept=".png,.bmp,.jpg,.jpeg" id="decodeImage" />
       </div>
       <div id="decodePreview" class="image-preview" aria-live="polite"></div>
     </div>
@@ -677,26 +681,33 @@ def encode():
         image_file = request.files['image']
         message = request.form['message']
         password = request.form['password']
+        # JPEG carriers are embedded in their DCT coefficients and stay JPEG
+        jpeg_carrier = is_jpeg(image_file.filename or '')
+        extension = '.jpg' if jpeg_carrier else '.png'
         filename = request.form.get('filename', 'secure_image').strip()
-        if not filename.lower().endswith('.png'):
-            filename += '.png'
+        if not filename.lower().endswith(extension):
+            filename += extension
 
         filename = ''.join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-        filename = filename.replace(' ', '_') + '.png'
+        filename = filename.replace(' ', '_') + extension
         output_path = os.path.join(OUTPUT_DIR, filename)
 
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as input_tmp:
-            image_file.save(input_tmp.name)
-            input_path = input_tmp.name
-
-        result = encode_data_into_image(
-            input_path, message.encode(), password, output_path,
-            lsb_bits=2, use_compression=True
-        )
-        os.unlink(input_path)
+        if jpeg_carrier:
+            result = encode_data_into_jpeg(image_file.stream, message.encode(), password, output_path)
+        else:
+            result = encode_data_to_bytes(
+                image_file.stream, message.encode(), password,
+                lsb_bits=2, use_compression=True
+            )
 
         if result['success']:
-            encrypted_size = os.path.getsize(output_path)
+            if jpeg_carrier:
+                encrypted_size = os.path.getsize(output_path)
+            else:
+                stego_image = result['stego_image']
+                with open(output_path, 'wb') as f:
+                    f.write(stego_image)
+                encrypted_size = len(stego_image)
             return jsonify({
                 'success': True,
                 'filename': filename,
@@ -718,12 +729,12 @@ def decode():
         image_file = request.files['image']
         password = request.form['password']
 
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            image_file.save(tmp.name)
-            input_path = tmp.name
-
-        result = decode_data_from_image(input_path, password, 2)
-        os.unlink(input_path)
+        if is_jpeg(image_file.filename or ''):
+            result = decode_data_from_jpeg(image_file.stream, password, max_kdf_cost=MAX_KDF_COST)
+        else:
+            # expected_lsb_bits covers images this app wrote before the stego header existed
+            result = decode_data_from_bytes(image_file.stream, password, expected_lsb_bits=2,
+                                            max_kdf_cost=MAX_KDF_COST)
 
         if result['success']:
             return jsonify({'success': True, 'message': result['data'].decode('utf-8')})
@@ -737,7 +748,7 @@ def list_files():
     try:
         files = []
         for filename in os.listdir(OUTPUT_DIR):
-            if filename.endswith('.png'):
+            if filename.endswith(('.png', '.jpg')):
                 fp = os.path.join(OUTPUT_DIR, filename)
                 size = os.path.getsize(fp)
                 files.append({'name': filename, 'size': f"{size/1024:.1f} KB"})
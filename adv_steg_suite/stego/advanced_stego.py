@@ -1,35 +1,146 @@
-from crypto.aes_gcm import encrypt_bytes, decrypt_bytes
-from stego.image_stego import embed_lsb, extract_lsb, analyze_security, calculate_capacity
+from crypto.aes_gcm import (MIN_ENVELOPE_SIZE, STREAM_SEGMENT_SIZE, SessionKey, check_kdf_budget,
+                             decrypt_bytes, decrypt_stream, encrypt_bytes, encrypt_stream,
+                             envelope_size, stream_envelope_size)
+from stego.image_stego import ImageSource, LoadedImage, analyze_security, calculate_capacity
+from stego.jpeg_stego import JpegCoefficients, JpegSource
+from stego.matrix_stego import choose_matrix_k
+from stego.raw_stego import embed_with_header_rows, is_mappable, map_output_copy
+from stego.stego_header import (EMBEDDING_MODES, HEADER_SAMPLES, HEADER_SIZE, HEADER_VERSION,
+                                embed_with_header, extract_with_header, pack_header, payload_region,
+                                probe_header, read_header, unpack_header)
+from stego.stream_stego import embed_lsb_stream, extract_lsb_stream
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+import os
+import threading
+import time
 import zlib
 
-def encode_data_into_image(carrier_image_path: str, payload: bytes, password: str, 
-                          output_image_path: str, lsb_bits: int = 1, use_compression: bool = True) -> dict:
+ANALYSIS_MODES = ('inline', 'skip', 'background')
+
+# Larger images are sampled with a stride for the pipeline's security score
+ANALYSIS_MAX_SAMPLES = 1 << 22
+
+_analysis_pool = None
+_analysis_pool_lock = threading.Lock()
+
+# Process-wide decode counters; early rejections never reach the KDF
+_decode_stats = {'attempts': 0, 'early_rejections': 0, 'kdf_runs': 0, 'successes': 0}
+_decode_stats_lock = threading.Lock()
+
+def _count_decode(*names: str) -> None:
+    """Increment decode counters."""
+    with _decode_stats_lock:
+        for name in names:
+            _decode_stats[name] += 1
+
+def get_decode_stats() -> dict:
     """
-    The full encode pipeline with advanced options.
+    Counters for every decode attempt in this process.
     
-    Args:
-        carrier_image_path: Path to the carrier image
-        payload: Data to hide
-        password: Encryption password
-        output_image_path: Path to save stego image
-        lsb_bits: How many LSBs to use (1-4)
-        use_compression: Whether to compress data before encryption
+    Returns:
+        Dictionary with attempts, early_rejections (rejected before key
+        derivation), kdf_runs and successes
+    """
+    with _decode_stats_lock:
+        return dict(_decode_stats)
+
+def reset_decode_stats() -> None:
+    """Set all decode counters back to zero."""
+    with _decode_stats_lock:
+        for name in _decode_stats:
+            _decode_stats[name] = 0
+
+def _early_reject(error: str) -> dict:
+    """Failure result for a decode rejected before key derivation."""
+    _count_decode('early_rejections')
+    return {
+        'success': False,
+        'early_rejected': True,
+        'error': error
+    }
+
+def _check_embedding_mode(embedding_mode: str) -> None:
+    """Validate an embedding mode for pixel carriers."""
+    if embedding_mode not in EMBEDDING_MODES:
+        raise ValueError(f"embedding_mode must be one of {', '.join(EMBEDDING_MODES)}")
+    if embedding_mode == 'jsteg':
+        raise ValueError("'jsteg' is only used for JPEG carriers, see encode_data_into_jpeg")
+
+def _scatter_session(password: str, header: dict, session: SessionKey = None,
+                     max_kdf_cost: int = None) -> SessionKey:
+    """
+    Session key of a scatter image, from the salt and scrypt parameters in its header.
+    
+    The caller's session is reused when it matches; otherwise scrypt runs
+    once, within max_kdf_cost. The same key material decrypts the payload.
+    """
+    if header['salt'] is None:
+        raise ValueError("Scatter header carries no key salt")
+    key_fields = (header['salt'], header['kdf_params'])
+    if session is not None and (session.salt, session.kdf_params) == key_fields:
+        return session
+    check_kdf_budget(header['kdf_params'], max_kdf_cost)
+    return SessionKey(password, header['salt'], header['kdf_params'])
+
+def _scatter_key(session: SessionKey) -> bytes:
+    """Key for the scatter sample order, derived from the session key material."""
+    return session.subkey(b'stego-scatter')
+
+def _check_analysis(analysis: str) -> None:
+    """Validate an analysis mode."""
+    if analysis not in ANALYSIS_MODES:
+        raise ValueError(f"analysis must be one of {', '.join(ANALYSIS_MODES)}")
+
+def _security_score(stego: LoadedImage, analysis: str):
+    """
+    Security score of a decoded image according to the analysis mode.
     
     Returns:
-        Dictionary with operation details and metrics
+        The score for 'inline', None for 'skip', or a Future for 'background'
+    """
+    global _analysis_pool
+    if analysis == 'skip':
+        return None
+    if analysis == 'inline':
+        return stego.security_score(ANALYSIS_MAX_SAMPLES)
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stego-analysis')
+    return _analysis_pool.submit(stego.security_score, ANALYSIS_MAX_SAMPLES)
+
+def _same_mappable_format(carrier_path: str, output_path: str) -> bool:
+    """Whether both paths are files of the same memory-mappable format."""
+    if not all(isinstance(path, (str, os.PathLike)) for path in (carrier_path, output_path)):
+        return False
+    extensions = [os.path.splitext(os.fspath(path))[1].lower() for path in (carrier_path, output_path)]
+    return is_mappable(carrier_path) and extensions[0] == extensions[1]
+
+def _encode_loaded(carrier: LoadedImage, payload: bytes, password: str,
+                   lsb_bits: int, use_compression: bool, workers: int,
+                   embedding_mode: str = 'sequential', analysis: str = 'inline',
+                   session: SessionKey = None, kdf_params: tuple = None,
+                   segment_size: int = None, mapped: bool = False) -> tuple:
     """
+    Run compression, encryption, embedding and analysis on a decoded carrier.
     
-    # Calculate capacity and check if data fits
-    capacity_info = calculate_capacity(carrier_image_path, lsb_bits)
-    required_space = len(payload) + 100  # Add overhead for header and encryption
+    With mapped set, the carrier pixels are a writable memory map of the
+    output file (see map_output_copy) and only the rows the header and a
+    'sequential' payload reach are rewritten.
     
-    if required_space > capacity_info['capacity_bytes']:
-        raise ValueError(
-            f"Data too large for image. "
-            f"Capacity: {capacity_info['capacity_bytes']} bytes, "
-            f"Required: {required_space} bytes. "
-            f"Try using more LSB bits or a larger image."
-        )
+    Returns:
+        Tuple of (metrics dictionary, stego LoadedImage); 'encode_seconds'
+        covers compression, encryption and embedding
+    """
+    started = time.perf_counter()
+    _check_embedding_mode(embedding_mode)
+    _check_analysis(analysis)
+    if embedding_mode == 'matrix' and lsb_bits != 1:
+        raise ValueError("matrix embedding works on the LSB plane; use lsb_bits=1")
+    # Scatter payloads are session envelopes: the session key also orders the samples
+    scatter = embedding_mode == 'scatter'
+    if scatter and segment_size is not None:
+        raise ValueError("scatter embedding uses a session envelope, which cannot be segmented")
     
     original_payload_size = len(payload)
     
@@ -41,14 +152,52 @@ def encode_data_into_image(carrier_image_path: str, payload: bytes, password: st
         compressed_payload = payload
         compression_ratio = 1.0
     
+    # Check the envelope fits after the header region, before paying for the KDF
+    capacity_info = carrier.capacity(lsb_bits, reserved_samples=HEADER_SAMPLES)
+    required_space = envelope_size(len(compressed_payload), session is not None or scatter,
+                                   segment_size)
+    
+    if required_space > capacity_info['capacity_bytes']:
+        raise ValueError(
+            f"Data too large for image. "
+            f"Capacity: {capacity_info['capacity_bytes']} bytes, "
+            f"Required: {required_space} bytes. "
+            f"Try using more LSB bits or a larger image."
+        )
+    
     # 2. Encrypt the payload
-    encrypted_payload = encrypt_bytes(compressed_payload, password)
+    scatter_key = None
+    if scatter:
+        session = session or SessionKey(password, kdf_params=kdf_params)
+        scatter_key = _scatter_key(session)
+    encrypted_payload = encrypt_bytes(compressed_payload, password, session, kdf_params, workers,
+                                      segment_size)
     
-    # 3. Embed the encrypted payload into the image
-    embed_lsb(carrier_image_path, encrypted_payload, output_image_path, lsb_bits)
+    # 3. Embed the header and the encrypted payload into the image; matrix
+    #    mode picks the sparsest Hamming code the payload fits into
+    matrix_k = None
+    if embedding_mode == 'matrix':
+        matrix_k = choose_matrix_k((len(encrypted_payload) + 4) * 8,
+                                   payload_region(carrier.pixels)[..., :3].size)
+    header = pack_header(lsb_bits, embedding_mode, 'zlib' if use_compression else 'none',
+                         mode_param=matrix_k or 0, payload_crc=zlib.crc32(encrypted_payload),
+                         salt=session.salt if scatter else None,
+                         kdf_params=session.kdf_params if scatter else None)
+    if mapped:
+        if embedding_mode != 'sequential':
+            raise ValueError("Memory-mapped carriers only support 'sequential' embedding")
+        embed_with_header_rows(carrier.pixels, header, encrypted_payload, lsb_bits)
+        stego = carrier
+    else:
+        stego_pixels = embed_with_header(carrier.pixels, header, encrypted_payload, lsb_bits, workers,
+                                         in_place=carrier.owns_pixels, scatter_key=scatter_key,
+                                         matrix_k=matrix_k, adaptive=embedding_mode == 'adaptive')
+        stego = LoadedImage(stego_pixels, carrier.decodes, carrier.encodes,
+                            owns_pixels=carrier.owns_pixels)
+    encode_seconds = time.perf_counter() - started
     
-    # 4. Analyze security of the stego image
-    security_score = analyze_security(output_image_path)
+    # 4. Analyze security of the in-memory stego pixels
+    security_score = _security_score(stego, analysis)
     
     # Return detailed metrics
     return {
@@ -61,62 +210,261 @@ def encode_data_into_image(carrier_image_path: str, payload: bytes, password: st
         'security_score': security_score,
         'lsb_bits_used': lsb_bits,
         'compression_used': use_compression,
-        'output_path': output_image_path,
-        'message': f"✅ Successfully encoded {original_payload_size} bytes into {output_image_path}"
-    }
+        'embedding_mode': embedding_mode,
+        'matrix_k': matrix_k,
+        'header_version': HEADER_VERSION,
+        'encode_seconds': encode_seconds,
+    }, stego
 
-def decode_data_from_image(stego_image_path: str, password: str, 
-                          expected_lsb_bits: int = 1) -> dict:
+def encode_data_to_bytes(carrier_image: ImageSource, payload: bytes, password: str,
+                         lsb_bits: int = 1, use_compression: bool = True,
+                         workers: int = 1, embedding_mode: str = 'sequential',
+                         analysis: str = 'inline', write_profile: str = 'balanced',
+                         output_format: str = 'PNG', session: SessionKey = None,
+                         kdf_params: tuple = None, segment_size: int = None) -> dict:
     """
-    The full decode pipeline with enhanced error handling.
+    The full encode pipeline, entirely in memory.
     
     Args:
-        stego_image_path: Path to the stego image
+        carrier_image: Carrier path, image bytes, file-like object or pixel array
+        payload: Data to hide
         password: Encryption password
-        expected_lsb_bits: Number of LSB bits used during encoding
+        lsb_bits: How many LSBs to use (1-4)
+        use_compression: Whether to compress data before encryption
+        workers: Threads for embedding, and for encryption when segment_size
+            is set (None for all cores)
+        embedding_mode: 'sequential' fills samples from pixel 0; 'scatter'
+            spreads them in a pseudo-random order keyed by the session key
+            that also encrypts the payload (no segment_size);
+            'matrix' Hamming-codes the LSB plane to change fewer samples
+            (lsb_bits must be 1); 'adaptive' fills the most textured pixels first
+        analysis: 'inline' computes the security score, 'skip' leaves it
+            None, 'background' returns a Future resolving to it
+        write_profile: PNG deflate profile: 'fast', 'balanced' or 'smallest'
+        output_format: 'PNG', or 'BMP', 'TIFF' or 'NPY' to skip deflate
+        session: SessionKey for password, so a batch runs scrypt once
+        kdf_params: scrypt (n, r, p) stored in the envelope (see calibrate_scrypt)
+        segment_size: Encrypt the payload as independently sealed segments
+            of this many bytes, in parallel (e.g. PARALLEL_SEGMENT_SIZE);
+            None for a single-buffer envelope
+    
+    Returns:
+        Dictionary with operation details and metrics; the stego image
+        is returned as bytes under 'stego_image', and 'encode_seconds' and
+        'save_seconds' time the embedding and the image encoding separately
+    """
+    result, stego = _encode_loaded(LoadedImage.load(carrier_image), payload, password,
+                                   lsb_bits, use_compression, workers, embedding_mode, analysis,
+                                   session, kdf_params, segment_size)
+    started = time.perf_counter()
+    result['stego_image'] = stego.to_bytes(write_profile, output_format)
+    result['save_seconds'] = time.perf_counter() - started
+    result['image_decodes'] = stego.decodes
+    result['image_encodes'] = stego.encodes
+    result['message'] = f"✅ Successfully encoded {result['original_size']} bytes"
+    return result
+
+def encode_data_into_image(carrier_image_path: str, payload: bytes, password: str, 
+                          output_image_path: str, lsb_bits: int = 1, use_compression: bool = True,
+                          workers: int = 1, embedding_mode: str = 'sequential',
+                          analysis: str = 'inline', write_profile: str = 'balanced',
+                          session: SessionKey = None, kdf_params: tuple = None,
+                          segment_size: int = None) -> dict:
+    """
+    The full encode pipeline with advanced options.
+    
+    Args:
+        carrier_image_path: Path to the carrier image
+        payload: Data to hide
+        password: Encryption password
+        output_image_path: Path to save stego image (.bmp, .tif/.tiff and
+            .npy are written in that format, anything else as PNG). An
+            uncompressed BMP, binary PPM/PGM or .npy carrier saved to the
+            same format in 'sequential' mode is copied and only the rows
+            holding the header and payload are rewritten, through a memory
+            map (see stego.raw_stego); no image codec runs
+        lsb_bits: How many LSBs to use (1-4)
+        use_compression: Whether to compress data before encryption
+        workers: Threads for embedding, and for encryption when segment_size
+            is set (None for all cores)
+        embedding_mode: 'sequential' fills samples from pixel 0; 'scatter'
+            spreads them in a pseudo-random order keyed by the session key
+            that also encrypts the payload (no segment_size);
+            'matrix' Hamming-codes the LSB plane to change fewer samples
+            (lsb_bits must be 1); 'adaptive' fills the most textured pixels first
+        analysis: 'inline' computes the security score, 'skip' leaves it
+            None, 'background' returns a Future resolving to it
+        write_profile: PNG deflate profile: 'fast', 'balanced' or 'smallest'
+        session: SessionKey for password, so a batch runs scrypt once
+        kdf_params: scrypt (n, r, p) stored in the envelope (see calibrate_scrypt)
+        segment_size: Encrypt the payload as independently sealed segments
+            of this many bytes, in parallel (e.g. PARALLEL_SEGMENT_SIZE);
+            None for a single-buffer envelope
+    
+    Returns:
+        Dictionary with operation details and metrics, including
+        'encode_seconds' and 'save_seconds'
+    """
+    started = time.perf_counter()
+    pixels = None
+    if embedding_mode == 'sequential' and _same_mappable_format(carrier_image_path, output_image_path):
+        try:
+            pixels = map_output_copy(carrier_image_path, output_image_path)
+        except ValueError:
+            pass  # e.g. a compressed BMP: decode and re-encode it below
+    
+    if pixels is not None:
+        save_seconds = time.perf_counter() - started  # The file copy
+        try:
+            result, stego = _encode_loaded(LoadedImage(pixels), payload, password, lsb_bits,
+                                           use_compression, workers, embedding_mode, analysis,
+                                           session, kdf_params, segment_size, mapped=True)
+        except Exception:
+            del pixels
+            if os.path.abspath(carrier_image_path) != os.path.abspath(output_image_path):
+                os.remove(output_image_path)  # Don't leave an unmodified copy behind
+            raise
+        result['save_seconds'] = save_seconds
+    else:
+        result, stego = _encode_loaded(LoadedImage.load(carrier_image_path), payload, password,
+                                       lsb_bits, use_compression, workers, embedding_mode, analysis,
+                                       session, kdf_params, segment_size)
+        started = time.perf_counter()
+        stego.save(output_image_path, write_profile)
+        result['save_seconds'] = time.perf_counter() - started
+    result['image_decodes'] = stego.decodes
+    result['image_encodes'] = stego.encodes
+    result['output_path'] = output_image_path
+    result['message'] = f"✅ Successfully encoded {result['original_size']} bytes into {output_image_path}"
+    return result
+
+def decode_data_from_bytes(stego_image: ImageSource, password: str,
+                           expected_lsb_bits: int = None, workers: int = 1,
+                           embedding_mode: str = 'sequential', analysis: str = 'inline',
+                           session: SessionKey = None, max_kdf_cost: int = None) -> dict:
+    """
+    The full decode pipeline, entirely in memory.
+    
+    The LSB depth, embedding mode and compression are read from the stego
+    header. expected_lsb_bits and embedding_mode only apply to images
+    written before the header existed.
+    
+    Images without a header, payloads failing the header CRC and envelopes
+    too short to decrypt are rejected before the (slow) key derivation;
+    such results carry 'early_rejected': True. See get_decode_stats.
+    
+    Args:
+        stego_image: Stego path, image bytes, file-like object or pixel array
+        password: Encryption password
+        expected_lsb_bits: LSB bits of a headerless image; None only
+            accepts images with a stego header
+        workers: Threads for extraction and decryption (None for all cores)
+        embedding_mode: Embedding mode of a headerless image ('sequential' or
+            'adaptive'; scatter and matrix images always carry a header)
+        analysis: 'inline' computes the security score, 'skip' leaves it
+            None, 'background' returns a Future resolving to it
+        session: SessionKey that session-mode payloads of a batch were
+            encrypted with, to skip their scrypt run
+        max_kdf_cost: Largest scrypt cost in bytes the payload may ask for
+            (see kdf_cost); None for DECODE_MAX_KDF_COST
     
     Returns:
         Dictionary with decoded data and operation details
     """
     
+    _check_analysis(analysis)
+    _count_decode('attempts')
     try:
-        # 1. Extract the encrypted payload from the image
-        encrypted_payload = extract_lsb(stego_image_path, expected_lsb_bits)
+        # 1. Read the header, then extract the encrypted payload (image decoded once).
+        # PNG and .npy paths without a header are rejected after reading a few rows.
+        if (expected_lsb_bits is None and isinstance(stego_image, (str, os.PathLike))
+                and os.fspath(stego_image).lower().endswith(('.png', '.npy'))
+                and probe_header(stego_image) is None):
+            return _early_reject("No stego header found in image")
+        stego = LoadedImage.load(stego_image)
+        header = read_header(stego.pixels)
         
-        if encrypted_payload is None:
-            return {
-                'success': False,
-                'error': "No data found in image or extraction failed"
-            }
+        scatter_session = None
+        if header is not None:
+            lsb_bits = header['lsb_bits']
+            embedding_mode = header['embedding_mode']
+            if embedding_mode == 'scatter':
+                # The sample order needs the session key, so scrypt runs before extraction
+                _count_decode('kdf_runs')
+                try:
+                    scatter_session = _scatter_session(password, header, session, max_kdf_cost)
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'error': f"Decryption failed: {e}"
+                    }
+            try:
+                encrypted_payload = extract_with_header(
+                    stego.pixels, header, workers,
+                    _scatter_key(scatter_session) if scatter_session is not None else None)
+            except ValueError as e:
+                return _early_reject(f"Extraction failed: {e}")
+            payload_crc = header['payload_crc']
+            if payload_crc is not None and zlib.crc32(encrypted_payload) != payload_crc:
+                return _early_reject("Payload checksum mismatch; the image is damaged")
+        elif expected_lsb_bits is None:
+            return _early_reject("No stego header found in image")
+        else:
+            # Headerless image: the payload starts at the first sample
+            _check_embedding_mode(embedding_mode)
+            if embedding_mode in ('matrix', 'scatter'):
+                return _early_reject(f"{embedding_mode.capitalize()}-embedded images "
+                                     f"always carry a stego header")
+            lsb_bits = expected_lsb_bits
+            try:
+                encrypted_payload = stego.extract(lsb_bits, workers,
+                                                  adaptive=embedding_mode == 'adaptive')
+            except ValueError as e:
+                return _early_reject(f"Extraction failed: {e}")
+        
+        if encrypted_payload is None or len(encrypted_payload) < MIN_ENVELOPE_SIZE:
+            return _early_reject("No data found in image or extraction failed")
         
-        # 2. Decrypt the payload
+        # 2. Decrypt the payload; scatter payloads reuse the session key from step 1
+        if scatter_session is None:
+            _count_decode('kdf_runs')
         try:
-            compressed_payload = decrypt_bytes(encrypted_payload, password)
+            compressed_payload = decrypt_bytes(encrypted_payload, password, scatter_session or session,
+                                               workers, max_kdf_cost)
         except ValueError as e:
             return {
                 'success': False,
                 'error': f"Decryption failed: {e}"
             }
         
-        # 3. Decompress the payload (try both compressed and uncompressed)
-        try:
-            original_payload = zlib.decompress(compressed_payload)
-            was_compressed = True
-        except zlib.error:
-            # Data might not have been compressed
-            original_payload = compressed_payload
-            was_compressed = False
+        # 3. Decompress the payload as the header says, or try both without one
+        if header is not None:
+            was_compressed = header['compressed']
+            original_payload = zlib.decompress(compressed_payload) if was_compressed else compressed_payload
+        else:
+            try:
+                original_payload = zlib.decompress(compressed_payload)
+                was_compressed = True
+            except zlib.error:
+                # Data might not have been compressed
+                original_payload = compressed_payload
+                was_compressed = False
         
-        # 4. Analyze the stego image security
-        security_score = analyze_security(stego_image_path)
+        # 4. Analyze the stego image security on the already decoded pixels
+        security_score = _security_score(stego, analysis)
         
+        _count_decode('successes')
         return {
             'success': True,
             'data': original_payload,
             'data_size': len(original_payload),
             'was_compressed': was_compressed,
             'security_score': security_score,
-            'lsb_bits_used': expected_lsb_bits,
+            'lsb_bits_used': lsb_bits,
+            'embedding_mode': embedding_mode,
+            'header_version': header['version'] if header is not None else None,
+            'image_decodes': stego.decodes,
+            'image_encodes': stego.encodes,
             'message': f"✅ Successfully decoded {len(original_payload)} bytes"
         }
         
@@ -126,18 +474,241 @@ def decode_data_from_image(stego_image_path: str, password: str,
             'error': f"Decoding failed: {e}"
         }
 
-def get_image_capacity(image_path: str, lsb_bits: int = 1) -> dict:
+def decode_data_from_image(stego_image_path: str, password: str, 
+                          expected_lsb_bits: int = None, workers: int = 1,
+                          embedding_mode: str = 'sequential', analysis: str = 'inline',
+                          session: SessionKey = None, max_kdf_cost: int = None) -> dict:
+    """
+    The full decode pipeline with enhanced error handling.
+    
+    Args:
+        stego_image_path: Path to the stego image
+        password: Encryption password
+        expected_lsb_bits: LSB bits of a headerless image; None only
+            accepts images with a stego header
+        workers: Threads for extraction and decryption (None for all cores)
+        embedding_mode: Embedding mode of a headerless image ('sequential' or
+            'adaptive'; scatter and matrix images always carry a header)
+        analysis: 'inline' computes the security score, 'skip' leaves it
+            None, 'background' returns a Future resolving to it
+        session: SessionKey that session-mode payloads of a batch were
+            encrypted with, to skip their scrypt run
+        max_kdf_cost: Largest scrypt cost in bytes the payload may ask for
+            (see kdf_cost); None for DECODE_MAX_KDF_COST
+    
+    Returns:
+        Dictionary with decoded data and operation details
+    """
+    return decode_data_from_bytes(stego_image_path, password, expected_lsb_bits, workers,
+                                  embedding_mode, analysis, session, max_kdf_cost)
+
+def encode_data_into_jpeg(carrier_jpeg: JpegSource, payload: bytes, password: str,
+                          output_jpeg_path: str, use_compression: bool = True,
+                          kdf_params: tuple = None) -> dict:
+    """
+    The full encode pipeline for JPEG carriers, without recompressing them.
+    
+    The stego header and the encrypted payload are embedded together into
+    the DCT coefficients (see stego.jpeg_stego), so the output stays a JPEG
+    of nearly the carrier's size.
+    
+    Args:
+        carrier_jpeg: Path, bytes or file-like object of a baseline JPEG
+        payload: Data to hide
+        password: Encryption password
+        output_jpeg_path: Path to save the stego JPEG
+        use_compression: Whether to compress data before encryption
+        kdf_params: scrypt (n, r, p) stored in the envelope (see calibrate_scrypt)
+    
+    Returns:
+        Dictionary with operation details and metrics
+    """
+    started = time.perf_counter()
+    jpeg = JpegCoefficients.load(carrier_jpeg)
+    capacity_info = jpeg.capacity()
+    
+    compressed_payload = zlib.compress(payload) if use_compression else payload
+    required_space = HEADER_SIZE + envelope_size(len(compressed_payload))
+    if required_space > capacity_info['capacity_bytes']:
+        raise ValueError(
+            f"Data too large for JPEG. "
+            f"Capacity: {capacity_info['capacity_bytes']} bytes, "
+            f"Required: {required_space} bytes. "
+            f"Try a larger or higher quality JPEG."
+        )
+    encrypted_payload = encrypt_bytes(compressed_payload, password, kdf_params=kdf_params)
+    header = pack_header(1, 'jsteg', 'zlib' if use_compression else 'none',
+                         payload_crc=zlib.crc32(encrypted_payload))
+    
+    changes = jpeg.embed(header + encrypted_payload)
+    encode_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    jpeg.save(output_jpeg_path)
+    
+    return {
+        'success': True,
+        'original_size': len(payload),
+        'compressed_size': len(compressed_payload),
+        'encrypted_size': len(encrypted_payload),
+        'capacity_used_percent': round((len(header) + len(encrypted_payload)) / capacity_info['capacity_bytes'] * 100, 1),
+        'coefficients_changed': changes['coefficients_changed'],
+        'compression_used': use_compression,
+        'header_version': HEADER_VERSION,
+        'encode_seconds': encode_seconds,
+        'save_seconds': time.perf_counter() - started,
+        'output_path': output_jpeg_path,
+        'message': f"✅ Successfully encoded {len(payload)} bytes into {output_jpeg_path}"
+    }
+
+def decode_data_from_jpeg(stego_jpeg: JpegSource, password: str,
+                          max_kdf_cost: int = None) -> dict:
+    """
+    The full decode pipeline for JPEGs written by encode_data_into_jpeg.
+    
+    Args:
+        stego_jpeg: Path, bytes or file-like object of the stego JPEG
+        password: Encryption password
+        max_kdf_cost: Largest scrypt cost in bytes the payload may ask for
+            (see kdf_cost); None for DECODE_MAX_KDF_COST
+    
+    Returns:
+        Dictionary with decoded data and operation details
+    """
+    _count_decode('attempts')
+    try:
+        try:
+            embedded = JpegCoefficients.load(stego_jpeg).extract()
+        except ValueError as e:
+            return _early_reject(f"Extraction failed: {e}")
+        header = unpack_header(embedded or b'')
+        if header is None or header['embedding_mode'] != 'jsteg':
+            return _early_reject("No stego header found in JPEG")
+        encrypted_payload = embedded[HEADER_SIZE:]
+        if zlib.crc32(encrypted_payload) != header['payload_crc']:
+            return _early_reject("Payload checksum mismatch; the JPEG is damaged")
+        if len(encrypted_payload) < MIN_ENVELOPE_SIZE:
+            return _early_reject("No data found in JPEG or extraction failed")
+        
+        _count_decode('kdf_runs')
+        try:
+            compressed_payload = decrypt_bytes(encrypted_payload, password,
+                                               max_kdf_cost=max_kdf_cost)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': f"Decryption failed: {e}"
+            }
+        original_payload = zlib.decompress(compressed_payload) if header['compressed'] else compressed_payload
+        
+        _count_decode('successes')
+        return {
+            'success': True,
+            'data': original_payload,
+            'data_size': len(original_payload),
+            'was_compressed': header['compressed'],
+            'header_version': header['version'],
+            'message': f"✅ Successfully decoded {len(original_payload)} bytes"
+        }
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f"Decoding failed: {e}"
+        }
+
+def encode_stream_into_image(carrier_image_path: str, payload: Iterable[bytes], payload_size: int,
+                             password: str, output_image_path: str, lsb_bits: int = 1,
+                             band_height: int = 64, segment_size: int = STREAM_SEGMENT_SIZE,
+                             kdf_params: tuple = None) -> dict:
     """
-    Calculate the hiding capacity of an image.
+    Encrypt and embed a streamed payload without holding it in memory.
+    
+    The payload is sealed segment by segment (see encrypt_stream) and the
+    ciphertext is embedded band by band (see embed_lsb_stream), so memory
+    use does not grow with the payload. There is no compression. The stego
+    header is written first, without a payload CRC since the ciphertext is
+    not known yet, so the image also decodes with decode_data_from_image;
+    decode_stream_from_image reads it back without holding it in memory.
+    
+    Args:
+        carrier_image_path: Path to the carrier (PNG, .npy, or any PIL format)
+        payload: Iterable of payload byte chunks
+        payload_size: Total number of bytes the iterable will yield
+        password: Encryption password
+        output_image_path: Path to save the stego PNG
+        lsb_bits: Number of LSB bits to use (1-4)
+        band_height: Rows decoded and written per band
+        segment_size: Plaintext bytes per encrypted segment
+        kdf_params: scrypt (n, r, p) stored in the envelope (see calibrate_scrypt)
+    
+    Returns:
+        Dictionary with operation details and metrics
+    """
+    started = time.perf_counter()
+    encrypted_size = stream_envelope_size(payload_size, segment_size)
+    encrypted = encrypt_stream(payload, password, segment_size, kdf_params)
+    header = pack_header(lsb_bits, payload_crc=None)
+    stream_info = embed_lsb_stream(carrier_image_path, encrypted, encrypted_size, output_image_path,
+                                   lsb_bits, band_height, header=header)
+    
+    return {
+        'success': True,
+        'original_size': payload_size,
+        'encrypted_size': encrypted_size,
+        'segment_size': segment_size,
+        'bands': stream_info['bands'],
+        'lsb_bits_used': lsb_bits,
+        'header_version': HEADER_VERSION,
+        'encode_seconds': time.perf_counter() - started,
+        'output_path': output_image_path,
+        'message': f"✅ Successfully encoded {payload_size} bytes into {output_image_path}"
+    }
+
+def decode_stream_from_image(stego_image_path: str, password: str, lsb_bits: int = 1,
+                             band_height: int = 64, max_kdf_cost: int = None) -> Iterator[bytes]:
+    """
+    Extract and decrypt a payload written by encode_stream_into_image, chunk by chunk.
+    
+    Chunks are yielded as their segments authenticate. Truncated or
+    reordered data raises ValueError when it is reached, so the output is
+    only complete and trustworthy once the iterator finishes.
+    
+    Args:
+        stego_image_path: Path to the stego image
+        password: Encryption password
+        lsb_bits: LSB bits of an image written without a stego header;
+            the header's value is used otherwise
+        band_height: Rows decoded per band
+        max_kdf_cost: Largest scrypt cost in bytes the payload may ask for
+            (see kdf_cost); None for DECODE_MAX_KDF_COST
+    
+    Returns:
+        Iterator of payload byte chunks
+    """
+    header = probe_header(stego_image_path)
+    header_size = 0
+    if header is not None:
+        if header['embedding_mode'] != 'sequential' or header['compressed']:
+            raise ValueError("Image was not written by encode_stream_into_image; "
+                             "use decode_data_from_image")
+        lsb_bits, header_size = header['lsb_bits'], HEADER_SIZE
+    chunks = extract_lsb_stream(stego_image_path, lsb_bits, band_height, header_size=header_size)
+    return decrypt_stream(chunks, password, max_kdf_cost)
+
+def get_image_capacity(image_path: ImageSource, lsb_bits: int = 1) -> dict:
+    """
+    Calculate the hiding capacity of an image, after the stego header region.
+    
+    Encrypted payloads are larger than the plaintext; see envelope_size.
     
     Args:
-        image_path: Path to the image
+        image_path: Path to the image, image bytes, file-like object or pixel array
         lsb_bits: Number of LSB bits to consider
     
     Returns:
         Dictionary with capacity information
     """
-    return calculate_capacity(image_path, lsb_bits)
+    return calculate_capacity(image_path, lsb_bits, reserved_samples=HEADER_SAMPLES)
 
 def analyze_stego_security(image_path: str) -> dict:
     """
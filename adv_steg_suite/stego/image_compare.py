@@ -0,0 +1,193 @@
+"""
+Tiled image comparison with overflow-safe error metrics and SSIM.
+
+Both images are read in bands of rows (PNG files incrementally, everything
+else decoded once and sliced), and each pair of bands is measured in a
+thread pool. Sums are accumulated in int64/float64, so memory stays bounded
+by the band size rather than the image size.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import BinaryIO, Iterator, Union
+import os
+import numpy as np
+from PIL import Image
+
+from stego.image_stego import _open_image, _resolve_workers
+from stego.stream_stego import PngBandReader
+
+# SSIM window side and stabilizing constants for 8-bit data
+SSIM_WINDOW = 7
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+CompareSource = Union[str, os.PathLike, bytes, BinaryIO, np.ndarray]
+
+def _rgb_bands(source: CompareSource, band_height: int) -> tuple:
+    """
+    Open an image as RGB bands, matching Image.convert('RGB').
+    
+    Pixel arrays are read as L, LA, RGB or RGBA by their channel count.
+    
+    Returns:
+        Tuple of (width, height, iterator of (rows, width, 3) uint8 bands)
+    """
+    reader = None
+    if isinstance(source, (str, os.PathLike)):
+        try:
+            reader = PngBandReader(source)
+        except ValueError:
+            reader = None
+    
+    if reader is None:
+        image = Image.fromarray(source) if isinstance(source, np.ndarray) else _open_image(source)
+        pixels = np.asarray(image.convert('RGB'))
+        bands = (pixels[row:row + band_height] for row in range(0, pixels.shape[0], band_height))
+        return pixels.shape[1], pixels.shape[0], bands
+    
+    def png_bands() -> Iterator[np.ndarray]:
+        with reader:
+            for band in reader.iter_bands(band_height):
+                if band.ndim == 2:
+                    band = band[..., None]
+                if band.shape[2] < 3:  # L and LA: replicate the gray level
+                    yield np.repeat(band[..., :1], 3, axis=2)
+                else:
+                    yield band[..., :3]  # RGBA: alpha is dropped, not composited
+    return reader.width, reader.height, png_bands()
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over every window x window square of a 2D array, via an integral image."""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=values.dtype)
+    np.cumsum(values, axis=0, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+    return (integral[window:, window:] - integral[:-window, window:]
+            - integral[window:, :-window] + integral[:-window, :-window])
+
+def _ssim_sum(original: np.ndarray, stego: np.ndarray, window: int) -> tuple:
+    """
+    Sum and count of SSIM values over all full windows of one channel.
+    
+    Window moments come from five integral images computed in int64, so the
+    box sums are exact before conversion to float64.
+    """
+    if original.shape[0] < window or original.shape[1] < window:
+        return 0.0, 0
+    x = original.astype(np.int64)
+    y = stego.astype(np.int64)
+    area = window * window
+    
+    sum_x = _window_sums(x, window).astype(np.float64)
+    sum_y = _window_sums(y, window).astype(np.float64)
+    sum_xx = _window_sums(x * x, window).astype(np.float64)
+    sum_yy = _window_sums(y * y, window).astype(np.float64)
+    sum_xy = _window_sums(x * y, window).astype(np.float64)
+    
+    mean_x = sum_x / area
+    mean_y = sum_y / area
+    # Sample (N - 1) variances and covariance, as in the reference SSIM
+    normalize = 1.0 / (area - 1)
+    var_x = (sum_xx - sum_x * mean_x) * normalize
+    var_y = (sum_yy - sum_y * mean_y) * normalize
+    cov_xy = (sum_xy - sum_x * mean_y) * normalize
+    
+    ssim = ((2 * mean_x * mean_y + _SSIM_C1) * (2 * cov_xy + _SSIM_C2)
+            / ((mean_x ** 2 + mean_y ** 2 + _SSIM_C1) * (var_x + var_y + _SSIM_C2)))
+    return float(ssim.sum()), ssim.size
+
+def _measure_tile(original: np.ndarray, stego: np.ndarray, halo: int, window: int) -> dict:
+    """
+    Partial sums for one band.
+    
+    The first halo rows repeat the end of the previous band; they only feed
+    SSIM windows that straddle the band boundary.
+    """
+    diff = np.abs(original[halo:].astype(np.int16) - stego[halo:].astype(np.int16))
+    partial = {
+        'squared_error': int(np.einsum('ijk,ijk->', diff, diff, dtype=np.int64)),
+        'absolute_error': int(diff.sum(dtype=np.int64)),
+        'max_diff': int(diff.max()) if diff.size else 0,
+        'changed': int(np.count_nonzero(diff)),
+        'ssim_sum': 0.0,
+        'ssim_count': 0,
+    }
+    for channel in range(original.shape[2] if window > 1 else 0):
+        ssim_sum, ssim_count = _ssim_sum(original[..., channel], stego[..., channel], window)
+        partial['ssim_sum'] += ssim_sum
+        partial['ssim_count'] += ssim_count
+    return partial
+
+def compare_images_tiled(original_path: CompareSource, stego_path: CompareSource,
+                         band_height: int = 128, workers: int = None) -> dict:
+    """
+    Compare original and stego images band by band.
+    
+    Args:
+        original_path: Path to original image, its bytes, file-like object or pixel array
+        stego_path: Path to stego image, its bytes, file-like object or pixel array
+        band_height: Rows per band (bounds memory use)
+        workers: Threads measuring bands in parallel (None for all cores)
+    
+    Returns:
+        Dictionary with comparison metrics, including the mean SSIM over
+        all 7x7 windows of the RGB channels
+    """
+    width, height, original_bands = _rgb_bands(original_path, band_height)
+    stego_width, stego_height, stego_bands = _rgb_bands(stego_path, band_height)
+    if (width, height) != (stego_width, stego_height):
+        for bands in (original_bands, stego_bands):
+            bands.close()
+        raise ValueError("Images must have the same dimensions")
+    
+    window = min(SSIM_WINDOW, width, height)
+    workers = _resolve_workers(workers)
+    totals = {'squared_error': 0, 'absolute_error': 0, 'max_diff': 0, 'changed': 0,
+              'ssim_sum': 0.0, 'ssim_count': 0}
+    
+    def add(partial: dict) -> None:
+        for key, value in partial.items():
+            totals[key] = max(totals[key], value) if key == 'max_diff' else totals[key] + value
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        previous = None
+        for original, stego in zip(original_bands, stego_bands):
+            halo = 0
+            if previous is not None and window > 1:
+                # Carry window - 1 rows over so boundary windows are measured once
+                original = np.concatenate([previous[0], original])
+                stego = np.concatenate([previous[1], stego])
+                halo = len(previous[0])
+            previous = (original[-(window - 1):], stego[-(window - 1):]) if window > 1 else None
+            pending.add(pool.submit(_measure_tile, original, stego, halo, window))
+            # Bound the bands held in memory
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    add(future.result())
+        for future in pending:
+            add(future.result())
+    
+    samples = width * height * 3
+    total_pixels = width * height
+    mse = totals['squared_error'] / samples
+    if mse == 0:
+        psnr = float('inf')
+    else:
+        psnr = 20 * np.log10(255.0 / np.sqrt(mse))
+    ssim = totals['ssim_sum'] / totals['ssim_count'] if totals['ssim_count'] else 1.0
+    
+    return {
+        'max_pixel_difference': totals['max_diff'],
+        'average_pixel_difference': totals['absolute_error'] / samples,
+        'changed_pixels': totals['changed'],
+        'changed_percent': float((totals['changed'] / total_pixels) * 100),
+        'psnr': float(psnr),
+        'mse': float(mse),
+        'ssim': float(ssim),
+        'visibility': (
+            "Imperceptible" if psnr > 40 else
+            "Very slight" if psnr > 30 else
+            "Noticeable" if psnr > 20 else
+            "Very visible"
+        )
+    }
@@ -1,35 +1,594 @@
 from PIL import Image
+from typing import BinaryIO, Union
+from collections import OrderedDict
+import functools
+import hashlib
+import io
+import os
 import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from scipy import stats
 
-def embed_lsb(image_path: str, data: bytes, output_path: str, lsb_bits: int = 1) -> None:
+# Anything the in-memory API accepts as an image: a path, encoded image
+# bytes, a binary file-like object, or an already decoded pixel array
+ImageSource = Union[str, os.PathLike, bytes, BinaryIO, np.ndarray]
+
+# Smallest stripe (in samples or bytes) worth handing to a worker thread
+_MIN_STRIPE_SIZE = 1 << 18
+
+# Keyed scatter mode: Feistel rounds and how many (key, sample count)
+# position prefixes to keep around for batch jobs reusing a key
+_SCATTER_ROUNDS = 4
+_SCATTER_CACHE_SIZE = 16
+_scatter_cache = OrderedDict()
+_scatter_cache_lock = threading.Lock()
+
+# Adaptive mode: texture maps kept for this many carriers, keyed by a digest
+# of the high bits embedding never touches
+_ADAPTIVE_CACHE_SIZE = 4
+_adaptive_cache = OrderedDict()
+_adaptive_cache_lock = threading.Lock()
+
+# Pillow PNG encoder settings for each write profile
+WRITE_PROFILES = {
+    'fast': {'compress_level': 1},
+    'balanced': {'compress_level': 6},
+    'smallest': {'compress_level': 9, 'optimize': True},
+}
+
+# Lossless output formats by file extension; other extensions are written as PNG
+OUTPUT_FORMATS = {'.png': 'PNG', '.bmp': 'BMP', '.tif': 'TIFF', '.tiff': 'TIFF', '.npy': 'NPY'}
+
+def _open_image(source: ImageSource) -> Image.Image:
+    """Open a path, encoded bytes or file-like object with PIL."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return Image.open(source)
+
+def _is_npy_path(source: ImageSource) -> bool:
+    """Whether source is a path to a NumPy .npy file."""
+    return isinstance(source, (str, os.PathLike)) and os.fspath(source).lower().endswith('.npy')
+
+def _sample_values(data: bytes, lsb_bits: int) -> np.ndarray:
     """
-    Embeds data into the LSB of an image with configurable bits.
+    Split data into consecutive lsb_bits-wide values, most significant bit first.
+    
+    The final value is right-padded with zero bits, matching the bit layout
+    the per-sample embedding loop has always produced.
     
     Args:
-        image_path: Path to carrier image
+        data: Bytes to split
+        lsb_bits: Width of each value in bits (1-4)
+    
+    Returns:
+        uint8 array with one value per carrier sample
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    lsb_mask = (1 << lsb_bits) - 1
+    
+    if 8 % lsb_bits == 0:
+        # 1, 2 and 4 bits divide a byte evenly: shift every byte in one pass
+        shifts = np.arange(8 - lsb_bits, -1, -lsb_bits, dtype=np.uint8)
+        return ((raw[:, None] >> shifts) & lsb_mask).reshape(-1)
+    
+    bits = np.unpackbits(raw)
+    pad = (-len(bits)) % lsb_bits
+    if pad:
+        bits = np.concatenate([bits, np.zeros(pad, dtype=np.uint8)])
+    # packbits left-aligns each group in a byte; shift it back down
+    return np.packbits(bits.reshape(-1, lsb_bits), axis=1).reshape(-1) >> (8 - lsb_bits)
+
+def _resolve_workers(workers: int) -> int:
+    """Number of threads to use; None means one per CPU core."""
+    if workers is None:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+def _stripes(total: int, workers: int, align: int) -> list:
+    """
+    Split range(total) into at most workers contiguous (start, stop) stripes.
+    
+    Every stripe except the last starts and ends on a multiple of align.
+    Small ranges stay in one stripe so threads are only used when they pay off.
+    """
+    count = max(1, min(workers, total // _MIN_STRIPE_SIZE))
+    if count == 1 or total < align:
+        return [(0, total)]
+    step = -(-total // count)
+    step = -(-step // align) * align
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+def _run_stripes(func, stripes: list) -> list:
+    """Call func(start, stop) for every stripe, in a thread pool if there are several."""
+    if len(stripes) == 1:
+        return [func(*stripes[0])]
+    # NumPy releases the GIL for the bitwise work, so threads run truly in parallel
+    with ThreadPoolExecutor(max_workers=len(stripes)) as pool:
+        return list(pool.map(lambda stripe: func(*stripe), stripes))
+
+def _write_sample_values(samples: np.ndarray, start: int, values: np.ndarray, lsb_bits: int) -> None:
+    """
+    Replace the low lsb_bits of samples[start:start + len(values)] with values, in place.
+    
+    Contiguous views are modified through a flat reshape(-1) view. Strided
+    views (RGB samples of an RGBA image) are updated through a copy of just
+    the pixel rows covering the range, which is then written back.
+    
+    Args:
+        samples: Writable (pixels, channels) sample view
+        start: Index of the first flat sample to modify
+        values: uint8 values to store, one per sample
+        lsb_bits: Number of LSB bits per sample (1-4)
+    """
+    stop = start + len(values)
+    channels = samples.shape[1]
+    if samples.flags.c_contiguous:
+        rows = None
+        target = samples.reshape(-1)[start:stop]
+    else:
+        first_row = start // channels
+        rows = samples[first_row:-(-stop // channels)]
+        block = rows.reshape(-1)
+        target = block[start - first_row * channels:stop - first_row * channels]
+    target &= ~samples.dtype.type((1 << lsb_bits) - 1)
+    target |= values.astype(samples.dtype, copy=False)
+    if rows is not None:
+        rows[...] = block.reshape(rows.shape)
+
+def _embed_samples(samples: np.ndarray, data: bytes, lsb_bits: int, workers: int = 1) -> None:
+    """
+    Write data into the low bits of the leading samples, in place.
+    
+    Args:
+        samples: Writable (pixels, channels) sample view, or a flat sample array
+        data: Bytes to embed (including any header)
+        lsb_bits: Number of LSB bits per sample (1-4)
+        workers: Threads to split the samples across (None for all cores)
+    """
+    if samples.ndim == 1:
+        samples = samples.reshape(-1, 1)
+    data = memoryview(data)
+    
+    def embed_stripe(start, stop):
+        # Stripes start on a multiple of 8 samples, i.e. on a whole payload byte,
+        # and on a whole pixel, so no two threads ever share a row of samples
+        chunk = data[start * lsb_bits // 8:-(-stop * lsb_bits // 8)]
+        _write_sample_values(samples, start, _sample_values(chunk, lsb_bits)[:stop - start], lsb_bits)
+    
+    total_samples = -(-len(data) * 8 // lsb_bits)
+    _run_stripes(embed_stripe, _stripes(total_samples, _resolve_workers(workers), 8 * samples.shape[1]))
+
+def _sample_view(pixels: np.ndarray, use_alpha: bool = False) -> np.ndarray:
+    """
+    Return a (pixels, channels) view of the samples that carry data.
+    
+    Grayscale images have one channel. Unless use_alpha is set, alpha is
+    excluded from color images, so at most the first three channels are used.
+    """
+    if pixels.ndim == 2:
+        return pixels.reshape(-1, 1)
+    samples = pixels.reshape(-1, pixels.shape[2])
+    return samples if use_alpha else samples[:, :3]
+
+def _read_samples(samples: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Read the flat sample range [start, stop) from a (pixels, channels) view.
+    
+    Only the pixel rows covering the range are copied, never the whole image.
+    """
+    channels = samples.shape[1]
+    first_row = start // channels
+    last_row = -(-stop // channels)
+    block = samples[first_row:last_row].reshape(-1)
+    offset = first_row * channels
+    return block[start - offset:stop - offset]
+
+def _read_bytes(samples: np.ndarray, lsb_bits: int, byte_offset: int, length: int,
+                workers: int = 1) -> bytes:
+    """
+    Unpack length bytes that start byte_offset bytes into the embedded bit stream.
+    
+    Args:
+        samples: (pixels, channels) sample view from _sample_view
+        lsb_bits: Number of LSB bits per sample
+        byte_offset: Position of the first byte in the embedded stream
+        length: Number of bytes to read
+        workers: Threads to split the bytes across (None for all cores)
+    
+    Returns:
+        The extracted bytes
+    """
+    workers = _resolve_workers(workers)
+    if workers > 1:
+        stripes = _stripes(length, workers, 1)
+        if len(stripes) > 1:
+            chunks = _run_stripes(
+                lambda start, stop: _read_bytes(samples, lsb_bits, byte_offset + start, stop - start),
+                stripes
+            )
+            return b''.join(chunks)
+    
+    first_bit = byte_offset * 8
+    last_bit = first_bit + length * 8
+    first_sample = first_bit // lsb_bits
+    last_sample = -(-last_bit // lsb_bits)
+    
+    values = _read_samples(samples, first_sample, last_sample)
+    
+    if 8 % lsb_bits == 0:
+        # Whole bytes map onto whole groups of samples: merge each group directly
+        lsb_mask = (1 << lsb_bits) - 1
+        groups = (values & lsb_mask).astype(np.uint8).reshape(-1, 8 // lsb_bits)
+        shifts = np.arange(8 - lsb_bits, -1, -lsb_bits, dtype=np.uint8)
+        return np.bitwise_or.reduce(groups << shifts, axis=1).astype(np.uint8).tobytes()
+    
+    shifts = np.arange(lsb_bits - 1, -1, -1, dtype=np.uint8)
+    bits = ((values[:, None] >> shifts) & 1).astype(np.uint8).reshape(-1)
+    skip = first_bit - first_sample * lsb_bits
+    return np.packbits(bits[skip:skip + length * 8]).tobytes()
+
+def _feistel(values: np.ndarray, round_keys: np.ndarray, half_bits: int) -> np.ndarray:
+    """Keyed bijection on [0, 4**half_bits), applied to an unsigned integer array."""
+    word = values.dtype.type
+    half = word(half_bits)
+    mask = word((1 << half_bits) - 1)
+    left = values >> half
+    right = values & mask
+    for round_key in round_keys.astype(values.dtype):
+        # Multiply-xorshift round function, updated in place to avoid temporaries
+        mixed = right ^ round_key
+        mixed *= word(0x7FEB352D)
+        mixed ^= mixed >> word(15)
+        mixed *= word(0x846CA68B)
+        mixed ^= mixed >> word(16)
+        mixed &= mask
+        mixed ^= left
+        left, right = right, mixed
+    left <<= half
+    left |= right
+    return left
+
+def _scatter_permute(key: bytes, total: int, start: int, stop: int) -> np.ndarray:
+    """
+    Positions of payload samples start..stop-1 in a keyed permutation of range(total).
+    
+    A Feistel network permutes the smallest even power of two covering
+    total; results outside range(total) are cycle-walked back inside, which
+    keeps the mapping a bijection. Every index is computed independently, so
+    any prefix can be generated without materializing the whole permutation.
+    """
+    round_keys = np.frombuffer(
+        hashlib.blake2b(key, digest_size=8 * _SCATTER_ROUNDS, person=b'stego-scatter').digest(),
+        dtype='<u8'
+    )
+    half_bits = max(1, -(-max(total - 1, 1).bit_length() // 2))
+    dtype = np.uint32 if half_bits <= 16 else np.uint64
+    
+    positions = _feistel(np.arange(start, stop, dtype=dtype), round_keys, half_bits)
+    outside = np.flatnonzero(positions >= total)
+    while len(outside):
+        positions[outside] = _feistel(positions[outside], round_keys, half_bits)
+        outside = outside[positions[outside] >= total]
+    return positions
+
+def _scatter_positions(key: bytes, total: int, count: int) -> np.ndarray:
+    """
+    The first count sample positions of the keyed permutation of range(total).
+    
+    Prefixes are cached per (key digest, total) and extended on demand, so
+    repeated embeds or extractions with the same key and image shape reuse
+    them. The key itself is never stored.
+    """
+    cache_key = (hashlib.blake2b(key, digest_size=16, person=b'scatter-cache').digest(), total)
+    with _scatter_cache_lock:
+        cached = _scatter_cache.get(cache_key)
+        if cached is not None:
+            _scatter_cache.move_to_end(cache_key)
+    if cached is not None and len(cached) >= count:
+        return cached[:count]
+    
+    have = 0 if cached is None else len(cached)
+    extra = _scatter_permute(key, total, have, count)
+    positions = extra if cached is None else np.concatenate([cached, extra])
+    with _scatter_cache_lock:
+        _scatter_cache[cache_key] = positions
+        _scatter_cache.move_to_end(cache_key)
+        while len(_scatter_cache) > _SCATTER_CACHE_SIZE:
+            _scatter_cache.popitem(last=False)
+    return positions
+
+def clear_scatter_cache() -> None:
+    """Forget all cached scatter positions."""
+    with _scatter_cache_lock:
+        _scatter_cache.clear()
+
+def _scatter_offsets(pixels: np.ndarray, samples: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Map sample-view positions to offsets into pixels.reshape(-1)."""
+    channels = samples.shape[1]
+    stride = 1 if pixels.ndim == 2 else pixels.shape[2]
+    if channels == stride:
+        return positions
+    positions = positions.astype(np.int64)
+    return positions // channels * stride + positions % channels
+
+def _texture(high_bits: np.ndarray) -> np.ndarray:
+    """
+    Per-pixel texture of an (height, width, channels) array of high bits.
+    
+    Absolute differences to the four neighbours are summed over the channels
+    and then over each 3x3 neighbourhood, with edges replicated. Everything
+    is integer arithmetic, so encoder and decoder get bit-identical maps.
+    """
+    # int16 holds the largest total, 9 * 4 * 3 * 255 < 2**15
+    gradient = np.zeros(high_bits.shape[:2], dtype=np.int16)
+    for channel in range(high_bits.shape[2]):
+        plane = high_bits[..., channel].astype(np.int16)
+        horizontal = np.abs(plane[:, 1:] - plane[:, :-1])
+        gradient[:, :-1] += horizontal
+        gradient[:, 1:] += horizontal
+        vertical = np.abs(plane[1:] - plane[:-1])
+        gradient[:-1] += vertical
+        gradient[1:] += vertical
+    
+    padded = np.pad(gradient, 1, mode='edge')
+    rows = padded[:-2] + padded[1:-1] + padded[2:]
+    return (rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]).astype(np.uint16)
+
+def texture_map(pixels: np.ndarray, lsb_bits: int = 1, use_alpha: bool = False) -> np.ndarray:
+    """
+    Texture map that ranks pixels for adaptive embedding.
+    
+    The map is computed from the bits above the lsb_bits LSBs, which
+    embedding leaves unchanged, so a decoder computes the same map from the
+    stego image. Maps are cached by a digest of those bits, so the carrier
+    and its stego images share one cache entry.
+    
+    Args:
+        pixels: Carrier or stego pixel array
+        lsb_bits: Number of LSB bits used for embedding (1-4)
+        use_alpha: Whether the alpha channel carries data
+    
+    Returns:
+        uint16 array (height, width); busier pixels score higher
+    """
+    samples = _sample_view(pixels, use_alpha)
+    high_bits = (samples >> lsb_bits).reshape(pixels.shape[0], -1, samples.shape[1])
+    digest = hashlib.blake2b(high_bits.tobytes(), digest_size=16).digest()
+    cache_key = (digest, high_bits.shape)
+    with _adaptive_cache_lock:
+        cached = _adaptive_cache.get(cache_key)
+        if cached is not None:
+            _adaptive_cache.move_to_end(cache_key)
+            return cached
+    
+    texture = _texture(high_bits)
+    texture.flags.writeable = False  # Shared through the cache
+    with _adaptive_cache_lock:
+        _adaptive_cache[cache_key] = texture
+        while len(_adaptive_cache) > _ADAPTIVE_CACHE_SIZE:
+            _adaptive_cache.popitem(last=False)
+    return texture
+
+def clear_adaptive_cache() -> None:
+    """Forget all cached texture maps."""
+    with _adaptive_cache_lock:
+        _adaptive_cache.clear()
+
+def _adaptive_positions(texture: np.ndarray, count: int, channels: int,
+                        reserved_pixels: int = 0) -> np.ndarray:
+    """
+    The first count sample positions in adaptive order.
+    
+    Pixels are ranked by texture, busiest first, ties broken by position;
+    all channels of a pixel are used before moving on. Only the selected
+    pixels are sorted: a histogram of the texture levels gives the lowest
+    level still needed, so any prefix is found in linear time.
+    
+    Args:
+        texture: Map from texture_map
+        count: Number of sample positions to return
+        channels: Data samples per pixel
+        reserved_pixels: Leading pixels that never carry payload
+    """
+    levels = texture.reshape(-1)[reserved_pixels:]
+    pixel_count = -(-count // channels)
+    at_or_above = np.cumsum(np.bincount(levels)[::-1])[::-1]
+    threshold = np.flatnonzero(at_or_above >= pixel_count)[-1]
+    
+    chosen = np.flatnonzero(levels > threshold)
+    ties = np.flatnonzero(levels == threshold)[:pixel_count - len(chosen)]
+    # Both parts are in position order, so a stable sort by level finishes the ranking
+    chosen = np.concatenate([chosen, ties])
+    chosen = chosen[np.argsort(np.iinfo(np.uint16).max - levels[chosen], kind='stable')] + reserved_pixels
+    return (chosen[:, None] * channels + np.arange(channels)).reshape(-1)[:count]
+
+def load_image_array(source: ImageSource) -> np.ndarray:
+    """
+    Decode an image source into a NumPy array.
+    
+    Args:
+        source: File path, encoded image bytes, binary file-like object,
+            or an already decoded pixel array (returned unchanged)
+    
+    Returns:
+        Pixel array of shape (height, width) or (height, width, channels)
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if _is_npy_path(source):
+        return np.load(source)
+    return np.array(_open_image(source))
+
+def _output_format(destination: Union[str, os.PathLike, BinaryIO], output_format: str) -> str:
+    """Resolve the output format from an explicit name or the destination extension."""
+    if output_format is not None:
+        output_format = output_format.upper()
+        if output_format not in OUTPUT_FORMATS.values():
+            raise ValueError("output_format must be one of PNG, BMP, TIFF, NPY")
+        return output_format
+    if isinstance(destination, (str, os.PathLike)):
+        extension = os.path.splitext(os.fspath(destination))[1].lower()
+        return OUTPUT_FORMATS.get(extension, 'PNG')
+    return 'PNG'
+
+def save_image_array(pixels: np.ndarray, destination: Union[str, os.PathLike, BinaryIO],
+                     write_profile: str = 'balanced', output_format: str = None) -> None:
+    """
+    Encode a pixel array losslessly.
+    
+    PNG is written with the deflate settings of the write profile. BMP,
+    uncompressed TIFF and .npy skip deflate entirely, for pipelines bound
+    by write throughput rather than file size. BMP cannot store an alpha
+    channel, so images with one raise ValueError instead of losing it.
+    
+    Args:
+        pixels: Pixel array to encode
+        destination: File path or writable binary file-like object
+        write_profile: 'fast', 'balanced' or 'smallest' (PNG only)
+        output_format: 'PNG', 'BMP', 'TIFF' or 'NPY'; by default taken from
+            the destination extension, falling back to PNG
+    """
+    if write_profile not in WRITE_PROFILES:
+        raise ValueError(f"write_profile must be one of {', '.join(WRITE_PROFILES)}")
+    output_format = _output_format(destination, output_format)
+    
+    if output_format == 'NPY':
+        np.save(destination, pixels)
+    elif output_format == 'TIFF':
+        Image.fromarray(pixels).save(destination, 'TIFF', compression='raw')
+    elif output_format == 'BMP':
+        if pixels.ndim == 3 and pixels.shape[2] in (2, 4):
+            raise ValueError("BMP output cannot keep the alpha channel; use PNG, TIFF or NPY")
+        Image.fromarray(pixels).save(destination, 'BMP')
+    else:
+        Image.fromarray(pixels).save(destination, 'PNG', **WRITE_PROFILES[write_profile])
+
+def image_to_bytes(pixels: np.ndarray, write_profile: str = 'balanced',
+                   output_format: str = 'PNG') -> bytes:
+    """
+    Encode a pixel array and return the file contents.
+    
+    Args:
+        pixels: Pixel array to encode
+        write_profile: PNG write profile, see save_image_array
+        output_format: 'PNG', 'BMP', 'TIFF' or 'NPY'
+    
+    Returns:
+        Encoded file bytes
+    """
+    buffer = io.BytesIO()
+    save_image_array(pixels, buffer, write_profile, output_format)
+    return buffer.getvalue()
+
+class LoadedImage:
+    """
+    A decoded image shared by every stage of a pipeline.
+    
+    The image is decoded once on load; capacity checks, embedding,
+    extraction and analysis all work on the same pixel array. The
+    decodes/encodes counters record how much codec work was done.
+    
+    Pixels decoded by load() belong to the object, so embed() writes into
+    them in place instead of copying. Caller-supplied arrays are never modified.
+    """
+    
+    def __init__(self, pixels: np.ndarray, decodes: int = 0, encodes: int = 0,
+                 owns_pixels: bool = False):
+        self.pixels = pixels
+        self.decodes = decodes
+        self.encodes = encodes
+        self.owns_pixels = owns_pixels
+    
+    @classmethod
+    def load(cls, source: ImageSource) -> 'LoadedImage':
+        """Decode an image source; pixel arrays are wrapped without decoding."""
+        if isinstance(source, np.ndarray):
+            return cls(source)
+        return cls(load_image_array(source), decodes=1, owns_pixels=True)
+    
+    def capacity(self, lsb_bits: int = 1, use_alpha: bool = False,
+                 reserved_samples: int = 0) -> dict:
+        """Capacity information for this image, see calculate_capacity."""
+        return calculate_capacity(self.pixels, lsb_bits, use_alpha, reserved_samples)
+    
+    def embed(self, data: bytes, lsb_bits: int = 1, workers: int = 1,
+              use_alpha: bool = False, scatter_key: bytes = None,
+              adaptive: bool = False) -> 'LoadedImage':
+        """
+        Return the stego image, carrying over the codec counters.
+        
+        When this object owns its pixels they are modified in place and
+        shared with the returned image; this image should not be reused.
+        """
+        stego_pixels = embed_lsb_array(self.pixels, data, lsb_bits, workers,
+                                       in_place=self.owns_pixels, use_alpha=use_alpha,
+                                       scatter_key=scatter_key, adaptive=adaptive)
+        return LoadedImage(stego_pixels, self.decodes, self.encodes, owns_pixels=self.owns_pixels)
+    
+    def extract(self, lsb_bits: int = 1, workers: int = 1, use_alpha: bool = False,
+                scatter_key: bytes = None, adaptive: bool = False) -> bytes:
+        """Extract data hidden in this image, see extract_lsb_array."""
+        return extract_lsb_array(self.pixels, lsb_bits, workers, use_alpha, scatter_key, adaptive)
+    
+    def security_score(self, max_samples: int = None) -> float:
+        """Security score of the in-memory pixels, see analyze_security."""
+        return analyze_security(self.pixels, max_samples)
+    
+    def save(self, destination: Union[str, os.PathLike, BinaryIO],
+             write_profile: str = 'balanced', output_format: str = None) -> None:
+        """Encode the image to a path or file-like object, see save_image_array."""
+        save_image_array(self.pixels, destination, write_profile, output_format)
+        self.encodes += 1
+    
+    def to_bytes(self, write_profile: str = 'balanced', output_format: str = 'PNG') -> bytes:
+        """Encode the image and return the file contents."""
+        buffer = io.BytesIO()
+        self.save(buffer, write_profile, output_format)
+        return buffer.getvalue()
+
+def embed_lsb_array(pixels: np.ndarray, data: bytes, lsb_bits: int = 1,
+                    workers: int = 1, in_place: bool = False,
+                    use_alpha: bool = False, scatter_key: bytes = None,
+                    adaptive: bool = False, reserved_pixels: int = 0) -> np.ndarray:
+    """
+    Embeds data into the LSB of a pixel array with configurable bits.
+    
+    Alpha channels are carried through to the output untouched unless
+    use_alpha is set, in which case they carry data as well.
+    
+    Args:
+        pixels: Carrier pixel array
         data: Data to hide
-        output_path: Path to save stego image
         lsb_bits: Number of LSB bits to use (1-4)
+        workers: Threads to split the work across (None for all cores)
+        in_place: Modify pixels directly instead of working on a copy
+        use_alpha: Also embed into the alpha channel
+        scatter_key: Spread the samples over the image in a keyed
+            pseudo-random order instead of filling them from pixel 0
+        adaptive: Fill the most textured pixels first, ranked by texture_map
+        reserved_pixels: Leading pixels adaptive mode leaves alone
+    
+    Returns:
+        Stego pixel array (pixels itself when in_place is set)
     """
     if lsb_bits < 1 or lsb_bits > 4:
         raise ValueError("lsb_bits must be between 1 and 4")
+    if adaptive and scatter_key is not None:
+        raise ValueError("scatter_key and adaptive cannot be combined")
     
-    img = Image.open(image_path)
-    pixels = np.array(img)
-    
-    if len(pixels.shape) == 2:  # Grayscale
-        height, width = pixels.shape
-        channels = 1
-    else:  # Color (RGB/RGBA)
-        height, width, channels = pixels.shape
-        if channels > 3:  # If RGBA, use only RGB
-            pixels = pixels[:, :, :3]
-            channels = 3
+    if in_place:
+        if not pixels.flags.writeable:
+            raise ValueError("in_place embedding needs a writable pixel array")
+        if (scatter_key is not None or adaptive) and not pixels.flags.c_contiguous:
+            raise ValueError("in_place scatter or adaptive embedding needs a contiguous pixel array")
+    else:
+        pixels = pixels.copy()
+    samples = _sample_view(pixels, use_alpha)
     
     # Calculate capacity and validate
-    total_bits = width * height * channels * lsb_bits
+    reserved_samples = reserved_pixels * samples.shape[1] if adaptive else 0
+    total_bits = (samples.size - reserved_samples) * lsb_bits
     required_bits = (len(data) + 4) * 8  # +4 for length header
     
     if required_bits > total_bits:
@@ -40,129 +599,233 @@ def embed_lsb(image_path: str, data: bytes, output_path: str, lsb_bits: int = 1)
             f"Try using more LSB bits or a larger image."
         )
     
-    # Prepend data length header
+    # Prepend data length header and write it into the leading samples
     data_with_header = struct.pack('>I', len(data)) + data
-    data_bits = ''.join(format(byte, '08b') for byte in data_with_header)
-    data_index = 0
-    
-    # Create bit mask for LSB manipulation
-    lsb_mask = (1 << lsb_bits) - 1
-    clear_mask = 0xFF ^ lsb_mask
-    
-    # Flatten image for easier processing
-    flat_pixels = pixels.flatten()
-    
-    for i in range(len(flat_pixels)):
-        if data_index >= len(data_bits):
-            break
-            
-        # Get the next lsb_bits from our data
-        if data_index + lsb_bits <= len(data_bits):
-            current_bits = data_bits[data_index:data_index + lsb_bits]
+    if scatter_key is None and not adaptive:
+        _embed_samples(samples, data_with_header, lsb_bits, workers)
+    else:
+        values = _sample_values(data_with_header, lsb_bits)
+        if adaptive:
+            positions = _adaptive_positions(texture_map(pixels, lsb_bits, use_alpha), len(values),
+                                            samples.shape[1], reserved_pixels)
         else:
-            # Pad with zeros if needed
-            current_bits = data_bits[data_index:].ljust(lsb_bits, '0')
-        
-        data_bits_value = int(current_bits, 2)
+            positions = _scatter_positions(scatter_key, samples.size, len(values))
+        flat = pixels.reshape(-1)
+        offsets = _scatter_offsets(pixels, samples, positions)
+        flat[offsets] = (flat[offsets] & ~pixels.dtype.type((1 << lsb_bits) - 1)) | values
+    
+    return pixels
+
+def extract_lsb_array(pixels: np.ndarray, lsb_bits: int = 1, workers: int = 1,
+                      use_alpha: bool = False, scatter_key: bytes = None,
+                      adaptive: bool = False, reserved_pixels: int = 0) -> bytes:
+    """
+    Extracts data hidden with embed_lsb_array from a stego pixel array.
+    
+    Only the samples holding the 32-bit length header are read first; the
+    payload is then unpacked from exactly the sample range that holds it.
+    
+    Args:
+        pixels: Stego pixel array
+        lsb_bits: Number of LSB bits used during embedding
+        workers: Threads to split the work across (None for all cores)
+        use_alpha: Whether the alpha channel was used during embedding
+        scatter_key: Key the samples were scattered with during embedding
+        adaptive: Whether the payload was embedded in adaptive order
+        reserved_pixels: Leading pixels adaptive mode left alone
+    
+    Returns:
+        Extracted data bytes, or None if the image is too small for a header
+    """
+    if lsb_bits < 1 or lsb_bits > 4:
+        raise ValueError("lsb_bits must be between 1 and 4")
+    
+    samples = _sample_view(pixels, use_alpha)
+    reserved_samples = reserved_pixels * samples.shape[1] if adaptive else 0
+    total_bits = (samples.size - reserved_samples) * lsb_bits
+    
+    if total_bits < 32:
+        return None
+    
+    if scatter_key is not None or adaptive:
+        # Gather the scattered or ranked samples in payload order; they then read
+        # exactly like a sequential single-channel sample run
+        flat = np.ascontiguousarray(pixels).reshape(-1)
+        texture = texture_map(pixels, lsb_bits, use_alpha) if adaptive else None
         
-        # Clear the LSB bits and set them to our data bits
-        current_pixel = flat_pixels[i]
-        new_pixel = (current_pixel & clear_mask) | data_bits_value
-        flat_pixels[i] = new_pixel
+        def gather(count):
+            if adaptive:
+                positions = _adaptive_positions(texture, count, samples.shape[1], reserved_pixels)
+            else:
+                positions = _scatter_positions(scatter_key, samples.size, count)
+            return flat[_scatter_offsets(pixels, samples, positions)].reshape(-1, 1)
         
-        data_index += lsb_bits
+        data_length = struct.unpack('>I', _read_bytes(gather(-(-32 // lsb_bits)), lsb_bits, 0, 4))[0]
+        if (data_length + 4) * 8 > total_bits:
+            raise ValueError(
+                f"Declared payload length {data_length} bytes exceeds image capacity "
+                f"of {total_bits // 8 - 4} bytes. "
+                f"Wrong lsb_bits, embedding order or no hidden data."
+            )
+        return _read_bytes(gather(-(-(data_length + 4) * 8 // lsb_bits)), lsb_bits, 4, data_length)
     
-    # Reshape back to original dimensions
-    if len(pixels.shape) == 2:
-        pixels = flat_pixels.reshape((height, width))
-    else:
-        pixels = flat_pixels.reshape((height, width, channels))
+    data_length = struct.unpack('>I', _read_bytes(samples, lsb_bits, 0, 4))[0]
+    if (data_length + 4) * 8 > total_bits:
+        raise ValueError(
+            f"Declared payload length {data_length} bytes exceeds image capacity "
+            f"of {total_bits // 8 - 4} bytes. "
+            f"Wrong lsb_bits or no hidden data."
+        )
+    
+    return _read_bytes(samples, lsb_bits, 4, data_length, workers)
+
+def embed_lsb_bytes(carrier: ImageSource, data: bytes, lsb_bits: int = 1, workers: int = 1,
+                    use_alpha: bool = False, scatter_key: bytes = None,
+                    adaptive: bool = False) -> bytes:
+    """
+    Embeds data into a carrier image held in memory.
     
-    # Save the result
-    result_img = Image.fromarray(pixels)
-    result_img.save(output_path, 'PNG')
+    Args:
+        carrier: Carrier path, image bytes, file-like object or pixel array
+        data: Data to hide
+        lsb_bits: Number of LSB bits to use (1-4)
+        workers: Threads to split the work across (None for all cores)
+        use_alpha: Also embed into the alpha channel
+        scatter_key: Spread the samples in a keyed pseudo-random order
+        adaptive: Fill the most textured pixels first
+    
+    Returns:
+        Stego image as PNG bytes
+    """
+    stego = LoadedImage.load(carrier).embed(data, lsb_bits, workers, use_alpha, scatter_key, adaptive)
+    return stego.to_bytes()
 
-def extract_lsb(stego_image_path: str, lsb_bits: int = 1) -> bytes:
+def extract_lsb_bytes(stego_image: ImageSource, lsb_bits: int = 1, workers: int = 1,
+                      use_alpha: bool = False, scatter_key: bytes = None,
+                      adaptive: bool = False) -> bytes:
+    """
+    Extracts data from a stego image held in memory.
+    
+    Args:
+        stego_image: Stego path, image bytes, file-like object or pixel array
+        lsb_bits: Number of LSB bits used during embedding
+        workers: Threads to split the work across (None for all cores)
+        use_alpha: Whether the alpha channel was used during embedding
+        scatter_key: Key the samples were scattered with during embedding
+        adaptive: Whether the payload was embedded in adaptive order
+    
+    Returns:
+        Extracted data bytes, or None if the image is too small for a header
+    """
+    return extract_lsb_array(load_image_array(stego_image), lsb_bits, workers, use_alpha,
+                             scatter_key, adaptive)
+
+def embed_lsb(image_path: str, data: bytes, output_path: str, lsb_bits: int = 1,
+              workers: int = 1, use_alpha: bool = False, scatter_key: bytes = None,
+              write_profile: str = 'balanced', adaptive: bool = False) -> None:
+    """
+    Embeds data into the LSB of an image with configurable bits.
+    
+    Args:
+        image_path: Path to carrier image
+        data: Data to hide
+        output_path: Path to save stego image (.bmp, .tif/.tiff and .npy
+            are written in that format, anything else as PNG)
+        lsb_bits: Number of LSB bits to use (1-4)
+        workers: Threads to split the work across (None for all cores)
+        use_alpha: Also embed into the alpha channel
+        scatter_key: Spread the samples in a keyed pseudo-random order
+        write_profile: PNG deflate profile: 'fast', 'balanced' or 'smallest'
+        adaptive: Fill the most textured pixels first
+    """
+    stego = LoadedImage.load(image_path).embed(data, lsb_bits, workers, use_alpha, scatter_key, adaptive)
+    stego.save(output_path, write_profile)
+
+def extract_lsb(stego_image_path: str, lsb_bits: int = 1, workers: int = 1,
+                use_alpha: bool = False, scatter_key: bytes = None,
+                adaptive: bool = False) -> bytes:
     """
     Extracts data hidden with embed_lsb from a stego image.
     
     Args:
         stego_image_path: Path to stego image
         lsb_bits: Number of LSB bits used during embedding
+        workers: Threads to split the work across (None for all cores)
+        use_alpha: Whether the alpha channel was used during embedding
+        scatter_key: Key the samples were scattered with during embedding
+        adaptive: Whether the payload was embedded in adaptive order
     
     Returns:
-        Extracted data bytes
-    """
-    img = Image.open(stego_image_path)
-    pixels = np.array(img)
-    
-    if len(pixels.shape) == 2:  # Grayscale
-        height, width = pixels.shape
-        channels = 1
-    else:  # Color
-        height, width, channels = pixels.shape
-        if channels > 3:  # Use only RGB
-            pixels = pixels[:, :, :3]
-            channels = 3
-    
-    # Flatten for processing
-    flat_pixels = pixels.flatten()
-    
-    extracted_bits = []
-    data_length = None
-    extracted_data = b''
-    lsb_mask = (1 << lsb_bits) - 1
+        Extracted data bytes, or None if the image is too small for a header
+    """
+    return extract_lsb_array(load_image_array(stego_image_path), lsb_bits, workers, use_alpha,
+                             scatter_key, adaptive)
+
+@functools.lru_cache(maxsize=4096)
+def _carrier_dimensions(path: str, mtime_ns: int, size: int) -> tuple:
+    """
+    Read (width, height, channels) from an image file header.
     
-    for pixel in flat_pixels:
-        # Extract the LSB bits
-        lsb_value = pixel & lsb_mask
-        bits = format(lsb_value, f'0{lsb_bits}b')
-        extracted_bits.extend(list(bits))
-        
-        # Process when we have enough bits for bytes
-        while len(extracted_bits) >= 8:
-            byte_bits = ''.join(extracted_bits[:8])
-            extracted_bits = extracted_bits[8:]
-            
-            byte_value = int(byte_bits, 2)
-            extracted_data += bytes([byte_value])
-            
-            # Check for length header
-            if len(extracted_data) == 4 and data_length is None:
-                data_length = struct.unpack('>I', extracted_data)[0]
-                extracted_data = b''  # Reset for payload
-            
-            # Check if we have the full payload
-            if data_length is not None and len(extracted_data) == data_length:
-                return extracted_data
-    
-    return extracted_data if data_length is not None else None
-
-def calculate_capacity(image_path: str, lsb_bits: int = 1) -> dict:
+    mtime_ns and size are part of the cache key only, so a rewritten file
+    is re-read instead of served stale.
+    """
+    if _is_npy_path(path):
+        shape = np.load(path, mmap_mode='r').shape
+        return shape[1], shape[0], shape[2] if len(shape) == 3 else 1
+    with Image.open(path) as img:
+        return _header_dimensions(img)
+
+def _header_dimensions(img: Image.Image) -> tuple:
+    """(width, height, bands) of an opened image, without decoding pixels."""
+    width, height = img.size
+    return width, height, len(img.getbands())
+
+def clear_capacity_cache() -> None:
+    """Forget all cached carrier dimensions."""
+    _carrier_dimensions.cache_clear()
+
+def calculate_capacity(image_path: ImageSource, lsb_bits: int = 1, use_alpha: bool = False,
+                       reserved_samples: int = 0) -> dict:
     """
     Calculate the data hiding capacity of an image.
     
+    Only the image header is read; no pixels are decoded. Results for
+    file paths are cached by path, modification time and file size.
+    
     Args:
-        image_path: Path to the image
+        image_path: Path to the image, image bytes, file-like object or pixel array
         lsb_bits: Number of LSB bits to use
+        use_alpha: Count the alpha channel of RGBA images as well
+        reserved_samples: Leading samples kept for a stego header; they
+            fill whole pixels, which carry no payload
     
     Returns:
         Dictionary with capacity information
     """
-    img = Image.open(image_path)
-    pixels = np.array(img)
+    if isinstance(image_path, np.ndarray):
+        if image_path.ndim == 2:  # Grayscale
+            height, width = image_path.shape
+            channels = 1
+        else:  # Color
+            height, width, channels = image_path.shape
+    elif isinstance(image_path, (str, os.PathLike)):
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        width, height, channels = _carrier_dimensions(path, stat.st_mtime_ns, stat.st_size)
+    else:
+        position = image_path.tell() if hasattr(image_path, 'seek') else None
+        width, height, channels = _header_dimensions(_open_image(image_path))
+        if position is not None:
+            image_path.seek(position)  # Leave the stream ready for a full decode
     
-    if len(pixels.shape) == 2:  # Grayscale
-        height, width = pixels.shape
-        channels = 1
-    else:  # Color
-        height, width, channels = pixels.shape
-        if channels > 3:  # Use only RGB
-            channels = 3
+    if not use_alpha:
+        channels = min(channels, 3)  # Use only RGB
     
     total_pixels = width * height
     total_bits = total_pixels * channels * lsb_bits
-    usable_bits = total_bits - 32  # Reserve 32 bits for length header
+    reserved_pixels = -(-reserved_samples // channels)
+    # Reserve 32 bits for length header
+    usable_bits = max((total_pixels - reserved_pixels) * channels * lsb_bits - 32, 0)
     
     return {
         'width': width,
@@ -177,29 +840,76 @@ def calculate_capacity(image_path: str, lsb_bits: int = 1) -> dict:
         'message': f"Capacity: {usable_bits//8} bytes ({usable_bits//(8*1024)} KB) using {lsb_bits} LSB bits"
     }
 
-def analyze_security(image_path: str) -> float:
+def _gray_histogram(pixels: np.ndarray) -> np.ndarray:
+    """
+    256-bin histogram of the grayscale version of an 8-bit pixel array.
+    
+    Color is converted with PIL's integer ITU-R 601-2 luma transform, so the
+    result matches Image.convert('L'). Rows are processed in bands to keep
+    the uint32 temporaries small.
+    """
+    if pixels.ndim == 2 or pixels.shape[2] < 3:
+        gray = pixels if pixels.ndim == 2 else pixels[..., 0]
+        return np.bincount(gray.reshape(-1), minlength=256)
+    
+    histogram = np.zeros(256, dtype=np.int64)
+    band = max(1, (1 << 20) // max(pixels.shape[1], 1))
+    for row in range(0, pixels.shape[0], band):
+        rgb = pixels[row:row + band, :, :3].astype(np.uint32)
+        luma = rgb[..., 0] * 19595
+        luma += rgb[..., 1] * 38470
+        luma += rgb[..., 2] * 7471
+        luma += 0x8000
+        luma >>= 16
+        histogram += np.bincount(luma.reshape(-1), minlength=256)
+    return histogram
+
+def _entropy(counts: np.ndarray) -> float:
+    """Natural-log Shannon entropy of a histogram of counts."""
+    probabilities = counts[counts > 0] / counts.sum()
+    return float(-(probabilities * np.log(probabilities)).sum())
+
+def analyze_security(image_path: ImageSource, max_samples: int = None) -> float:
     """
     Analyze how detectable the steganography is.
     Returns a security score between 0 (easily detectable) and 1 (very stealthy).
     
+    All statistics come from a single 256-bin grayscale histogram.
+    
     Args:
-        image_path: Path to the image to analyze
+        image_path: Path to the image, image bytes, file-like object or pixel array
+        max_samples: Analyze an evenly strided subset of at most this many
+            pixels instead of the whole image (None for every pixel)
     
     Returns:
         Security score (0.0 to 1.0)
     """
     try:
-        img = Image.open(image_path)
-        pixels = np.array(img.convert('L'))  # Convert to grayscale for analysis
+        if isinstance(image_path, np.ndarray):
+            pixels = image_path
+        else:
+            img = _open_image(image_path)
+            if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+                img = img.convert('L')
+            pixels = np.asarray(img)
+        if pixels.dtype != np.uint8:
+            pixels = np.asarray(Image.fromarray(pixels).convert('L'))
+        
+        if max_samples is not None:
+            stride = int(np.ceil(np.sqrt(pixels.shape[0] * pixels.shape[1] / max_samples)))
+            if stride > 1:
+                pixels = pixels[::stride, ::stride]
         
         # Calculate statistical features that might indicate steganography
-        mean = np.mean(pixels)
-        std_dev = np.std(pixels)
-        entropy = stats.entropy(np.histogram(pixels, bins=256, density=True)[0])
+        histogram = _gray_histogram(pixels)
+        values = np.arange(256)
+        total = histogram.sum()
+        mean = (histogram * values).sum() / total
+        std_dev = np.sqrt((histogram * (values - mean) ** 2).sum() / total)
+        entropy = _entropy(histogram)
         
         # Analyze LSB distribution (steganography often makes LSBs more random)
-        lsb = pixels & 1
-        lsb_entropy = stats.entropy(np.histogram(lsb, bins=2, density=True)[0])
+        lsb_entropy = _entropy(np.array([histogram[0::2].sum(), histogram[1::2].sum()]))
         
         # Normalize features to 0-1 range
         normalized_std = min(std_dev / 50, 1.0)  # Assuming std_dev < 50 is normal
@@ -213,54 +923,27 @@ def analyze_security(image_path: str) -> float:
             0.4 * normalized_lsb_entropy
         )
         
-        return min(max(security_score, 0.0), 1.0)
+        return min(max(float(security_score), 0.0), 1.0)
         
     except Exception:
         # Return neutral score if analysis fails
         return 0.5
 
-def compare_images(original_path: str, stego_path: str) -> dict:
+def compare_images(original_path: ImageSource, stego_path: ImageSource,
+                   workers: int = None) -> dict:
     """
     Compare original and stego images to analyze changes.
     
+    The images are streamed in bands and compared in parallel, with all
+    sums in 64-bit arithmetic; see stego.image_compare.
+    
     Args:
-        original_path: Path to original image
-        stego_path: Path to stego image
+        original_path: Path to original image, its bytes, file-like object or pixel array
+        stego_path: Path to stego image, its bytes, file-like object or pixel array
+        workers: Threads comparing bands in parallel (None for all cores)
     
     Returns:
-        Dictionary with comparison metrics
+        Dictionary with comparison metrics, including SSIM
     """
-    original = np.array(Image.open(original_path).convert('RGB'))
-    stego = np.array(Image.open(stego_path).convert('RGB'))
-    
-    if original.shape != stego.shape:
-        raise ValueError("Images must have the same dimensions")
-    
-    # Calculate differences
-    diff = np.abs(original.astype(int) - stego.astype(int))
-    max_diff = np.max(diff)
-    avg_diff = np.mean(diff)
-    changed_pixels = np.sum(diff > 0)
-    total_pixels = original.size // 3  # RGB has 3 channels
-    
-    # Calculate PSNR (Peak Signal-to-Noise Ratio)
-    mse = np.mean((original - stego) ** 2)
-    if mse == 0:
-        psnr = float('inf')
-    else:
-        psnr = 20 * np.log10(255.0 / np.sqrt(mse))
-    
-    return {
-        'max_pixel_difference': int(max_diff),
-        'average_pixel_difference': float(avg_diff),
-        'changed_pixels': int(changed_pixels),
-        'changed_percent': float((changed_pixels / total_pixels) * 100),
-        'psnr': float(psnr),
-        'mse': float(mse),
-        'visibility': (
-            "Imperceptible" if psnr > 40 else
-            "Very slight" if psnr > 30 else
-            "Noticeable" if psnr > 20 else
-            "Very visible"
-        )
-    }
\ No newline at end of file
+    from stego.image_compare import compare_images_tiled  # image_compare imports this module
+    return compare_images_tiled(original_path, stego_path, workers=workers)
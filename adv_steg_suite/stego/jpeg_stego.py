@@ -0,0 +1,456 @@
+"""
+JSteg-style embedding in the quantized DCT coefficients of baseline JPEGs.
+
+The entropy-coded scan is Huffman-decoded into quantized 8x8 coefficient
+blocks (zigzag order, scan order) without running the inverse DCT. Payload
+bits replace the LSB of the magnitude of every AC coefficient with
+|c| >= 2; zeros and +-1 are skipped, so no coefficient changes size class
+and every Huffman code keeps its length. That lets the stego file be
+written by flipping the last value bit of each changed coefficient in the
+original bitstream: quantization tables, Huffman tables and all other
+segments are copied unchanged, and the output differs from the carrier by
+at most a few byte-stuffing bytes.
+
+Only the Huffman decode is sequential; coefficient selection, the bit
+flips and extraction are whole-array NumPy operations. Baseline
+(sequential Huffman, 8-bit, single scan) files are supported; progressive
+and arithmetic-coded JPEGs are rejected with a ValueError.
+"""
+from typing import BinaryIO, Union
+import os
+import struct
+import numpy as np
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+JpegSource = Union[str, os.PathLike, bytes, BinaryIO]
+
+# SOF markers of JPEG processes other than baseline/extended sequential Huffman
+_UNSUPPORTED_SOF = {0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def _read_source(source: JpegSource) -> bytes:
+    """File contents of a path, bytes or binary file-like object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.read()
+
+def _huffman_lookup(counts: bytes, symbols: bytes) -> list:
+    """
+    Decoding table for a JPEG Huffman table, indexed by the next 16 bits.
+
+    Each entry is (code length << 8) | symbol; 0 marks an invalid code.
+    """
+    lookup = [0] * 65536
+    code = 0
+    index = 0
+    for length in range(1, 17):
+        for _ in range(counts[length - 1]):
+            span = 1 << (16 - length)
+            start = code << (16 - length)
+            lookup[start:start + span] = [(length << 8) | symbols[index]] * span
+            code += 1
+            index += 1
+        code <<= 1
+    return lookup
+
+def _decode_interval(data: bytes, bit_base: int, mcus: int, layout: list, tables: list,
+                     first_block: int, dc: list, nonzero: tuple) -> None:
+    """
+    Huffman-decode one restart interval of MCUs.
+
+    DC coefficients are appended to dc. Every non-zero AC coefficient
+    appends its flat index (block * 64 + zigzag position), its value and
+    the stream position of its last value bit to the three nonzero lists.
+    """
+    nonzero_index, nonzero_values, nonzero_bits = nonzero
+    data += b'\x00' * 8  # Peeks may run past the last code
+    position = 0
+    predictions = [0] * len(tables)
+    block = first_block
+    for _ in range(mcus):
+        for component in layout:
+            dc_lookup, ac_lookup = tables[component]
+
+            # DC difference: Huffman code for the size, then the value bits
+            byte = position >> 3
+            window = (int.from_bytes(data[byte:byte + 7], 'big') >> (24 - (position & 7))) & 0xFFFFFFFF
+            entry = dc_lookup[window >> 16]
+            if not entry:
+                raise ValueError("Corrupt JPEG scan data")
+            length = entry >> 8
+            size = entry & 0xFF
+            value = 0
+            if size:
+                value = (window >> (32 - length - size)) & ((1 << size) - 1)
+                if value < 1 << (size - 1):
+                    value -= (1 << size) - 1
+            position += length + size
+            predictions[component] += value
+            dc.append(predictions[component])
+
+            k = 1
+            while k < 64:
+                byte = position >> 3
+                window = (int.from_bytes(data[byte:byte + 7], 'big') >> (24 - (position & 7))) & 0xFFFFFFFF
+                entry = ac_lookup[window >> 16]
+                if not entry:
+                    raise ValueError("Corrupt JPEG scan data")
+                length = entry >> 8
+                size = entry & 0x0F
+                run = (entry >> 4) & 0x0F
+                if not size:
+                    position += length
+                    if run != 15:
+                        break  # End of block
+                    k += 16
+                    continue
+                k += run
+                value = (window >> (32 - length - size)) & ((1 << size) - 1)
+                if value < 1 << (size - 1):
+                    value -= (1 << size) - 1
+                position += length + size
+                nonzero_index.append(block * 64 + k)
+                nonzero_values.append(value)
+                nonzero_bits.append(bit_base + position - 1)
+                k += 1
+            if k > 64:
+                raise ValueError("Corrupt JPEG scan data")
+            block += 1
+
+class JpegCoefficients:
+    """
+    The quantized DCT coefficients of a baseline JPEG, ready to be rewritten.
+
+    Attributes:
+        width, height: Image size in pixels
+        coefficients: int32 array (blocks, 64) in scan order, zigzag order
+            within each block
+        block_components: Component index of each block
+        quantization_tables: Dictionary of table id to (64,) zigzag array
+    """
+
+    def __init__(self, prefix: bytes, intervals: list, markers: list, suffix: bytes,
+                 width: int, height: int, coefficients: np.ndarray,
+                 block_components: np.ndarray, quantization_tables: dict,
+                 nonzero_index: np.ndarray, nonzero_bits: np.ndarray):
+        self.prefix = prefix
+        self.intervals = intervals
+        self.markers = markers
+        self.suffix = suffix
+        self.width = width
+        self.height = height
+        self.coefficients = coefficients
+        self.block_components = block_components
+        self.quantization_tables = quantization_tables
+        self.nonzero_index = nonzero_index
+        self.nonzero_bits = nonzero_bits
+
+    @classmethod
+    def load(cls, source: JpegSource) -> 'JpegCoefficients':
+        """Parse a JPEG and Huffman-decode its scan."""
+        data = _read_source(source)
+        if data[:2] != b'\xff\xd8':
+            raise ValueError("Not a JPEG file")
+
+        huffman = {}
+        quantization_tables = {}
+        frame = None
+        restart_interval = 0
+        position = 2
+        while True:
+            if position + 4 > len(data) or data[position] != 0xFF:
+                raise ValueError("Corrupt JPEG marker structure")
+            marker = data[position + 1]
+            if marker == 0xFF:  # Fill byte
+                position += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Standalone markers
+                position += 2
+                continue
+            if marker == 0xD9:
+                raise ValueError("JPEG file has no scan")
+            length = struct.unpack_from('>H', data, position + 2)[0]
+            segment = data[position + 4:position + 2 + length]
+
+            if marker in _UNSUPPORTED_SOF:
+                raise ValueError("Only baseline (sequential Huffman) JPEG files are supported")
+            if marker in (0xC0, 0xC1):
+                precision, height, width, count = struct.unpack_from('>BHHB', segment)
+                if precision != 8:
+                    raise ValueError("Only 8-bit JPEG files are supported")
+                frame = {
+                    'width': width,
+                    'height': height,
+                    'components': [(segment[6 + 3 * i], segment[7 + 3 * i] >> 4, segment[7 + 3 * i] & 0x0F)
+                                   for i in range(count)],
+                }
+            elif marker == 0xC4:
+                offset = 0
+                while offset < len(segment):
+                    table_class, table_id = segment[offset] >> 4, segment[offset] & 0x0F
+                    counts = segment[offset + 1:offset + 17]
+                    symbols = segment[offset + 17:offset + 17 + sum(counts)]
+                    huffman[table_class, table_id] = _huffman_lookup(counts, symbols)
+                    offset += 17 + sum(counts)
+            elif marker == 0xDB:
+                offset = 0
+                while offset < len(segment):
+                    table_precision, table_id = segment[offset] >> 4, segment[offset] & 0x0F
+                    dtype = '>u2' if table_precision else 'u1'
+                    quantization_tables[table_id] = np.frombuffer(
+                        segment, dtype=dtype, count=64, offset=offset + 1).astype(np.int32)
+                    offset += 1 + 64 * (2 if table_precision else 1)
+            elif marker == 0xDD:
+                restart_interval = struct.unpack_from('>H', segment)[0]
+            elif marker == 0xDA:
+                break
+            position += 2 + length
+
+        if frame is None:
+            raise ValueError("JPEG file has no baseline frame header")
+        scan_components = [segment[1 + 2 * i] for i in range(segment[0])]
+        component_ids = [component[0] for component in frame['components']]
+        if sorted(scan_components) != sorted(component_ids):
+            raise ValueError("Only single-scan JPEG files are supported")
+        scan_start = position + 2 + length
+
+        # Per scan component: (DC lookup, AC lookup) and its sampling factors
+        tables = []
+        sampling = []
+        for i, component_id in enumerate(scan_components):
+            selector = segment[2 + 2 * i]
+            try:
+                tables.append((huffman[0, selector >> 4], huffman[1, selector & 0x0F]))
+            except KeyError:
+                raise ValueError("JPEG scan references a missing Huffman table") from None
+            sampling.append(next(c[1:] for c in frame['components'] if c[0] == component_id))
+
+        max_h = max(h for h, _ in sampling)
+        max_v = max(v for _, v in sampling)
+        if len(scan_components) > 1:
+            mcus = -(-frame['width'] // (8 * max_h)) * -(-frame['height'] // (8 * max_v))
+            layout = [i for i, (h, v) in enumerate(sampling) for _ in range(h * v)]
+        else:
+            h, v = sampling[0]
+            component_width = -(-frame['width'] * h // max_h)
+            component_height = -(-frame['height'] * v // max_v)
+            mcus = -(-component_width // 8) * -(-component_height // 8)
+            layout = [0]
+
+        # Split the entropy-coded data at RST markers; any other marker ends the scan
+        raw = np.frombuffer(data, dtype=np.uint8, offset=scan_start)
+        candidates = np.flatnonzero(raw[:-1] == 0xFF)
+        following = raw[candidates + 1]
+        candidates = candidates[(following != 0x00) & (following != 0xFF)]
+        following = raw[candidates + 1]
+        is_restart = (following >= 0xD0) & (following <= 0xD7)
+        if is_restart.all():
+            raise ValueError("JPEG scan is not terminated")
+        end = candidates[np.argmin(is_restart)]
+        restarts = candidates[:np.argmin(is_restart)]
+
+        bounds = [0] + [int(r) + 2 for r in restarts] + [int(end) + 2]
+        intervals = [data[scan_start + bounds[i]:scan_start + bounds[i + 1] - 2].replace(b'\xff\x00', b'\xff')
+                     for i in range(len(bounds) - 1)]
+        markers = [data[scan_start + int(r):scan_start + int(r) + 2] for r in restarts]
+        per_interval = restart_interval or mcus
+        if len(intervals) != -(-mcus // per_interval):
+            raise ValueError("JPEG restart markers do not match the restart interval")
+
+        dc = []
+        nonzero = ([], [], [])
+        bit_base = 0
+        for i, interval in enumerate(intervals):
+            interval_mcus = min(per_interval, mcus - i * per_interval)
+            _decode_interval(interval, bit_base, interval_mcus, layout, tables,
+                             i * per_interval * len(layout), dc, nonzero)
+            bit_base += len(interval) * 8
+
+        coefficients = np.zeros((mcus * len(layout), 64), dtype=np.int32)
+        coefficients[:, 0] = dc
+        nonzero_index = np.array(nonzero[0], dtype=np.int64)
+        coefficients.reshape(-1)[nonzero_index] = nonzero[1]
+        return cls(data[:scan_start], intervals, markers, data[scan_start + int(end):],
+                   frame['width'], frame['height'], coefficients,
+                   np.tile(np.array(layout, dtype=np.int8), mcus), quantization_tables,
+                   nonzero_index, np.array(nonzero[2], dtype=np.int64))
+
+    def _stream(self) -> np.ndarray:
+        """The unstuffed scan data of all restart intervals, concatenated."""
+        return np.frombuffer(b''.join(self.intervals), dtype=np.uint8)
+
+    def usable(self) -> np.ndarray:
+        """Flat indices of the AC coefficients that carry payload (|c| >= 2), in scan order."""
+        values = self.coefficients.reshape(-1)[self.nonzero_index]
+        return np.flatnonzero(np.abs(values) >= 2)
+
+    def capacity(self) -> dict:
+        """
+        Capacity information for this JPEG.
+
+        Returns:
+            Dictionary with the usable coefficient count and capacity in bytes
+        """
+        usable = len(self.usable())
+        usable_bits = max(usable - 32, 0)  # Reserve 32 bits for length header
+        return {
+            'width': self.width,
+            'height': self.height,
+            'blocks': len(self.coefficients),
+            'usable_coefficients': usable,
+            'usable_bits': usable_bits,
+            'capacity_bytes': usable_bits // 8,
+            'message': f"Capacity: {usable_bits // 8} bytes in {usable} DCT coefficients"
+        }
+
+    def embed(self, data: bytes) -> dict:
+        """
+        Embed data into the coefficient LSBs, modifying this object.
+
+        Args:
+            data: Data to hide (prefixed with its 32-bit length)
+
+        Returns:
+            Dictionary with the number of coefficients used and changed
+        """
+        usable = self.usable()
+        payload = np.unpackbits(np.frombuffer(struct.pack('>I', len(data)) + data, dtype=np.uint8))
+        if len(payload) > len(usable):
+            raise ValueError(
+                f"Data too large for JPEG. "
+                f"Capacity: {max(len(usable) - 32, 0) // 8} bytes, "
+                f"Required: {len(data)} bytes."
+            )
+
+        selected = usable[:len(payload)]
+        flat = self.coefficients.reshape(-1)
+        values = flat[self.nonzero_index[selected]]
+        changed = selected[(np.abs(values) & 1) != payload]
+
+        # Flipping the magnitude LSB flips the last value bit in the stream
+        indices = self.nonzero_index[changed]
+        flat[indices] = np.sign(flat[indices]) * (np.abs(flat[indices]) ^ 1)
+        stream = self._stream().copy()
+        positions = self.nonzero_bits[changed]
+        np.bitwise_xor.at(stream, positions >> 3, (0x80 >> (positions & 7)).astype(np.uint8))
+
+        offsets = np.cumsum([0] + [len(interval) for interval in self.intervals])
+        self.intervals = [stream[offsets[i]:offsets[i + 1]].tobytes() for i in range(len(self.intervals))]
+        return {'coefficients_used': len(selected), 'coefficients_changed': len(changed)}
+
+    def extract(self) -> bytes:
+        """
+        Extract data hidden with embed.
+
+        Returns:
+            Extracted data bytes, or None if the JPEG is too small for a header
+        """
+        usable = self.usable()
+        if len(usable) < 32:
+            return None
+        lsbs = (np.abs(self.coefficients.reshape(-1)[self.nonzero_index[usable]]) & 1).astype(np.uint8)
+        data_length = struct.unpack('>I', np.packbits(lsbs[:32]).tobytes())[0]
+        if 32 + data_length * 8 > len(usable):
+            raise ValueError(
+                f"Declared payload length {data_length} bytes exceeds JPEG capacity "
+                f"of {(len(usable) - 32) // 8} bytes. No hidden data?"
+            )
+        return np.packbits(lsbs[32:32 + data_length * 8]).tobytes()
+
+    def to_bytes(self) -> bytes:
+        """Write the JPEG back out, re-stuffing the scan data."""
+        scan = [self.intervals[0].replace(b'\xff', b'\xff\x00')]
+        for marker, interval in zip(self.markers, self.intervals[1:]):
+            scan.append(marker)
+            scan.append(interval.replace(b'\xff', b'\xff\x00'))
+        return self.prefix + b''.join(scan) + self.suffix
+
+    def save(self, destination: Union[str, os.PathLike, BinaryIO]) -> None:
+        """Write the JPEG to a path or binary file-like object."""
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, 'wb') as f:
+                f.write(self.to_bytes())
+        else:
+            destination.write(self.to_bytes())
+
+def is_jpeg(path: Union[str, os.PathLike]) -> bool:
+    """Whether path has a JPEG file extension."""
+    return os.fspath(path).lower().endswith(JPEG_EXTENSIONS)
+
+def jpeg_capacity(source: JpegSource) -> dict:
+    """
+    Calculate the data hiding capacity of a JPEG.
+
+    Args:
+        source: Path, JPEG bytes or binary file-like object
+
+    Returns:
+        Dictionary with capacity information
+    """
+    return JpegCoefficients.load(source).capacity()
+
+def embed_jpeg_bytes(carrier: JpegSource, data: bytes) -> bytes:
+    """
+    Embeds data into the DCT coefficients of a JPEG held in memory.
+
+    Args:
+        carrier: Carrier path, JPEG bytes or binary file-like object
+        data: Data to hide
+
+    Returns:
+        Stego JPEG bytes
+    """
+    jpeg = JpegCoefficients.load(carrier)
+    jpeg.embed(data)
+    return jpeg.to_bytes()
+
+def extract_jpeg_bytes(stego_image: JpegSource) -> bytes:
+    """
+    Extracts data hidden with embed_jpeg_bytes or embed_jpeg.
+
+    Args:
+        stego_image: Stego path, JPEG bytes or binary file-like object
+
+    Returns:
+        Extracted data bytes, or None if the JPEG is too small for a header
+    """
+    return JpegCoefficients.load(stego_image).extract()
+
+def embed_jpeg(carrier_path: str, data: bytes, output_path: str) -> dict:
+    """
+    Embeds data into a JPEG file without recompressing it.
+
+    Args:
+        carrier_path: Path to a baseline JPEG carrier
+        data: Data to hide
+        output_path: Path for the stego JPEG
+
+    Returns:
+        Dictionary with coefficient counts and the carrier and output sizes
+    """
+    jpeg = JpegCoefficients.load(carrier_path)
+    result = jpeg.embed(data)
+    output = jpeg.to_bytes()
+    with open(output_path, 'wb') as f:
+        f.write(output)
+    result.update({
+        'original_size': os.path.getsize(carrier_path),
+        'output_size': len(output),
+        'output_path': output_path,
+    })
+    return result
+
+def extract_jpeg(stego_image_path: str) -> bytes:
+    """
+    Extracts data hidden with embed_jpeg from a JPEG file.
+
+    Args:
+        stego_image_path: Path to the stego JPEG
+
+    Returns:
+        Extracted data bytes, or None if the JPEG is too small for a header
+    """
+    return JpegCoefficients.load(stego_image_path).extract()
@@ -0,0 +1,152 @@
+"""
+Matrix embedding with binary Hamming codes.
+
+Each block of n = 2^k - 1 samples carries k payload bits in the syndrome of
+its LSBs: the XOR of the (1-based) positions of the samples whose LSB is 1.
+To embed a k-bit value v the block syndrome s is steered to v by flipping
+the LSB of sample s ^ v, so a block changes at most one sample instead of
+the ~k/2 that LSB replacement would change for the same bits.
+
+Larger k needs more samples per bit but changes fewer of them, so k is
+chosen as the largest value for which the payload still fits. Blocks are
+processed as whole (blocks, n) arrays; no per-block Python loop runs.
+"""
+import struct
+import numpy as np
+
+from stego.image_stego import _read_samples, _sample_view, _write_sample_values
+
+# Largest code parameter; syndromes up to 2^12 - 1 fit in uint16
+MATRIX_MAX_K = 12
+
+# Up to this block length the syndrome is accumulated column by column,
+# which beats a row-wise XOR reduction on short rows
+_COLUMN_LOOP_MAX = 15
+
+def matrix_block_size(k: int) -> int:
+    """Samples per Hamming block for code parameter k."""
+    return (1 << k) - 1
+
+def choose_matrix_k(payload_bits: int, samples: int) -> int:
+    """
+    Pick the largest code parameter whose blocks fit the payload.
+    
+    Args:
+        payload_bits: Bits to embed, including the 32-bit length header
+        samples: Carrier samples available
+    
+    Returns:
+        k between 1 (plain LSB replacement) and MATRIX_MAX_K
+    """
+    for k in range(MATRIX_MAX_K, 0, -1):
+        if -(-payload_bits // k) * matrix_block_size(k) <= samples:
+            return k
+    raise ValueError(
+        f"Data too large for image. "
+        f"Capacity: {samples // 8} bytes, "
+        f"Required: {-(-payload_bits // 8)} bytes. "
+        f"Try using more LSB bits or a larger image."
+    )
+
+def _symbols(data: bytes, k: int) -> np.ndarray:
+    """Split data into k-bit values, most significant bit first, zero-padded."""
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    bits = np.concatenate([bits, np.zeros(-len(bits) % k, dtype=np.uint8)]).reshape(-1, k)
+    symbols = np.zeros(len(bits), dtype=np.uint16)
+    for column in range(k):
+        symbols = (symbols << 1) | bits[:, column]
+    return symbols
+
+def _syndromes(lsbs: np.ndarray) -> np.ndarray:
+    """
+    Hamming syndromes of a (blocks, n) array of LSBs.
+    
+    Returns:
+        uint16 array with the XOR of the 1-based positions of set bits per block
+    """
+    blocks, n = lsbs.shape
+    if n <= _COLUMN_LOOP_MAX:
+        syndromes = np.zeros(blocks, dtype=np.uint16)
+        for column in range(n):
+            syndromes ^= lsbs[:, column] * np.uint16(column + 1)
+        return syndromes
+    return np.bitwise_xor.reduce(lsbs * np.arange(1, n + 1, dtype=np.uint16), axis=1)
+
+def _block_lsbs(samples: np.ndarray, blocks: int, k: int) -> np.ndarray:
+    """LSBs of the first blocks Hamming blocks as a (blocks, n) array."""
+    n = matrix_block_size(k)
+    return (_read_samples(samples, 0, blocks * n) & 1).reshape(blocks, n)
+
+def _read_symbols(samples: np.ndarray, bits: int, k: int) -> bytes:
+    """Decode the first bits payload bits (a multiple of 8) from block syndromes."""
+    syndromes = _syndromes(_block_lsbs(samples, -(-bits // k), k))
+    unpacked = (syndromes[:, None] >> np.arange(k - 1, -1, -1, dtype=np.uint16)) & 1
+    return np.packbits(unpacked.reshape(-1)[:bits].astype(np.uint8)).tobytes()
+
+def embed_matrix_array(pixels: np.ndarray, data: bytes, k: int, in_place: bool = False,
+                       use_alpha: bool = False) -> np.ndarray:
+    """
+    Embeds data into the LSB plane of a pixel array with a (1, 2^k - 1, k) Hamming code.
+    
+    The data is prefixed with its 32-bit length, like embed_lsb_array.
+    
+    Args:
+        pixels: Carrier pixel array
+        data: Data to hide
+        k: Code parameter (see choose_matrix_k)
+        in_place: Modify pixels directly instead of working on a copy
+        use_alpha: Also embed into the alpha channel
+    
+    Returns:
+        Stego pixel array (pixels itself when in_place is set)
+    """
+    if not 1 <= k <= MATRIX_MAX_K:
+        raise ValueError(f"k must be between 1 and {MATRIX_MAX_K}")
+    if in_place and not (pixels.flags.writeable and pixels.flags.c_contiguous):
+        raise ValueError("in_place matrix embedding needs a writable contiguous pixel array")
+    pixels = pixels if in_place else np.array(pixels, order='C')
+    samples = _sample_view(pixels, use_alpha)
+
+    symbols = _symbols(struct.pack('>I', len(data)) + data, k)
+    if len(symbols) * matrix_block_size(k) > samples.size:
+        raise ValueError(
+            f"Data too large for image. "
+            f"Capacity: {samples.size // matrix_block_size(k) * k // 8} bytes, "
+            f"Required: {len(data)+4} bytes. "
+            f"Try a smaller k or a larger image."
+        )
+
+    # Flip the sample whose position is the syndrome difference, if any
+    lsbs = _block_lsbs(samples, len(symbols), k)
+    difference = _syndromes(lsbs) ^ symbols
+    lsbs ^= np.arange(1, matrix_block_size(k) + 1, dtype=np.uint16) == difference[:, None]
+    _write_sample_values(samples, 0, lsbs.reshape(-1), 1)
+    return pixels
+
+def extract_matrix_array(pixels: np.ndarray, k: int, use_alpha: bool = False) -> bytes:
+    """
+    Extracts data hidden with embed_matrix_array.
+    
+    Args:
+        pixels: Stego pixel array
+        k: Code parameter used during embedding
+        use_alpha: Whether the alpha channel was used during embedding
+    
+    Returns:
+        Extracted data bytes, or None if the image is too small for a header
+    """
+    if not 1 <= k <= MATRIX_MAX_K:
+        raise ValueError(f"k must be between 1 and {MATRIX_MAX_K}")
+    samples = _sample_view(pixels, use_alpha)
+    capacity_bits = samples.size // matrix_block_size(k) * k
+    if capacity_bits < 32:
+        return None
+
+    data_length = struct.unpack('>I', _read_symbols(samples, 32, k))[0]
+    if (data_length + 4) * 8 > capacity_bits:
+        raise ValueError(
+            f"Declared payload length {data_length} bytes exceeds image capacity "
+            f"of {capacity_bits // 8 - 4} bytes. "
+            f"Wrong k or no hidden data."
+        )
+    return _read_symbols(samples, (data_length + 4) * 8, k)[4:]
@@ -0,0 +1,243 @@
+"""
+Memory-mapped in-place LSB embedding for uncompressed carriers.
+
+BMP, binary NetPBM (PPM/PGM) and .npy files store pixels as a raw byte array
+at a known offset. Instead of a full PIL decode and PNG re-encode, the pixel
+region of a copy of the carrier is mapped with np.memmap and only the pixel
+rows that hold payload samples are read and rewritten. The samples are
+visited in the same order PIL decodes them, so the output is also readable
+with extract_lsb.
+
+encode_data_into_image uses map_output_copy and embed_with_header_rows to
+write the stego header and encrypted payload this way.
+"""
+from typing import Union
+import os
+import shutil
+import struct
+import numpy as np
+
+from stego.image_stego import _embed_samples, _read_bytes, _sample_view
+from stego.stego_header import embed_with_header, header_pixels
+
+MAPPABLE_EXTENSIONS = ('.bmp', '.dib', '.ppm', '.pgm', '.pnm', '.npy')
+
+def _bmp_pixels(path: str, mode: str) -> np.ndarray:
+    """Map the pixel array of an uncompressed 8, 24 or 32-bit BMP in top-down RGB order."""
+    with open(path, 'rb') as f:
+        header = f.read(54)
+    if header[:2] != b'BM' or len(header) < 54:
+        raise ValueError("Not a BMP file")
+    pixel_offset = struct.unpack_from('<I', header, 10)[0]
+    width, height, _, bit_count, compression = struct.unpack_from('<iiHHI', header, 18)
+    if bit_count not in (8, 24, 32) or compression != 0:
+        raise ValueError("Only uncompressed 8, 24 and 32-bit BMP files can be mapped")
+    
+    rows = abs(height)
+    stride = (bit_count * width + 31) // 32 * 4
+    raw = np.memmap(path, dtype=np.uint8, mode=mode, offset=pixel_offset, shape=(rows, stride))
+    if height > 0:  # Bottom-up: the first stored row is the last image row
+        raw = raw[::-1]
+    
+    if bit_count == 8:
+        return raw[:, :width]
+    bytes_per_pixel = bit_count // 8
+    pixels = np.lib.stride_tricks.as_strided(
+        raw, shape=(rows, width, bytes_per_pixel),
+        strides=(raw.strides[0], bytes_per_pixel, 1), writeable=mode != 'r'
+    )
+    return pixels[..., 2::-1]  # BGR(X) on disk, RGB as PIL decodes it
+
+def _netpbm_pixels(path: str, mode: str) -> np.ndarray:
+    """Map the pixel array of a binary 8-bit PGM (P5) or PPM (P6)."""
+    with open(path, 'rb') as f:
+        head = f.read(1024)
+    
+    tokens = []
+    position = 0
+    while len(tokens) < 4:
+        if position >= len(head):
+            raise ValueError("Truncated NetPBM header")
+        if head[position:position + 1].isspace():
+            position += 1
+        elif head[position:position + 1] == b'#':
+            position = head.index(b'\n', position) + 1
+        else:
+            end = position
+            while end < len(head) and not head[end:end + 1].isspace():
+                end += 1
+            tokens.append(head[position:end])
+            position = end
+    position += 1  # Single whitespace character before the raster
+    
+    magic, width, height, max_value = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    if magic not in (b'P5', b'P6') or max_value > 255:
+        raise ValueError("Only binary 8-bit PGM (P5) and PPM (P6) files can be mapped")
+    shape = (height, width, 3) if magic == b'P6' else (height, width)
+    return np.memmap(path, dtype=np.uint8, mode=mode, offset=position, shape=shape)
+
+def map_image_pixels(path: Union[str, os.PathLike], mode: str = 'r') -> np.ndarray:
+    """
+    Memory-map the pixels of an uncompressed image file.
+    
+    Args:
+        path: Path to a BMP, binary PPM/PGM or .npy file
+        mode: 'r' for read-only or 'r+' for in-place writes
+    
+    Returns:
+        Array view of shape (height, width) or (height, width, channels) in
+        the sample order PIL uses when decoding the same file
+    """
+    path = os.fspath(path)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.bmp', '.dib'):
+        return _bmp_pixels(path, mode)
+    if extension in ('.ppm', '.pgm', '.pnm'):
+        return _netpbm_pixels(path, mode)
+    if extension == '.npy':
+        return np.load(path, mmap_mode=mode)
+    raise ValueError(f"Cannot memory-map {extension or 'extensionless'} files")
+
+def is_mappable(path: Union[str, os.PathLike]) -> bool:
+    """Whether path has an extension map_image_pixels can handle."""
+    return os.fspath(path).lower().endswith(MAPPABLE_EXTENSIONS)
+
+def _rows_for_samples(pixels: np.ndarray, sample_count: int, use_alpha: bool) -> int:
+    """Number of leading pixel rows that hold sample_count data samples."""
+    samples_per_row = _sample_view(pixels[:1], use_alpha).size
+    return -(-sample_count // samples_per_row)
+
+def _flush(pixels: np.ndarray) -> None:
+    """Flush the memory map behind a (possibly derived) pixel view."""
+    base = pixels
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    if base is not None:
+        base.flush()
+
+def map_output_copy(carrier_path: Union[str, os.PathLike],
+                    output_path: Union[str, os.PathLike]) -> np.ndarray:
+    """
+    Copy an uncompressed carrier to output_path and memory-map the copy for writing.
+    
+    The carrier is mapped read-only first, so one that cannot be mapped
+    (e.g. a compressed BMP) raises ValueError before anything is written.
+    Pass the carrier path as output_path to embed without copying.
+    
+    Returns:
+        Writable pixel view of the output file, see map_image_pixels
+    """
+    map_image_pixels(carrier_path, 'r')
+    if os.path.abspath(carrier_path) != os.path.abspath(output_path):
+        shutil.copyfile(carrier_path, output_path)
+    return map_image_pixels(output_path, 'r+')
+
+def embed_with_header_rows(pixels: np.ndarray, header: bytes, data: bytes, lsb_bits: int = 1) -> int:
+    """
+    Write a stego header and a sequential payload into a memory-mapped pixel array.
+    
+    The result is what embed_with_header writes, but only the leading rows
+    the header and payload reach are read, embedded and written back.
+    
+    Args:
+        pixels: Writable pixel view from map_output_copy
+        header: HEADER_SIZE bytes from pack_header
+        data: Payload to hide
+        lsb_bits: Number of LSB bits to use for the payload (1-4)
+    
+    Returns:
+        Number of pixel rows touched
+    """
+    channels = _sample_view(pixels[:1]).shape[1]
+    sample_count = header_pixels(pixels) * channels + -(-(len(data) + 4) * 8 // lsb_bits)
+    rows = min(_rows_for_samples(pixels, sample_count, False), pixels.shape[0])
+    
+    block = np.array(pixels[:rows])
+    embed_with_header(block, header, data, lsb_bits, in_place=True)
+    pixels[:rows] = block
+    _flush(pixels)
+    return rows
+
+def embed_lsb_mapped(carrier_path: str, data: bytes, output_path: str,
+                     lsb_bits: int = 1, use_alpha: bool = False) -> dict:
+    """
+    Embeds data into a copy of an uncompressed carrier through a memory map.
+    
+    Only the pixel rows that receive payload samples are read and written;
+    no image codec runs.
+    
+    Args:
+        carrier_path: Path to a BMP, binary PPM/PGM or .npy carrier
+        data: Data to hide
+        output_path: Path for the stego copy (same format as the carrier);
+            pass the carrier path itself to embed without copying
+        lsb_bits: Number of LSB bits to use (1-4)
+        use_alpha: Also embed into the alpha channel (.npy RGBA only)
+    
+    Returns:
+        Dictionary with the rows touched and the total rows in the image
+    """
+    if lsb_bits < 1 or lsb_bits > 4:
+        raise ValueError("lsb_bits must be between 1 and 4")
+    
+    # Validate before copying so a bad carrier leaves no output behind
+    carrier = map_image_pixels(carrier_path, 'r')
+    total_bits = _sample_view(carrier[:1], use_alpha).size * carrier.shape[0] * lsb_bits
+    required_bits = (len(data) + 4) * 8  # +4 for length header
+    if required_bits > total_bits:
+        raise ValueError(
+            f"Data too large for image. "
+            f"Capacity: {total_bits//8} bytes, "
+            f"Required: {len(data)+4} bytes. "
+            f"Try using more LSB bits or a larger image."
+        )
+    del carrier
+    
+    if os.path.abspath(carrier_path) != os.path.abspath(output_path):
+        shutil.copyfile(carrier_path, output_path)
+    pixels = map_image_pixels(output_path, 'r+')
+    
+    # Work on a copy of just the touched rows, then write them back
+    rows = _rows_for_samples(pixels, -(-required_bits // lsb_bits), use_alpha)
+    block = np.array(pixels[:rows])
+    _embed_samples(_sample_view(block, use_alpha), struct.pack('>I', len(data)) + data, lsb_bits)
+    pixels[:rows] = block
+    _flush(pixels)
+    
+    return {'rows_touched': rows, 'total_rows': pixels.shape[0], 'output_path': output_path}
+
+def extract_lsb_mapped(stego_image_path: str, lsb_bits: int = 1, use_alpha: bool = False) -> bytes:
+    """
+    Extracts data hidden in an uncompressed image through a memory map.
+    
+    Only the rows holding the length header and then the payload are read.
+    
+    Args:
+        stego_image_path: Path to a BMP, binary PPM/PGM or .npy stego image
+        lsb_bits: Number of LSB bits used during embedding
+        use_alpha: Whether the alpha channel was used during embedding
+    
+    Returns:
+        Extracted data bytes, or None if the image is too small for a header
+    """
+    if lsb_bits < 1 or lsb_bits > 4:
+        raise ValueError("lsb_bits must be between 1 and 4")
+    
+    pixels = map_image_pixels(stego_image_path, 'r')
+    total_bits = _sample_view(pixels[:1], use_alpha).size * pixels.shape[0] * lsb_bits
+    if total_bits < 32:
+        return None
+    
+    rows = _rows_for_samples(pixels, -(-32 // lsb_bits), use_alpha)
+    header_samples = _sample_view(np.array(pixels[:rows]), use_alpha)
+    data_length = struct.unpack('>I', _read_bytes(header_samples, lsb_bits, 0, 4))[0]
+    if (data_length + 4) * 8 > total_bits:
+        raise ValueError(
+            f"Declared payload length {data_length} bytes exceeds image capacity "
+            f"of {total_bits // 8 - 4} bytes. "
+            f"Wrong lsb_bits or no hidden data."
+        )
+    
+    rows = _rows_for_samples(pixels, -(-(data_length + 4) * 8 // lsb_bits), use_alpha)
+    samples = _sample_view(np.array(pixels[:rows]), use_alpha)
+    return _read_bytes(samples, lsb_bits, 4, data_length)
@@ -0,0 +1,286 @@
+"""
+Directory scanner: capacity, security score and steganalysis for every image
+under a directory tree, run in a process pool and streamed as result dicts.
+
+Results are cached in a small SQLite index keyed by the SHA-256 of the file
+contents and ANALYZER_VERSION, so a re-scan only analyzes new or changed
+files. A second table remembers (size, mtime) per path so unchanged files
+are not even re-hashed. Each worker process opens one read connection to
+the index; only the parent process writes it.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator
+import hashlib
+import json
+import os
+import sqlite3
+from PIL import Image
+
+from stego.advanced_stego import analyze_stego_security
+from stego.image_stego import LoadedImage, calculate_capacity, compare_images
+from stego.jpeg_stego import extract_jpeg_bytes, is_jpeg
+from stego.stego_header import read_header, unpack_header
+
+# Bump whenever analyze_file results change, so cached results are redone.
+# Version 2: comparisons are tiled, with 64-bit sums and SSIM.
+# Version 3: JPEG headers are read from the DCT coefficients.
+ANALYZER_VERSION = '3'
+
+IMAGE_EXTENSIONS = ('.png', '.bmp', '.tif', '.tiff', '.ppm', '.pgm', '.jpg', '.jpeg', '.webp')
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Modes whose decoded pixel array compare_images reads back as the same RGB
+_ARRAY_COMPARE_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+# Read connection to the index in a pool worker, see _init_worker
+_worker_cache = None
+
+class ScanCache:
+    """
+    SQLite index of scan results.
+    
+    results maps (sha256, analyzer version, reference sha256) to the JSON
+    result; files maps a path to the (size, mtime_ns, sha256) it had when
+    last hashed.
+    """
+    
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "sha256 TEXT, version TEXT, reference TEXT, result TEXT, "
+            "PRIMARY KEY (sha256, version, reference))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)"
+        )
+        self.connection.commit()
+    
+    def known_digest(self, path: str, stat: os.stat_result) -> str:
+        """The digest recorded for path, if its size and mtime are unchanged."""
+        row = self.connection.execute(
+            "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def get(self, digest: str, reference: str = '') -> dict:
+        """Cached result for a digest, or None."""
+        row = self.connection.execute(
+            "SELECT result FROM results WHERE sha256 = ? AND version = ? AND reference = ?",
+            (digest, ANALYZER_VERSION, reference)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def put(self, path: str, stat: os.stat_result, digest: str, result: dict,
+            reference: str = '') -> None:
+        """Store a result and the file state it was computed for."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, digest)
+        )
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (digest, ANALYZER_VERSION, reference, json.dumps(result))
+        )
+    
+    def commit(self) -> None:
+        """Write pending results to disk."""
+        self.connection.commit()
+    
+    def close(self) -> None:
+        """Commit and close the index."""
+        self.connection.commit()
+        self.connection.close()
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def iter_image_files(root: str) -> Iterator[str]:
+    """Yield image paths under root in a stable (sorted) order."""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(directory, name)
+
+def _read_jpeg_header(path: str) -> dict:
+    """Stego header of a JPEG, read from its DCT coefficients like the decoder does."""
+    try:
+        embedded = extract_jpeg_bytes(path)
+    except ValueError:
+        return None  # Unsupported JPEG (e.g. progressive) or no embedded length
+    return unpack_header(embedded or b'')
+
+def analyze_file(path: str, reference_path: str = None) -> dict:
+    """
+    Capacity, security score, steganalysis and header detection for one image.
+    
+    The image is decoded once and every analysis works on the same pixels.
+    
+    Args:
+        path: Image to analyze
+        reference_path: Original carrier to compare against (optional)
+    
+    Returns:
+        Dictionary of JSON-serializable results
+    """
+    from stego.steganalysis import analyze_stack  # Keeps scipy out of pool startup
+    
+    image = LoadedImage.load(path)
+    capacity = calculate_capacity(image.pixels)
+    security = analyze_stego_security(image.pixels)
+    header = _read_jpeg_header(path) if is_jpeg(path) else read_header(image.pixels)
+    if header and header['salt'] is not None:
+        header['salt'] = header['salt'].hex()  # Keep the report JSON-serializable
+    
+    result = {
+        'width': capacity['width'],
+        'height': capacity['height'],
+        'channels': capacity['channels'],
+        'capacity_bytes': capacity['capacity_bytes'],
+        'security_score': security['security_score'],
+        'security_level': security['security_level'],
+        'stego_header': header,
+    }
+    if image.pixels.dtype.name == 'uint8' and capacity['width'] >= 4:
+        result.update(analyze_stack([image.pixels])[0])
+    if reference_path is not None:
+        # Compare against the decoded pixels; palette and other modes are re-read as RGB.
+        # One thread per file: the process pool already uses every core.
+        with Image.open(path) as opened:
+            stego = image.pixels if opened.mode in _ARRAY_COMPARE_MODES else path
+        result['comparison'] = compare_images(reference_path, stego, workers=1)
+    return result
+
+def _init_worker(cache_path: str) -> None:
+    """Pool initializer: open the worker's read connection to the index."""
+    global _worker_cache
+    _worker_cache = ScanCache(cache_path) if cache_path is not None else None
+
+def _scan_one(path: str, digest: str, reference_path: str, cache: ScanCache = None) -> dict:
+    """
+    Pool task: hash a file if needed, then reuse a cached result or analyze it.
+    
+    In-process scans pass the parent's cache; pool workers use the
+    connection from _init_worker. Only the parent process writes the cache.
+    """
+    if cache is None:
+        cache = _worker_cache
+    result = {'path': path}
+    try:
+        result['sha256'] = digest or file_digest(path)
+        reference = file_digest(reference_path) if reference_path else ''
+        result['reference_sha256'] = reference
+        cached = cache.get(result['sha256'], reference) if cache is not None else None
+        result['cached'] = cached is not None
+        result.update(cached if cached is not None else analyze_file(path, reference_path))
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+def scan_directory(root: str, cache_path: str = None, workers: int = None,
+                   reference_root: str = None) -> Iterator[dict]:
+    """
+    Analyze every image under root, yielding one result dict per file.
+    
+    Results arrive in completion order. Files whose size and mtime match
+    the index, and whose content hash has a result for this analyzer
+    version, are answered from the cache without being opened.
+    
+    Args:
+        root: Directory tree to scan
+        cache_path: SQLite index file to reuse and update (None disables caching)
+        workers: Worker processes (None for one per CPU core, 1 for in-process)
+        reference_root: Tree with the original carriers at the same relative
+            paths; matching files are compared with compare_images
+    
+    Yields:
+        Result dictionaries with 'path', 'sha256', 'analyzer_version' and
+        'cached', plus the analysis results or an 'error'
+    """
+    cache = ScanCache(cache_path) if cache_path is not None else None
+    workers = workers or os.cpu_count() or 1
+    
+    def tasks():
+        for path in iter_image_files(root):
+            stat = os.stat(path)
+            reference_path = None
+            if reference_root is not None:
+                candidate = os.path.join(reference_root, os.path.relpath(path, root))
+                reference_path = candidate if os.path.exists(candidate) else None
+            digest = cache.known_digest(path, stat) if cache is not None else None
+            if digest is not None and reference_path is None:
+                cached = cache.get(digest)
+                if cached is not None:
+                    yield stat, None, dict(cached, path=path, sha256=digest,
+                                           reference_sha256='', cached=True)
+                    continue
+            yield stat, (path, digest, reference_path), None
+    
+    def finish(stat: os.stat_result, result: dict) -> dict:
+        if cache is not None and 'error' not in result:
+            analysis = {key: value for key, value in result.items()
+                        if key not in ('path', 'sha256', 'reference_sha256', 'cached')}
+            cache.put(result['path'], stat, result['sha256'], analysis,
+                      result['reference_sha256'])
+        result['analyzer_version'] = ANALYZER_VERSION
+        return result
+    
+    try:
+        if workers == 1:
+            for stat, task, cached in tasks():
+                yield finish(stat, cached if task is None else _scan_one(*task, cache))
+            return
+        
+        # Keep a bounded number of tasks in flight so huge trees stream
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(cache_path,)) as pool:
+            pending = {}
+            for stat, task, cached in tasks():
+                if task is None:
+                    yield finish(stat, cached)
+                    continue
+                pending[pool.submit(_scan_one, *task)] = stat
+                if len(pending) >= workers * 4:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield finish(pending.pop(future), future.result())
+                    if cache is not None:
+                        cache.commit()
+            for future in list(pending):
+                yield finish(pending.pop(future), future.result())
+    finally:
+        if cache is not None:
+            cache.close()
+
+def scan_to_jsonl(root: str, output, cache_path: str = None, workers: int = None,
+                  reference_root: str = None) -> dict:
+    """
+    Scan a directory tree and write one JSON object per line to output.
+    
+    Args:
+        root: Directory tree to scan
+        output: Writable text file-like object
+        cache_path: SQLite index file (None disables caching)
+        workers: Worker processes (None for one per CPU core)
+        reference_root: Tree with the original carriers, see scan_directory
+    
+    Returns:
+        Dictionary with counts of scanned, cached and failed files
+    """
+    counts = {'scanned': 0, 'cached': 0, 'errors': 0}
+    for result in scan_directory(root, cache_path, workers, reference_root):
+        output.write(json.dumps(result) + '\n')
+        counts['scanned'] += 1
+        counts['cached'] += bool(result.get('cached'))
+        counts['errors'] += 'error' in result
+    return counts
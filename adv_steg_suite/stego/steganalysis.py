@@ -0,0 +1,185 @@
+"""
+Statistical LSB steganalysis: the chi-square attack and RS analysis.
+
+Both detectors work on a stack of same-sized images at once and estimate
+the embedding rate, i.e. the fraction of data samples whose LSB carries
+payload. Every step is a whole-array NumPy operation over the stack.
+"""
+from typing import Sequence, Union
+import numpy as np
+
+# Mask used for RS groups of four horizontally adjacent samples
+RS_MASK = np.array([0, 1, 1, 0], dtype=bool)
+
+# A chi-square prefix with a p-value above this counts as embedded
+CHI_SQUARE_THRESHOLD = 0.5
+
+# Pairs of values need this many expected samples to enter the statistic
+_MIN_EXPECTED = 5
+
+def _as_stack(images: Union[np.ndarray, Sequence[np.ndarray]]) -> np.ndarray:
+    """
+    Stack same-sized images as an (images, height, width, channels) uint8 array.
+    
+    Alpha is dropped the same way the embedder skips it: at most the first
+    three channels of color images are kept.
+    """
+    stack = images if isinstance(images, np.ndarray) else np.stack(list(images))
+    if stack.dtype != np.uint8:
+        raise ValueError("Steganalysis needs 8-bit images")
+    if stack.ndim == 3:
+        stack = stack[..., None]
+    if stack.ndim != 4:
+        raise ValueError("Expected a stack of images shaped (N, H, W) or (N, H, W, C)")
+    return stack[..., :3]
+
+def chi_square_attack(images: Union[np.ndarray, Sequence[np.ndarray]], segments: int = 100) -> dict:
+    """
+    Pairs-of-values chi-square attack (Westfeld and Pfitzmann).
+    
+    LSB replacement evens out the counts of each value pair (2k, 2k+1).
+    The statistic is computed for growing prefixes of the samples in
+    embedding order, from cumulative per-segment histograms, and the
+    embedding rate is the longest prefix that still looks embedded. This
+    targets sequential embedding; scattered payloads raise the p-value of
+    every prefix equally.
+    
+    Args:
+        images: Stack (N, H, W[, C]) or sequence of same-sized 8-bit images
+        segments: Number of prefixes to test
+    
+    Returns:
+        Dictionary with 'p_values' (N, segments) for each prefix and the
+        estimated 'embedding_rate' (N,)
+    """
+    from scipy.special import chdtrc  # Only the detectors need scipy
+    
+    stack = _as_stack(images)
+    samples = stack.reshape(len(stack), -1)
+    count, length = samples.shape
+    segments = max(1, min(segments, length))
+    
+    # One bincount over (image, segment, value) for the whole stack
+    segment_index = np.arange(length) * segments // length
+    keys = (np.arange(count)[:, None] * segments + segment_index) * 256 + samples
+    histograms = np.bincount(keys.reshape(-1), minlength=count * segments * 256)
+    cumulative = histograms.reshape(count, segments, 128, 2).cumsum(axis=1)
+    
+    expected = cumulative.sum(axis=3) / 2
+    valid = expected >= _MIN_EXPECTED
+    deviation = (cumulative[..., 0] - expected) ** 2 / np.where(valid, expected, 1)
+    chi_square = np.where(valid, deviation, 0).sum(axis=2)
+    dof = np.maximum(valid.sum(axis=2) - 1, 1)
+    p_values = np.where(valid.any(axis=2), chdtrc(dof, chi_square), 0.0)
+    
+    # Length of the longest prefix whose p-value stays above the threshold
+    embedded = p_values > CHI_SQUARE_THRESHOLD
+    last = segments - np.argmax(embedded[:, ::-1], axis=1)
+    rate = np.where(embedded.any(axis=1), last / segments, 0.0)
+    
+    return {
+        'p_values': p_values,
+        'embedding_rate': rate,
+    }
+
+def _flip(groups: np.ndarray, negative: bool) -> np.ndarray:
+    """Apply F1 (or F-1 when negative) to the masked samples of each group."""
+    flipped = groups.copy()
+    masked = flipped[..., RS_MASK]
+    flipped[..., RS_MASK] = ((masked + 1) ^ 1) - 1 if negative else masked ^ 1
+    return flipped
+
+def _regular_singular(groups: np.ndarray) -> np.ndarray:
+    """
+    Relative R_M, S_M, R_-M and S_-M counts per image and channel.
+    
+    Args:
+        groups: int16 array (N, groups, C, 4)
+    
+    Returns:
+        Array (4, N, C)
+    """
+    smoothness = np.abs(np.diff(groups, axis=-1)).sum(axis=-1)
+    counts = []
+    for negative in (False, True):
+        flipped = np.abs(np.diff(_flip(groups, negative), axis=-1)).sum(axis=-1)
+        counts.append((flipped > smoothness).mean(axis=1))
+        counts.append((flipped < smoothness).mean(axis=1))
+    return np.array(counts)
+
+def _rs_estimate(original: np.ndarray, flipped: np.ndarray) -> np.ndarray:
+    """Solve the RS quadratic for the embedding rate, elementwise."""
+    d0 = original[0] - original[1]
+    d1 = flipped[0] - flipped[1]
+    n0 = original[2] - original[3]
+    n1 = flipped[2] - flipped[3]
+    
+    a = 2 * (d1 + d0)
+    b = n0 - n1 - d1 - 3 * d0
+    c = d0 - n0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(np.maximum(b * b - 4 * a * c, 0))
+        roots = np.stack([(-b + root) / (2 * a), (-b - root) / (2 * a)])
+        # Degenerate (linear) case when a == 0
+        roots = np.where(a == 0, -c / np.where(b == 0, 1, b), roots)
+        z = np.take_along_axis(roots, np.abs(roots).argmin(axis=0)[None], axis=0)[0]
+        rate = z / (z - 0.5)
+    return np.clip(np.nan_to_num(rate), 0.0, 1.0)
+
+def rs_analysis(images: Union[np.ndarray, Sequence[np.ndarray]]) -> dict:
+    """
+    Regular/Singular group analysis (Fridrich, Goljan and Du).
+    
+    Samples are split into groups of four horizontally adjacent values per
+    channel. The share of regular and singular groups under the mask
+    [0, 1, 1, 0] and its negation, measured on the image and on the image
+    with all LSBs flipped, gives a quadratic whose smaller root estimates
+    the embedding rate. Works regardless of the embedding order.
+    
+    Args:
+        images: Stack (N, H, W[, C]) or sequence of same-sized 8-bit images
+    
+    Returns:
+        Dictionary with 'channel_rates' (N, C) and their mean as the
+        estimated 'embedding_rate' (N,)
+    """
+    stack = _as_stack(images)
+    count, height, width, channels = stack.shape
+    usable = width - width % 4
+    if usable == 0:
+        raise ValueError("Images must be at least 4 pixels wide for RS analysis")
+    
+    # (N, H, W/4, 4, C) -> (N, groups, C, 4)
+    groups = stack[:, :, :usable].astype(np.int16).reshape(count, height, usable // 4, 4, channels)
+    groups = groups.transpose(0, 1, 2, 4, 3).reshape(count, -1, channels, 4)
+    
+    original = _regular_singular(groups)
+    flipped = _regular_singular(groups ^ 1)
+    channel_rates = _rs_estimate(original, flipped)
+    
+    return {
+        'channel_rates': channel_rates,
+        'embedding_rate': channel_rates.mean(axis=1),
+    }
+
+def analyze_stack(images: Union[np.ndarray, Sequence[np.ndarray]], segments: int = 100) -> list:
+    """
+    Run both detectors over a stack of same-sized images.
+    
+    Args:
+        images: Stack (N, H, W[, C]) or sequence of same-sized 8-bit images
+        segments: Number of prefixes for the chi-square attack
+    
+    Returns:
+        One dictionary per image with the chi-square and RS embedding rates
+    """
+    stack = _as_stack(images)
+    chi_square = chi_square_attack(stack, segments)
+    rs = rs_analysis(stack)
+    return [
+        {
+            'chi_square_rate': float(chi_square['embedding_rate'][i]),
+            'rs_rate': float(rs['embedding_rate'][i]),
+        }
+        for i in range(len(stack))
+    ]
@@ -0,0 +1,245 @@
+"""
+Self-describing header for stego images.
+
+The header sits in the least significant bit of the first samples of the
+image, always at 1 LSB and in sequential order, so a decoder can read it
+without knowing how the payload was embedded. It records the magic,
+format version, LSB depth, embedding mode, compression codec and a CRC32
+of the embedded payload, and ends with a CRC32 of its own fields so
+ordinary images are rejected after a short read. The payload CRC lets a
+decoder reject damaged or foreign payloads before running the KDF. For
+the 'scatter' mode it also records the scrypt salt and parameters of the
+session key that both encrypts the payload and orders its samples, so the
+order is known before the payload is extracted.
+
+The header has a fixed size, HEADER_SIZE bytes, so it always fills the
+same leading pixels. The payload follows in the pixels after the header region, in the
+embed_lsb_array format (32-bit length, then the bytes).
+"""
+import os
+import struct
+import zlib
+import numpy as np
+
+from stego.image_stego import (ImageSource, _embed_samples, _read_bytes, _sample_view,
+                               embed_lsb_array, extract_lsb_array, load_image_array)
+from stego.matrix_stego import embed_matrix_array, extract_matrix_array
+from stego.stream_stego import iter_carrier_bands
+
+HEADER_MAGIC = b'ASTG'
+HEADER_VERSION = 1
+
+# magic, version, lsb_bits, mode, mode_param, flags, codec, payload CRC32,
+# scrypt salt, log2 n, r, p; followed by a CRC32 of these fields
+_HEADER_FORMAT = '>4sBBBBBBI16sBBB'
+HEADER_SIZE = struct.calcsize(_HEADER_FORMAT) + 4
+HEADER_SAMPLES = HEADER_SIZE * 8
+
+# 'jsteg' marks payloads in JPEG DCT coefficients, see stego.jpeg_stego
+EMBEDDING_MODES = ('sequential', 'scatter', 'matrix', 'adaptive', 'jsteg')
+CODECS = ('none', 'zlib')
+
+FLAG_COMPRESSED = 0x01
+# Set when the payload CRC was unknown at embedding time (streamed payloads)
+FLAG_NO_PAYLOAD_CRC = 0x02
+
+def pack_header(lsb_bits: int, embedding_mode: str = 'sequential', codec: str = 'none',
+                mode_param: int = 0, payload_crc: int = 0, salt: bytes = None,
+                kdf_params: tuple = None) -> bytes:
+    """
+    Build the header bytes for a stego image.
+    
+    Args:
+        lsb_bits: LSB depth of the payload (1-4)
+        embedding_mode: How payload samples are ordered
+        codec: Compression applied before encryption
+        mode_param: Mode specific parameter: the Hamming code k for
+            'matrix', 0 when unused
+        payload_crc: zlib.crc32 of the embedded payload, or None when the
+            payload is streamed and not known before the header is written
+        salt: scrypt salt of the session key the payload order is derived
+            from, for 'scatter' (zeros when unused)
+        kdf_params: scrypt (n, r, p) of that session key (zeros when unused)
+    
+    Returns:
+        HEADER_SIZE bytes ending in a CRC32 of the fields
+    """
+    if embedding_mode not in EMBEDDING_MODES:
+        raise ValueError(f"embedding_mode must be one of {', '.join(EMBEDDING_MODES)}")
+    if codec not in CODECS:
+        raise ValueError(f"codec must be one of {', '.join(CODECS)}")
+    
+    flags = FLAG_COMPRESSED if codec != 'none' else 0
+    if payload_crc is None:
+        flags |= FLAG_NO_PAYLOAD_CRC
+    n, r, p = kdf_params or (1, 0, 0)
+    fields = struct.pack(_HEADER_FORMAT, HEADER_MAGIC, HEADER_VERSION, lsb_bits,
+                         EMBEDDING_MODES.index(embedding_mode), mode_param, flags,
+                         CODECS.index(codec), payload_crc or 0, salt or bytes(16),
+                         n.bit_length() - 1, r, p)
+    return fields + struct.pack('>I', zlib.crc32(fields))
+
+def unpack_header(raw: bytes) -> dict:
+    """
+    Parse header bytes.
+    
+    Args:
+        raw: The bytes read from the header region, at least HEADER_SIZE
+    
+    Returns:
+        Dictionary of header fields, or None if raw is not a valid header;
+        'payload_crc' is None for streamed payloads, 'salt' and
+        'kdf_params' None when the embedding order is unkeyed
+    """
+    if len(raw) < HEADER_SIZE or raw[:4] != HEADER_MAGIC:
+        return None
+    fields = raw[:HEADER_SIZE - 4]
+    if struct.unpack('>I', raw[HEADER_SIZE - 4:HEADER_SIZE])[0] != zlib.crc32(fields):
+        return None
+    
+    (_, version, lsb_bits, mode, mode_param, flags, codec,
+     payload_crc, salt, log_n, r, p) = struct.unpack(_HEADER_FORMAT, fields)
+    if (version != HEADER_VERSION or not 1 <= lsb_bits <= 4
+            or mode >= len(EMBEDDING_MODES) or codec >= len(CODECS)):
+        return None
+    
+    return {
+        'version': version,
+        'lsb_bits': lsb_bits,
+        'embedding_mode': EMBEDDING_MODES[mode],
+        'mode_param': mode_param,
+        'compressed': bool(flags & FLAG_COMPRESSED),
+        'codec': CODECS[codec],
+        'payload_crc': None if flags & FLAG_NO_PAYLOAD_CRC else payload_crc,
+        'salt': salt if log_n else None,
+        'kdf_params': (1 << log_n, r, p) if log_n else None,
+    }
+
+def header_pixels(pixels: np.ndarray) -> int:
+    """Number of leading pixels reserved for the header."""
+    channels = _sample_view(pixels[:1]).shape[1]
+    return -(-HEADER_SAMPLES // channels)
+
+def payload_region(pixels: np.ndarray) -> np.ndarray:
+    """
+    The pixels after the header region, as a (pixels, 1, channels) array.
+    
+    The region is a view of contiguous pixel arrays, so embedding into it
+    writes through to pixels.
+    """
+    if pixels.ndim == 2:
+        return pixels.reshape(-1, 1)[header_pixels(pixels):]
+    return pixels.reshape(-1, 1, pixels.shape[2])[header_pixels(pixels):]
+
+def read_header(pixels: np.ndarray) -> dict:
+    """
+    Read the header from the first samples of a pixel array.
+    
+    Args:
+        pixels: Decoded image pixels
+    
+    Returns:
+        Dictionary of header fields, or None if the image carries no header
+    """
+    samples = _sample_view(pixels)
+    if samples.size < HEADER_SAMPLES:
+        return None
+    # Check the magic before reading the rest of the header
+    if _read_bytes(samples, 1, 0, len(HEADER_MAGIC)) != HEADER_MAGIC:
+        return None
+    return unpack_header(_read_bytes(samples, 1, 0, HEADER_SIZE))
+
+def probe_header(source: ImageSource) -> dict:
+    """
+    Read the header of an image source, decoding as little as possible.
+    
+    PNG and .npy files are read band by band and only the leading rows
+    are decoded; other sources are decoded in full.
+    
+    Args:
+        source: Path, image bytes, file-like object or pixel array
+    
+    Returns:
+        Dictionary of header fields, or None if the image carries no header
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return read_header(load_image_array(source))
+    
+    width, _, _, bands = iter_carrier_bands(source, band_height=1)
+    rows = []
+    try:
+        for band in bands:
+            rows.append(band)
+            if len(rows) * width >= header_pixels(band):
+                break
+    finally:
+        bands.close()
+    return read_header(np.concatenate(rows)) if rows else None
+
+def embed_with_header(pixels: np.ndarray, header: bytes, data: bytes, lsb_bits: int = 1,
+                      workers: int = 1, in_place: bool = False,
+                      scatter_key: bytes = None, matrix_k: int = None,
+                      adaptive: bool = False) -> np.ndarray:
+    """
+    Write the header and then the payload after the header region.
+    
+    Args:
+        pixels: Carrier pixel array
+        header: HEADER_SIZE bytes from pack_header
+        data: Payload to hide
+        lsb_bits: Number of LSB bits to use for the payload (1-4)
+        workers: Threads to split the work across (None for all cores)
+        in_place: Modify pixels directly instead of working on a copy
+        scatter_key: Scatter the payload samples over the region with this key
+        matrix_k: Matrix-embed the payload with this Hamming code parameter
+            instead (lsb_bits and scatter_key are then unused)
+        adaptive: Rank the pixels after the header region by texture and
+            fill the busiest first
+    
+    Returns:
+        Stego pixel array (pixels itself when in_place is set)
+    """
+    if in_place and not pixels.flags.c_contiguous:
+        raise ValueError("in_place embedding needs a contiguous pixel array")
+    pixels = pixels if in_place else np.array(pixels, order='C')
+    if len(header) != HEADER_SIZE:
+        raise ValueError(f"Stego headers are {HEADER_SIZE} bytes")
+    if _sample_view(pixels).size < HEADER_SAMPLES:
+        raise ValueError("Image too small for a stego header")
+    
+    if matrix_k is not None:
+        embed_matrix_array(payload_region(pixels), data, matrix_k, in_place=True)
+    elif adaptive:
+        # The texture map needs the image layout, so rank the whole image
+        # and leave the header pixels out
+        embed_lsb_array(pixels, data, lsb_bits, in_place=True, adaptive=True,
+                        reserved_pixels=header_pixels(pixels))
+    else:
+        embed_lsb_array(payload_region(pixels), data, lsb_bits, workers,
+                        in_place=True, scatter_key=scatter_key)
+    _embed_samples(_sample_view(pixels), header, 1)
+    return pixels
+
+def extract_with_header(pixels: np.ndarray, header: dict, workers: int = 1,
+                        scatter_key: bytes = None) -> bytes:
+    """
+    Extract the payload that follows a header read with read_header.
+    
+    Args:
+        pixels: Stego pixel array
+        header: Parsed header of the image
+        workers: Threads to split the work across (None for all cores)
+        scatter_key: Key the payload was scattered with, if any
+    
+    Returns:
+        Extracted payload bytes
+    """
+    if header['embedding_mode'] == 'jsteg':
+        raise ValueError("Header describes a JPEG payload; decode it with decode_data_from_jpeg")
+    region = payload_region(np.ascontiguousarray(pixels))
+    if header['embedding_mode'] == 'matrix':
+        return extract_matrix_array(region, header['mode_param'])
+    if header['embedding_mode'] == 'adaptive':
+        return extract_lsb_array(pixels, header['lsb_bits'], adaptive=True,
+                                 reserved_pixels=header_pixels(pixels))
+    return extract_lsb_array(region, header['lsb_bits'], workers, scatter_key=scatter_key)
@@ -0,0 +1,399 @@
+"""
+Row-band streaming LSB embedding and extraction for images larger than RAM.
+
+The carrier is decoded one horizontal band at a time, the next slice of the
+payload is embedded into the band, and the band is handed to an incremental
+PNG writer. Only one band of pixels, plus one band of compressed output, is
+held in memory at once. The embedded layout is the same as embed_lsb, so
+streamed images can be read with extract_lsb and vice versa. With a stego
+header the layout matches stego_header.embed_with_header in sequential mode:
+the header sits at 1 LSB in the leading samples and the payload starts in
+the first pixel after it.
+"""
+from PIL import Image
+from typing import Iterable, Iterator, Union
+import io
+import os
+import struct
+import zlib
+import numpy as np
+
+from stego.image_stego import _read_bytes, _sample_values, _sample_view, _write_sample_values
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG colour types with 8-bit samples, mapped to PIL modes and channel counts
+_PNG_COLOR_TYPES = {0: ('L', 1), 2: ('RGB', 3), 4: ('LA', 2), 6: ('RGBA', 4)}
+_PNG_MODES = {mode: (color_type, channels) for color_type, (mode, channels) in _PNG_COLOR_TYPES.items()}
+
+# Uncompressed data per IDAT chunk written by PngBandWriter
+_IDAT_CHUNK_SIZE = 1 << 20
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Serialize one PNG chunk with its length and CRC."""
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+class PngBandReader:
+    """
+    Decode a non-interlaced 8-bit PNG one band of rows at a time.
+    
+    IDAT data is inflated incrementally. PNG row filters are undone by PIL's
+    C decoder: each band is wrapped, together with the previous unfiltered
+    row, in a small stored (uncompressed) PNG, so Average and Paeth rows cost
+    no per-pixel Python work.
+    """
+    
+    def __init__(self, path: Union[str, os.PathLike]):
+        self._file = open(path, 'rb')
+        if self._file.read(8) != PNG_SIGNATURE:
+            self._file.close()
+            raise ValueError("Not a PNG file")
+        
+        length, chunk_type = struct.unpack('>I4s', self._file.read(8))
+        header = self._file.read(length)
+        self._file.read(4)  # CRC
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', header)
+        if chunk_type != b'IHDR' or bit_depth != 8 or color_type not in _PNG_COLOR_TYPES or interlace:
+            self._file.close()
+            raise ValueError(
+                "Streaming supports non-interlaced 8-bit grayscale, RGB and RGBA PNGs only. "
+                "Use embed_lsb for other carriers."
+            )
+        
+        self.width = width
+        self.height = height
+        self.mode, self.channels = _PNG_COLOR_TYPES[color_type]
+        self._color_type = color_type
+        self._stride = 1 + width * self.channels
+    
+    def _idat_data(self) -> Iterator[bytes]:
+        """Yield the payload of each IDAT chunk, in file order."""
+        while True:
+            length, chunk_type = struct.unpack('>I4s', self._file.read(8))
+            if chunk_type == b'IEND':
+                return
+            data = self._file.read(length)
+            self._file.read(4)  # CRC
+            if chunk_type == b'IDAT':
+                yield data
+    
+    def _unfilter(self, filtered: bytes, previous_row: bytes, rows: int) -> np.ndarray:
+        """Undo PNG filtering for rows of filtered data that follow previous_row."""
+        header = struct.pack('>IIBBBBB', self.width, rows + 1, 8, self._color_type, 0, 0, 0)
+        raw = b'\x00' + previous_row + filtered  # Previous row stored unfiltered
+        png = (PNG_SIGNATURE + _png_chunk(b'IHDR', header)
+               + _png_chunk(b'IDAT', zlib.compress(raw, 0)) + _png_chunk(b'IEND', b''))
+        return np.array(Image.open(io.BytesIO(png)))[1:]
+    
+    def iter_bands(self, band_height: int = 64) -> Iterator[np.ndarray]:
+        """
+        Yield the image as consecutive bands of at most band_height rows.
+        
+        Args:
+            band_height: Rows per band
+        
+        Returns:
+            Iterator of (rows, width) or (rows, width, channels) uint8 arrays
+        """
+        inflater = zlib.decompressobj()
+        pending = bytearray()
+        previous_row = bytes(self.width * self.channels)  # The row above row 0 is all zeros
+        rows_left = self.height
+        idat = self._idat_data()
+        compressed = b''
+        
+        while rows_left:
+            rows = min(band_height, rows_left)
+            needed = rows * self._stride
+            while len(pending) < needed:
+                if not compressed:
+                    compressed = next(idat, None)
+                    if compressed is None:
+                        raise ValueError("PNG image data ended early")
+                # Bound the output: one IDAT chunk of a flat image can inflate to gigabytes
+                pending += inflater.decompress(compressed, needed - len(pending))
+                compressed = inflater.unconsumed_tail
+            band = self._unfilter(bytes(pending[:needed]), previous_row, rows)
+            del pending[:needed]
+            previous_row = band[-1].tobytes()
+            rows_left -= rows
+            yield band
+    
+    def close(self) -> None:
+        """Close the underlying file."""
+        self._file.close()
+    
+    def __enter__(self) -> 'PngBandReader':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class PngBandWriter:
+    """
+    Write a PNG incrementally, one band of rows at a time.
+    
+    Rows use the PNG Up filter, computed for a whole band with one
+    subtraction, and are deflated as they arrive.
+    """
+    
+    def __init__(self, path: Union[str, os.PathLike], width: int, height: int, mode: str,
+                 compress_level: int = 6):
+        if mode not in _PNG_MODES:
+            raise ValueError(f"Unsupported mode for streaming output: {mode}")
+        color_type, self.channels = _PNG_MODES[mode]
+        self.width = width
+        self.height = height
+        self._rows_written = 0
+        self._previous_row = np.zeros(width * self.channels, dtype=np.uint8)
+        self._deflater = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        self._file.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)))
+    
+    def write_band(self, band: np.ndarray) -> None:
+        """Filter, compress and write the next band of rows."""
+        rows = band.reshape(band.shape[0], -1)
+        if rows.shape[1] != self.width * self.channels:
+            raise ValueError("Band width does not match the image")
+        if self._rows_written + rows.shape[0] > self.height:
+            raise ValueError("More rows written than the image height")
+        
+        above = np.vstack([self._previous_row[None, :], rows[:-1]])
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2  # Up filter
+        np.subtract(rows, above, out=filtered[:, 1:], casting='unsafe')
+        self._previous_row = rows[-1].copy()
+        self._rows_written += rows.shape[0]
+        
+        self._pending += self._deflater.compress(filtered.tobytes())
+        if len(self._pending) >= _IDAT_CHUNK_SIZE:
+            self._file.write(_png_chunk(b'IDAT', bytes(self._pending)))
+            self._pending.clear()
+    
+    def close(self) -> None:
+        """Flush the compressor and finish the file."""
+        if self._file.closed:
+            return
+        if self._rows_written != self.height:
+            self._file.close()
+            raise ValueError(f"Only {self._rows_written} of {self.height} rows were written")
+        self._pending += self._deflater.flush()
+        self._file.write(_png_chunk(b'IDAT', bytes(self._pending)))
+        self._file.write(_png_chunk(b'IEND', b''))
+        self._file.close()
+    
+    def __enter__(self) -> 'PngBandWriter':
+        return self
+    
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+class _SampleValueStream:
+    """
+    Turn an iterator of byte chunks into a stream of lsb_bits-wide sample values.
+    
+    Bytes are converted in groups of lsb_bits bytes (exactly 8 values), so
+    chunk boundaries never split a value.
+    """
+    
+    def __init__(self, chunks: Iterable[bytes], lsb_bits: int):
+        self._chunks = iter(chunks)
+        self._lsb_bits = lsb_bits
+        self._bytes = bytearray()
+        self._values = np.empty(0, dtype=np.uint8)
+        self.bytes_read = 0
+        self.exhausted = False
+    
+    def take(self, count: int) -> np.ndarray:
+        """Return the next count values, or fewer once the chunks run out."""
+        while len(self._values) < count and not self.exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                usable = len(self._bytes)  # Final partial group is zero padded
+            else:
+                self._bytes += chunk
+                self.bytes_read += len(chunk)
+                usable = len(self._bytes) - len(self._bytes) % self._lsb_bits
+            if usable:
+                new_values = _sample_values(bytes(self._bytes[:usable]), self._lsb_bits)
+                del self._bytes[:usable]
+                self._values = np.concatenate([self._values, new_values])
+        taken, self._values = self._values[:count], self._values[count:]
+        return taken
+
+def iter_carrier_bands(carrier_path: Union[str, os.PathLike], band_height: int) -> tuple:
+    """
+    Open a carrier for band-by-band reading.
+    
+    PNGs are decoded incrementally and .npy arrays are memory-mapped. Other
+    formats are decoded fully by PIL and then sliced into bands.
+    
+    Returns:
+        Tuple of (width, height, mode, band iterator)
+    """
+    if os.fspath(carrier_path).lower().endswith('.npy'):
+        pixels = np.load(carrier_path, mmap_mode='r')
+        mode = Image.fromarray(pixels[:1]).mode
+    else:
+        try:
+            reader = PngBandReader(carrier_path)
+        except ValueError:
+            pixels = np.array(Image.open(carrier_path))
+            mode = Image.fromarray(pixels[:1]).mode
+        else:
+            def png_bands():
+                with reader:
+                    yield from reader.iter_bands(band_height)
+            return reader.width, reader.height, reader.mode, png_bands()
+    
+    bands = (np.array(pixels[row:row + band_height]) for row in range(0, pixels.shape[0], band_height))
+    return pixels.shape[1], pixels.shape[0], mode, bands
+
+def _data_channels(mode: str, use_alpha: bool) -> int:
+    """Channels per pixel that carry data, matching _sample_view."""
+    if mode not in _PNG_MODES:
+        raise ValueError(f"Unsupported image mode for streaming: {mode}")
+    channels = _PNG_MODES[mode][1]
+    return channels if use_alpha else min(channels, 3)
+
+def _header_pixels(mode: str, header_size: int) -> int:
+    """Leading pixels holding a header_size-byte header, matching stego_header.header_pixels."""
+    return -(-header_size * 8 // _data_channels(mode, False))
+
+def embed_lsb_stream(carrier_path: str, payload: Iterable[bytes], payload_size: int,
+                     output_path: str, lsb_bits: int = 1, band_height: int = 64,
+                     use_alpha: bool = False, header: bytes = b'') -> dict:
+    """
+    Embeds a streamed payload into a carrier one band of rows at a time.
+    
+    A header (see stego_header.pack_header) is written at 1 LSB into the
+    leading samples, and the payload starts after the pixels it occupies.
+    
+    Args:
+        carrier_path: Path to the carrier (PNG, .npy, or any PIL format)
+        payload: Iterable of payload byte chunks
+        payload_size: Total number of payload bytes the iterable will yield
+        output_path: Path to save the stego PNG
+        lsb_bits: Number of LSB bits to use (1-4)
+        band_height: Rows decoded and written per band
+        use_alpha: Also embed into the alpha channel
+        header: Stego header bytes to write ahead of the payload (optional)
+    
+    Returns:
+        Dictionary with the number of bands processed and bands that carry data
+    """
+    if lsb_bits < 1 or lsb_bits > 4:
+        raise ValueError("lsb_bits must be between 1 and 4")
+    
+    width, height, mode, bands = iter_carrier_bands(carrier_path, band_height)
+    channels = _data_channels(mode, use_alpha)
+    reserved_pixels = _header_pixels(mode, len(header))
+    total_bits = max(width * height - reserved_pixels, 0) * channels * lsb_bits
+    if (payload_size + 4) * 8 > total_bits:
+        raise ValueError(
+            f"Data too large for image. "
+            f"Capacity: {total_bits//8} bytes, "
+            f"Required: {payload_size+4} bytes. "
+            f"Try using more LSB bits or a larger image."
+        )
+    
+    def chunks_with_header():
+        yield struct.pack('>I', payload_size)
+        yield from payload
+    
+    values = _SampleValueStream(chunks_with_header(), lsb_bits)
+    header_values = _sample_values(header, 1)
+    header_channels = _data_channels(mode, False)
+    band_count = data_bands = pixel_offset = 0
+    with PngBandWriter(output_path, width, height, mode) as writer:
+        for band in bands:
+            band_pixels = band.shape[0] * band.shape[1]
+            skip = min(max(reserved_pixels - pixel_offset, 0), band_pixels)
+            if skip:
+                band_header = header_values[pixel_offset * header_channels:
+                                            (pixel_offset + skip) * header_channels]
+                if len(band_header):
+                    _write_sample_values(_sample_view(band), 0, band_header, 1)
+            pixel_offset += band_pixels
+            samples = _sample_view(band, use_alpha)[skip:]
+            band_values = values.take(samples.size)
+            if len(band_values):
+                _write_sample_values(samples, 0, band_values, lsb_bits)
+                data_bands += 1
+            writer.write_band(band)
+            band_count += 1
+    
+    values.take(1)  # Pull one more chunk to catch iterables that yield too much
+    if values.bytes_read != payload_size + 4:
+        os.remove(output_path)
+        raise ValueError(f"Payload iterable yielded {values.bytes_read - 4} bytes, expected {payload_size}")
+    
+    return {'bands': band_count, 'data_bands': data_bands, 'output_path': output_path}
+
+def extract_lsb_stream(stego_image_path: str, lsb_bits: int = 1, band_height: int = 64,
+                       use_alpha: bool = False, header_size: int = 0) -> Iterator[bytes]:
+    """
+    Extracts data hidden with embed_lsb or embed_lsb_stream, one band at a time.
+    
+    Reading stops after the band that holds the last payload bit.
+    
+    Args:
+        stego_image_path: Path to the stego image
+        lsb_bits: Number of LSB bits used during embedding
+        band_height: Rows decoded per band
+        use_alpha: Whether the alpha channel was used during embedding
+        header_size: Size of the stego header ahead of the payload, whose
+            pixels are skipped (0 for headerless images)
+    
+    Returns:
+        Iterator of payload byte chunks
+    """
+    if lsb_bits < 1 or lsb_bits > 4:
+        raise ValueError("lsb_bits must be between 1 and 4")
+    
+    width, height, mode, bands = iter_carrier_bands(stego_image_path, band_height)
+    channels = _data_channels(mode, use_alpha)
+    reserved_pixels = _header_pixels(mode, header_size)
+    total_bits = max(width * height - reserved_pixels, 0) * channels * lsb_bits
+    
+    leftover = np.empty(0, dtype=np.uint8)
+    header = b''
+    remaining = None
+    pixel_offset = 0
+    for band in bands:
+        band_pixels = band.shape[0] * band.shape[1]
+        skip = min(max(reserved_pixels - pixel_offset, 0), band_pixels)
+        pixel_offset += band_pixels
+        values = np.concatenate([leftover, _sample_view(band, use_alpha)[skip:].reshape(-1)])
+        groups = len(values) // 8  # 8 values always make lsb_bits whole bytes
+        data = _read_bytes(values[:groups * 8].reshape(-1, 1), lsb_bits, 0, groups * lsb_bits)
+        leftover = values[groups * 8:]
+        
+        if remaining is None:
+            missing = 4 - len(header)
+            header, data = header + data[:missing], data[missing:]
+            if len(header) < 4:
+                continue
+            remaining = struct.unpack('>I', header)[0]
+            if (remaining + 4) * 8 > total_bits:
+                raise ValueError(
+                    f"Declared payload length {remaining} bytes exceeds image capacity "
+                    f"of {total_bits // 8 - 4} bytes. "
+                    f"Wrong lsb_bits or no hidden data."
+                )
+        
+        chunk = data[:remaining]
+        remaining -= len(chunk)
+        if chunk:
+            yield chunk
+        if remaining == 0:
+            return
+    
+    if remaining:
+        raise ValueError("Image ended before the declared payload length")
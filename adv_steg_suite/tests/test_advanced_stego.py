@@ -0,0 +1,204 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from crypto.aes_gcm import encrypt_bytes, envelope_size
+from stego.advanced_stego import (decode_data_from_bytes, decode_data_from_image,
+                                  decode_stream_from_image, encode_data_into_image,
+                                  encode_data_to_bytes, encode_stream_into_image, get_decode_stats,
+                                  get_image_capacity, reset_decode_stats)
+from stego.image_stego import embed_lsb_bytes
+
+@pytest.fixture
+def carrier_bytes():
+    """Create a random RGB carrier image as PNG bytes."""
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def test_encode_decode_in_memory(carrier_bytes):
+    """Test the full pipeline with a file-like carrier and no files on disk."""
+    result = encode_data_to_bytes(io.BytesIO(carrier_bytes), b"Secret data", "password", lsb_bits=2)
+    decoded = decode_data_from_bytes(result['stego_image'], "password", 2)
+    
+    assert decoded['success']
+    assert decoded['data'] == b"Secret data"
+
+def test_pipeline_decodes_each_image_once(carrier_bytes):
+    """Test that encode and decode report a single image decode each."""
+    result = encode_data_to_bytes(carrier_bytes, b"Secret data", "password")
+    decoded = decode_data_from_bytes(result['stego_image'], "password")
+    
+    assert (result['image_decodes'], result['image_encodes']) == (1, 1)
+    assert (decoded['image_decodes'], decoded['image_encodes']) == (1, 0)
+
+def test_path_wrappers_roundtrip(carrier_bytes, tmp_path):
+    """Test that the path functions still write and read stego images."""
+    carrier = tmp_path / "carrier.png"
+    carrier.write_bytes(carrier_bytes)
+    output = tmp_path / "stego.png"
+    
+    result = encode_data_into_image(str(carrier), b"Secret data", "password", str(output))
+    decoded = decode_data_from_image(str(output), "password")
+    
+    assert result['output_path'] == str(output)
+    assert decoded['data'] == b"Secret data"
+
+def test_scatter_mode_roundtrip(carrier_bytes):
+    """Test that the scatter mode is read back from the stego header."""
+    result = encode_data_to_bytes(carrier_bytes, b"Secret data", "password", lsb_bits=3,
+                                  embedding_mode='scatter')
+    
+    decoded = decode_data_from_bytes(result['stego_image'], "password")
+    assert decoded['data'] == b"Secret data"
+    assert (decoded['lsb_bits_used'], decoded['embedding_mode']) == (3, 'scatter')
+    assert not decode_data_from_bytes(result['stego_image'], "wrong")['success']
+
+def test_adaptive_mode_roundtrip(carrier_bytes):
+    """Test that adaptive embedding is recorded in the header and decodes."""
+    result = encode_data_to_bytes(carrier_bytes, b"Secret data", "password", lsb_bits=2,
+                                  embedding_mode='adaptive', analysis='skip')
+    decoded = decode_data_from_bytes(result['stego_image'], "password")
+    
+    assert decoded['embedding_mode'] == 'adaptive'
+    assert decoded['data'] == b"Secret data"
+
+def test_headerless_image_needs_expected_lsb_bits(carrier_bytes):
+    """Test that images without a header are rejected unless lsb_bits is given."""
+    stego = embed_lsb_bytes(carrier_bytes, encrypt_bytes(b"Secret data", "password"), 2)
+    
+    assert decode_data_from_bytes(carrier_bytes, "password")['error'] == "No stego header found in image"
+    assert decode_data_from_bytes(stego, "password")['error'] == "No stego header found in image"
+    assert decode_data_from_bytes(stego, "password", 2)['data'] == b"Secret data"
+
+def test_damaged_payloads_rejected_before_kdf(carrier_bytes):
+    """Test that plain and damaged images never reach the key derivation."""
+    result = encode_data_to_bytes(carrier_bytes, b"Secret data", "password")
+    damaged = np.array(Image.open(io.BytesIO(result['stego_image'])))
+    damaged[2, 10, 0] ^= 1  # A payload bit after the header region
+    reset_decode_stats()
+    
+    assert decode_data_from_bytes(carrier_bytes, "password")['early_rejected']
+    assert decode_data_from_bytes(carrier_bytes, "password", 1)['early_rejected']
+    assert decode_data_from_bytes(damaged, "password")['early_rejected']
+    assert decode_data_from_bytes(result['stego_image'], "password")['success']
+    assert get_decode_stats() == {'attempts': 4, 'early_rejections': 3, 'kdf_runs': 1, 'successes': 1}
+
+def test_analysis_skip_and_background(carrier_bytes):
+    """Test that analysis can be skipped or deferred to a future."""
+    skipped = encode_data_to_bytes(carrier_bytes, b"Secret data", "password", analysis='skip')
+    deferred = decode_data_from_bytes(skipped['stego_image'], "password", analysis='background')
+    inline = decode_data_from_bytes(skipped['stego_image'], "password")
+    
+    assert skipped['security_score'] is None
+    assert deferred['security_score'].result(timeout=10) == inline['security_score']
+
+def test_uncompressed_output_reports_timings(carrier_bytes, tmp_path):
+    """Test that the pipeline writes deflate-free outputs and times encode and save separately."""
+    output = tmp_path / "stego.bmp"
+    result = encode_data_into_image(io.BytesIO(carrier_bytes), b"Secret data", "password", str(output),
+                                    analysis='skip')
+    in_memory = encode_data_to_bytes(carrier_bytes, b"Secret data", "password", output_format='NPY',
+                                     write_profile='fast', analysis='skip')
+    
+    assert result['encode_seconds'] >= 0 and result['save_seconds'] >= 0
+    assert 'save_seconds' in in_memory
+    assert Image.open(output).format == 'BMP'
+    assert decode_data_from_image(str(output), "password")['data'] == b"Secret data"
+    assert np.load(io.BytesIO(in_memory['stego_image'])).shape == (64, 64, 3)
+
+def test_session_batch_pipeline(carrier_bytes):
+    """Test that a batch encoded under one session decodes with and without it."""
+    from crypto.aes_gcm import SessionKey
+    
+    session = SessionKey("password")
+    results = [encode_data_to_bytes(carrier_bytes, b"item %d" % i, "password", analysis='skip', session=session)
+               for i in range(3)]
+    
+    assert decode_data_from_bytes(results[2]['stego_image'], "password", session=session)['data'] == b"item 2"
+    assert decode_data_from_bytes(results[0]['stego_image'], "password")['data'] == b"item 0"
+
+def test_segmented_payload_pipeline(carrier_bytes):
+    """Test that segment_size, not workers, selects the segmented envelope."""
+    data = np.random.default_rng(3).bytes(1500)
+    plain = encode_data_to_bytes(carrier_bytes, data, "password", lsb_bits=2, workers=2, analysis='skip')
+    segmented = encode_data_to_bytes(carrier_bytes, data, "password", lsb_bits=2, workers=2,
+                                     analysis='skip', segment_size=512)
+    
+    # 42-byte header and three tags, instead of a 26-byte header, a nonce and one tag
+    assert segmented['encrypted_size'] - plain['encrypted_size'] == (42 + 3 * 16) - (26 + 12 + 16)
+    assert decode_data_from_bytes(segmented['stego_image'], "password", workers=2)['data'] == data
+
+def test_capacity_excludes_header_region():
+    """Test that a payload filling the reported capacity embeds and one more byte is refused."""
+    pixels = np.random.default_rng(4).integers(0, 256, (40, 40, 3), dtype=np.uint8)
+    capacity = get_image_capacity(pixels, 4)['capacity_bytes']
+    fitting = np.random.default_rng(5).bytes(capacity - envelope_size(0))
+    
+    result = encode_data_to_bytes(pixels, fitting, "password", lsb_bits=4,
+                                  use_compression=False, analysis='skip')
+    
+    assert result['encrypted_size'] == capacity
+    assert decode_data_from_bytes(result['stego_image'], "password")['data'] == fitting
+    with pytest.raises(ValueError, match="Data too large"):
+        encode_data_to_bytes(pixels, fitting + b"x", "password", lsb_bits=4, use_compression=False)
+
+def test_stream_pipeline_roundtrip(carrier_bytes, tmp_path):
+    """Test that a chunked payload is encrypted, embedded and recovered band by band."""
+    carrier = tmp_path / "carrier.png"
+    carrier.write_bytes(carrier_bytes)
+    output = tmp_path / "stego.png"
+    data = np.random.default_rng(2).bytes(2500)
+    
+    result = encode_stream_into_image(str(carrier), (data[i:i + 700] for i in range(0, 2500, 700)),
+                                      len(data), "password", str(output), lsb_bits=2,
+                                      band_height=8, segment_size=512)
+    
+    assert result['encrypted_size'] == 2500 + 37 + 5 * 16
+    assert b''.join(decode_stream_from_image(str(output), "password", band_height=5)) == data
+    assert decode_data_from_image(str(output), "password")['data'] == data  # The header makes it self-describing
+    with pytest.raises(ValueError):
+        b''.join(decode_stream_from_image(str(output), "wrong", 2))
+
+def test_wrong_scatter_key_is_rejected_early(carrier_bytes):
+    """Test that a scatter image read with the wrong password never reaches decryption."""
+    result = encode_data_to_bytes(carrier_bytes, b"Secret data", "password",
+                                  embedding_mode='scatter', analysis='skip')
+    reset_decode_stats()
+    
+    assert decode_data_from_bytes(result['stego_image'], "wrong")['early_rejected']
+    assert get_decode_stats()['early_rejections'] == 1
+
+def test_scatter_key_is_salted_per_image(carrier_bytes, monkeypatch):
+    """Test that each scatter image has its own salt and one KDF run orders and decrypts it."""
+    from crypto import aes_gcm
+    from stego.stego_header import read_header
+    
+    calls = []
+    original = aes_gcm.derive_key
+    monkeypatch.setattr(aes_gcm, "derive_key", lambda *args: calls.append(args) or original(*args))
+    kdf_params = (2**12, 8, 1)
+    reset_decode_stats()
+    first, second = (encode_data_to_bytes(carrier_bytes, b"Secret data", "password", kdf_params=kdf_params,
+                                          embedding_mode='scatter', analysis='skip') for _ in range(2))
+    headers = [read_header(np.array(Image.open(io.BytesIO(r['stego_image'])))) for r in (first, second)]
+    
+    assert headers[0]['salt'] != headers[1]['salt'] and headers[0]['kdf_params'] == kdf_params
+    assert get_decode_stats()['kdf_runs'] == 0 and len(calls) == 2
+    assert decode_data_from_bytes(second['stego_image'], "password")['data'] == b"Secret data"
+    assert get_decode_stats()['kdf_runs'] == 1 and len(calls) == 3
+    assert not decode_data_from_bytes(first['stego_image'], "password",
+                                      max_kdf_cost=1 << 20)['success']
+
+def test_headerless_png_path_rejected_from_leading_rows(carrier_bytes, tmp_path, monkeypatch):
+    """Test that a PNG path without a header is rejected without decoding the whole image."""
+    from stego import advanced_stego
+    
+    carrier = tmp_path / "carrier.png"
+    carrier.write_bytes(carrier_bytes)
+    monkeypatch.setattr(advanced_stego.LoadedImage, "load", lambda *args: pytest.fail("full decode"))
+    
+    assert decode_data_from_image(str(carrier), "password")['error'] == "No stego header found in image"
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from crypto.aes_gcm import encrypt_bytes, decrypt_bytes
 
@@ -28,8 +29,191 @@ def test_tampered_data_fails():
     password = "password"
     
     encrypted = encrypt_bytes(original_data, password)
-    # Tamper with the ciphertext part (skip the salt and nonce)
-    tampered_encrypted = encrypted[:28] + bytes([encrypted[28] ^ 0xFF]) + encrypted[29:]
+    # Tamper with the ciphertext: the last 16 bytes are the GCM tag, so
+    # offset -20 lands in the encrypted data after the header and nonce
+    tampered_encrypted = encrypted[:-20] + bytes([encrypted[-20] ^ 0xFF]) + encrypted[-19:]
     
     with pytest.raises(ValueError, match="Decryption failed"):
-        decrypt_bytes(tampered_encrypted, password)
\ No newline at end of file
+        decrypt_bytes(tampered_encrypted, password)
+
+def test_key_cache_skips_repeat_derivations(monkeypatch):
+    """Test that the opt-in key cache serves repeat decodes, sweeps expired keys and purges."""
+    from crypto import aes_gcm
+    
+    clock = [1000.0]
+    monkeypatch.setattr(aes_gcm.time, "monotonic", lambda: clock[0])
+    aes_gcm.enable_key_cache(max_entries=2, ttl=60)
+    try:
+        encrypted = encrypt_bytes(b"cached", "password")
+        assert aes_gcm.key_cache_info()['size'] == 0  # Fresh salts are never cached
+        assert decrypt_bytes(encrypted, "password") == b"cached"
+        with pytest.raises(ValueError, match="Decryption failed"):
+            decrypt_bytes(encrypted, "wrong")
+        assert decrypt_bytes(encrypted, "password") == b"cached"
+        assert aes_gcm.key_cache_info()['hits'] == 1
+        
+        clock[0] += 61
+        assert aes_gcm.key_cache_info()['size'] == 0  # Expired keys are swept without a lookup
+        decrypt_bytes(encrypted, "password")
+        assert aes_gcm.key_cache_info()['misses'] == 3
+        assert aes_gcm.key_cache_info()['size'] == 1
+        
+        aes_gcm.purge_key_cache()
+        assert aes_gcm.key_cache_info()['size'] == 0
+    finally:
+        aes_gcm.disable_key_cache()
+    
+    decrypt_bytes(encrypted, "password")
+    assert aes_gcm.key_cache_info()['size'] == 0
+
+def test_session_mode_runs_scrypt_once(monkeypatch):
+    """Test that a session derives one master key and both decrypt paths accept its envelopes."""
+    from crypto import aes_gcm
+    
+    session = aes_gcm.SessionKey("password")
+    calls = []
+    original = aes_gcm.derive_key
+    monkeypatch.setattr(aes_gcm, "derive_key", lambda *args: calls.append(args) or original(*args))
+    
+    envelopes = [encrypt_bytes(b"item %d" % i, "password", session) for i in range(50)]
+    assert [session.decrypt(envelope) for envelope in envelopes] == [b"item %d" % i for i in range(50)]
+    assert calls == []
+    
+    assert decrypt_bytes(envelopes[0], "password") == b"item 0"  # Re-derives the master key
+    with pytest.raises(ValueError, match="Decryption failed"):
+        decrypt_bytes(envelopes[0], "wrong")
+
+def test_envelope_header_is_authenticated_and_legacy_still_decrypts():
+    """Test that header tampering fails and the unversioned format still decrypts."""
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from crypto.aes_gcm import ENVELOPE_MAGIC, derive_key
+    
+    encrypted = encrypt_bytes(b"data", "password")
+    assert encrypted.startswith(ENVELOPE_MAGIC)
+    with pytest.raises(ValueError):
+        decrypt_bytes(encrypted[:5] + b"\x01" + encrypted[6:], "password")
+    
+    key, salt = derive_key("password")
+    nonce = b"\x00" * 12
+    legacy = salt + nonce + AESGCM(key).encrypt(nonce, b"legacy data", None)
+    assert decrypt_bytes(legacy, "password") == b"legacy data"
+
+def test_stream_roundtrip_and_tampering():
+    """Test the chunked envelope against truncation, reordering and trailing data."""
+    from crypto.aes_gcm import decrypt_stream, encrypt_stream, stream_envelope_size
+    
+    for size in (0, 100, 250, 301):
+        data = bytes(range(256)) * 2
+        data = data[:size]
+        chunks = [data[i:i + 37] for i in range(0, len(data), 37)]
+        segments = list(encrypt_stream(chunks, "password", segment_size=50))
+        envelope = b''.join(segments)
+        assert len(envelope) == stream_envelope_size(size, 50)
+        assert b''.join(decrypt_stream(segments, "password")) == data
+        assert decrypt_bytes(envelope, "password") == data
+    
+    header, body = segments[0], segments[1:]
+    tampered = [
+        [header] + body[:-1],                             # Dropped last segment
+        [header] + body[:3],                              # Truncated at a segment boundary
+        [header, body[1], body[0]] + body[2:],            # Reordered
+        [header] + body + [body[-1]],                     # Trailing data
+    ]
+    for stream in tampered:
+        with pytest.raises(ValueError):
+            list(decrypt_stream(stream, "password"))
+    with pytest.raises(ValueError):
+        list(decrypt_stream(segments, "wrong"))
+
+def test_stream_memory_is_constant():
+    """Test that streaming 16 MiB keeps peak allocations near a few segments."""
+    import tracemalloc
+    from crypto.aes_gcm import decrypt_stream, encrypt_stream
+    
+    chunk = bytes(1 << 16)
+    tracemalloc.start()
+    try:
+        total = sum(len(part) for part in decrypt_stream(
+            encrypt_stream((chunk for _ in range(256)), "password"), "password"))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    
+    assert total == 256 << 16
+    assert peak < 2 << 20
+
+def test_envelope_kdf_params_are_honored(monkeypatch):
+    """Test that decoding uses the scrypt cost stored in the envelope."""
+    from crypto import aes_gcm
+    
+    encrypted = encrypt_bytes(b"data", "password", kdf_params=(1 << 10, 4, 2))
+    assert encrypted[4:10] == bytes([1, 0, 1, 10, 4, 2])  # Version, mode, scrypt, log2 n, r, p
+    monkeypatch.setattr(aes_gcm, "SCRYPT_N", 1 << 11)  # New defaults don't affect old envelopes
+    assert decrypt_bytes(encrypted, "password") == b"data"
+    
+    # A header asking for more than KDF_MAX_MEMORY is refused before running scrypt
+    hostile = encrypted[:7] + bytes([30]) + encrypted[8:]
+    with pytest.raises(ValueError, match="limit"):
+        decrypt_bytes(hostile, "password")
+    with pytest.raises(ValueError, match="power of two"):
+        encrypt_bytes(b"data", "password", kdf_params=(1000, 8, 1))
+
+def test_calibrate_scrypt_respects_budgets():
+    """Test that calibration stays at the smallest cost when the budgets allow no more."""
+    from crypto.aes_gcm import calibrate_scrypt
+    
+    tight_memory = calibrate_scrypt(10.0, max_memory=1 << 20)
+    assert tight_memory['params'] == (1 << 10, 8, 1)
+    assert tight_memory['memory_bytes'] == 1 << 20
+    
+    tight_time = calibrate_scrypt(1e-6)
+    assert tight_time['params'][0] == 1 << 10
+    assert not tight_time['within_target']
+
+def test_segmented_parallel_roundtrip_and_tampering():
+    """Test that parallel segments decrypt with any worker count and are bound to their order."""
+    from crypto.aes_gcm import MODE_SEGMENTED, PARALLEL_SEGMENT_SIZE
+    
+    data = np.random.default_rng(0).bytes(PARALLEL_SEGMENT_SIZE * 2 + 1000)
+    assert encrypt_bytes(data, "password", workers=4)[5] != MODE_SEGMENTED  # Only segment_size segments
+    encrypted = encrypt_bytes(data, "password", workers=4, segment_size=PARALLEL_SEGMENT_SIZE)
+    assert encrypted[5] == MODE_SEGMENTED
+    assert decrypt_bytes(encrypted, "password") == data
+    assert decrypt_bytes(encrypted, "password", workers=3) == data
+    
+    header_size = 42
+    sealed = PARALLEL_SEGMENT_SIZE + 16
+    first, second, last = (encrypted[header_size:header_size + sealed],
+                           encrypted[header_size + sealed:header_size + 2 * sealed],
+                           encrypted[header_size + 2 * sealed:])
+    head = encrypted[:header_size]
+    tampered = [
+        head + second + first + last,                                   # Reordered
+        head + first + second,                                          # Dropped last segment
+        head[:-4] + (2).to_bytes(4, 'big') + first + second,            # Count rewritten to match
+        head + first + second + last + last,                            # Duplicated segment
+    ]
+    for envelope in tampered:
+        with pytest.raises(ValueError):
+            decrypt_bytes(envelope, "password", workers=2)
+    
+    # Small payloads keep the single-segment format
+    assert encrypt_bytes(b"small", "password", workers=4)[5] == 0
+
+def test_decoder_kdf_budget_is_checked_before_scrypt(monkeypatch):
+    """Test that envelopes asking for a costlier scrypt than allowed never derive a key."""
+    from crypto import aes_gcm
+    from crypto.aes_gcm import decrypt_stream, encrypt_stream
+    
+    encrypted = encrypt_bytes(b"data", "password", kdf_params=(1 << 10, 8, 2))
+    stream = b''.join(encrypt_stream([b"data"], "password", kdf_params=(1 << 10, 8, 1)))
+    costly = encrypted[:7] + bytes([18]) + encrypted[8:]  # n = 2**18 and p = 2: 512 MiB
+    
+    assert decrypt_bytes(encrypted, "password") == b"data"
+    monkeypatch.setattr(aes_gcm, "derive_key", lambda *args: pytest.fail("scrypt ran"))
+    with pytest.raises(ValueError, match="decoder limit"):
+        decrypt_bytes(costly, "password")
+    with pytest.raises(ValueError, match="decoder limit"):
+        decrypt_bytes(encrypted, "password", max_kdf_cost=1 << 20)  # p=2 costs 2 MiB
+    with pytest.raises(ValueError, match="decoder limit"):
+        b''.join(decrypt_stream([stream], "password", max_kdf_cost=1 << 19))
@@ -0,0 +1,37 @@
+import sys
+
+import numpy as np
+from PIL import Image
+
+from cli import main_cli
+
+def run_cli(monkeypatch, capsys, *args):
+    """Run the CLI with args and return what it printed."""
+    monkeypatch.setattr(sys, "argv", ["main_cli.py", *args])
+    main_cli.main()
+    return capsys.readouterr().out
+
+def test_encode_decode_with_custom_scrypt_parameters(monkeypatch, capsys, tmp_path):
+    """Test that an envelope encoded with non-default n and p decodes within the default budget."""
+    carrier = tmp_path / "carrier.png"
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (32, 32, 3), dtype=np.uint8)).save(carrier)
+    stego = str(tmp_path / "stego.png")
+    
+    output = run_cli(monkeypatch, capsys, "encode", "-c", str(carrier), "-d", "Secret data",
+                     "-p", "password", "-o", stego, "--scrypt-n", "32768", "--scrypt-p", "2")
+    assert "Encoding successful" in output and "Warning" not in output
+    
+    assert "Secret data" in run_cli(monkeypatch, capsys, "decode", "-s", stego, "-p", "password")
+    assert "decoder limit" in run_cli(monkeypatch, capsys, "decode", "-s", stego, "-p", "password",
+                                      "--max-kdf-mb", "32")
+
+def test_encode_warns_above_the_decoder_budget(monkeypatch, capsys, tmp_path):
+    """Test that encode names the decode --max-kdf-mb an expensive envelope needs."""
+    carrier = tmp_path / "carrier.png"
+    Image.fromarray(np.zeros((32, 32, 3), dtype=np.uint8)).save(carrier)
+    monkeypatch.setattr(main_cli, "DECODE_MAX_KDF_COST", 1 << 20)
+    
+    output = run_cli(monkeypatch, capsys, "encode", "-c", str(carrier), "-d", "Secret data", "-p", "password",
+                     "-o", str(tmp_path / "stego.png"), "--scrypt-n", "2048", "--scrypt-r", "16")
+    
+    assert "decode with --max-kdf-mb 4" in output
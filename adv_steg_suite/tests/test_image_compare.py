@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.image_compare import compare_images_tiled
+from stego.image_stego import compare_images
+
+def reference_metrics(original, stego):
+    """Whole-image float64 MSE and 7x7 SSIM."""
+    x = original.astype(np.float64)
+    y = stego.astype(np.float64)
+    windows_x = np.lib.stride_tricks.sliding_window_view(x, (7, 7), axis=(0, 1))
+    windows_y = np.lib.stride_tricks.sliding_window_view(y, (7, 7), axis=(0, 1))
+    mean_x = windows_x.mean(axis=(-2, -1))
+    mean_y = windows_y.mean(axis=(-2, -1))
+    var_x = windows_x.var(axis=(-2, -1), ddof=1)
+    var_y = windows_y.var(axis=(-2, -1), ddof=1)
+    cov = ((windows_x - mean_x[..., None, None]) * (windows_y - mean_y[..., None, None])).sum(axis=(-2, -1)) / 48
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * mean_x * mean_y + c1) * (2 * cov + c2)
+            / ((mean_x ** 2 + mean_y ** 2 + c1) * (var_x + var_y + c2)))
+    return ((x - y) ** 2).mean(), ssim.mean()
+
+@pytest.fixture
+def image_pair(tmp_path):
+    """An RGBA original and a heavily changed copy, as PNG files."""
+    rng = np.random.default_rng(0)
+    original = rng.integers(0, 256, (53, 41, 4), dtype=np.uint8)
+    stego = original.copy()
+    stego[..., :3] = np.clip(original[..., :3].astype(int) + rng.integers(-40, 40, (53, 41, 3)), 0, 255)
+    Image.fromarray(original).save(tmp_path / "original.png")
+    Image.fromarray(stego).save(tmp_path / "stego.png")
+    return tmp_path / "original.png", tmp_path / "stego.png", original[..., :3], stego[..., :3]
+
+@pytest.mark.parametrize("band_height", [5, 128])
+def test_tiled_metrics_match_reference(image_pair, band_height):
+    """Test MSE (no uint8 wraparound) and SSIM against whole-image references."""
+    original_path, stego_path, original, stego = image_pair
+    mse, ssim = reference_metrics(original, stego)
+    
+    result = compare_images_tiled(str(original_path), str(stego_path), band_height, workers=2)
+    
+    assert result['mse'] == pytest.approx(mse)
+    assert result['ssim'] == pytest.approx(ssim)
+    assert result['max_pixel_difference'] == np.abs(original.astype(int) - stego).max()
+
+def test_compare_images_accepts_bytes(image_pair):
+    """Test that encoded bytes and paths give the same result."""
+    original_path, stego_path, _, _ = image_pair
+    
+    from_bytes = compare_images(original_path.read_bytes(), stego_path.read_bytes())
+    
+    assert from_bytes == compare_images(str(original_path), str(stego_path))
+    assert compare_images(str(original_path), str(original_path))['ssim'] == pytest.approx(1.0)
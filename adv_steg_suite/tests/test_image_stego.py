@@ -0,0 +1,296 @@
+import io
+import struct
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego import image_stego
+from stego.image_stego import (_carrier_dimensions, analyze_security, calculate_capacity, clear_capacity_cache, embed_lsb,
+                               embed_lsb_array, embed_lsb_bytes, extract_lsb, extract_lsb_array,
+                               extract_lsb_bytes, texture_map)
+
+def legacy_embed(pixels, data, lsb_bits):
+    """Per-sample reference implementation of the original embedding loop."""
+    data_bits = ''.join(format(byte, '08b') for byte in struct.pack('>I', len(data)) + data)
+    flat_pixels = pixels.flatten()
+    clear_mask = 0xFF ^ ((1 << lsb_bits) - 1)
+    for i, data_index in enumerate(range(0, len(data_bits), lsb_bits)):
+        current_bits = data_bits[data_index:data_index + lsb_bits].ljust(lsb_bits, '0')
+        flat_pixels[i] = (flat_pixels[i] & clear_mask) | int(current_bits, 2)
+    return flat_pixels.reshape(pixels.shape)
+
+@pytest.fixture
+def carrier(tmp_path):
+    """Create a small random RGB carrier image."""
+    rng = np.random.default_rng(0)
+    path = tmp_path / "carrier.png"
+    Image.fromarray(rng.integers(0, 256, (40, 50, 3), dtype=np.uint8)).save(path)
+    return path
+
+@pytest.mark.parametrize("lsb_bits", [1, 2, 3, 4])
+def test_embed_matches_legacy_layout(carrier, tmp_path, lsb_bits):
+    """Test that vectorized embedding writes the same samples as the original loop."""
+    data = bytes(range(256)) + b"odd tail"
+    output = tmp_path / "stego.png"
+    
+    embed_lsb(str(carrier), data, str(output), lsb_bits)
+    
+    expected = legacy_embed(np.array(Image.open(carrier)), data, lsb_bits)
+    assert np.array_equal(np.array(Image.open(output)), expected)
+
+@pytest.mark.parametrize("lsb_bits", [1, 2, 3, 4])
+def test_embed_extract_roundtrip(carrier, tmp_path, lsb_bits):
+    """Test that extract_lsb recovers what embed_lsb hid."""
+    data = b"This is a super secret message!" * 5
+    output = tmp_path / "stego.png"
+    
+    embed_lsb(str(carrier), data, str(output), lsb_bits)
+    
+    assert extract_lsb(str(output), lsb_bits) == data
+
+def test_embed_rejects_oversized_payload(carrier, tmp_path):
+    """Test that a payload larger than the carrier raises an error."""
+    with pytest.raises(ValueError, match="Data too large"):
+        embed_lsb(str(carrier), b"x" * 10000, str(tmp_path / "stego.png"), 1)
+
+def test_extract_rejects_oversized_length(tmp_path):
+    """Test that a header declaring more data than the image holds fails fast."""
+    pixels = np.full((10, 10, 3), 255, dtype=np.uint8)  # all-ones LSBs declare ~4 GB
+    path = tmp_path / "plain.png"
+    Image.fromarray(pixels).save(path)
+    
+    with pytest.raises(ValueError, match="exceeds image capacity"):
+        extract_lsb(str(path), 1)
+
+def test_extract_ignores_alpha_channel(tmp_path):
+    """Test extraction from an RGBA image reads only the RGB samples."""
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 256, (20, 20, 4), dtype=np.uint8)
+    carrier = tmp_path / "rgba.png"
+    Image.fromarray(pixels, 'RGBA').save(carrier)
+    output = tmp_path / "stego.png"
+    
+    embed_lsb(str(carrier), b"alpha safe", str(output), 2)
+    
+    assert extract_lsb(str(output), 2) == b"alpha safe"
+
+def test_bytes_api_roundtrip(carrier):
+    """Test embedding and extracting through bytes and file-like objects only."""
+    stego_png = embed_lsb_bytes(carrier.read_bytes(), b"in memory", 2)
+    
+    assert stego_png.startswith(b"\x89PNG")
+    assert extract_lsb_bytes(io.BytesIO(stego_png), 2) == b"in memory"
+
+def test_capacity_matches_decoded_pixels(tmp_path):
+    """Test that header-only capacity agrees with the decoded array for common modes."""
+    for mode in ['L', 'RGB', 'RGBA', 'P']:
+        path = tmp_path / f"{mode}.png"
+        Image.new(mode, (30, 20)).save(path)
+        
+        assert calculate_capacity(str(path), 2) == calculate_capacity(np.array(Image.open(path)), 2)
+
+def test_capacity_cache_tracks_file_changes(tmp_path):
+    """Test that repeat queries hit the cache and a rewritten file is re-read."""
+    clear_capacity_cache()
+    path = tmp_path / "carrier.png"
+    Image.new('RGB', (30, 20)).save(path)
+    
+    calculate_capacity(str(path))
+    calculate_capacity(str(path), 3)
+    assert _carrier_dimensions.cache_info().hits == 1
+    
+    Image.new('RGB', (60, 20)).save(path)
+    assert calculate_capacity(str(path))['width'] == 60
+
+@pytest.mark.parametrize("lsb_bits", [1, 3])
+def test_striped_workers_match_single_thread(monkeypatch, lsb_bits):
+    """Test that multi-stripe embedding and extraction match the single-threaded result."""
+    monkeypatch.setattr(image_stego, '_MIN_STRIPE_SIZE', 64)
+    rng = np.random.default_rng(2)
+    pixels = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    data = rng.bytes(1500)
+    
+    single = embed_lsb_array(pixels, data, lsb_bits, workers=1)
+    striped = embed_lsb_array(pixels, data, lsb_bits, workers=4)
+    
+    assert np.array_equal(single, striped)
+    assert extract_lsb_array(striped, lsb_bits, workers=4) == data
+
+def test_striped_workers_handle_empty_payload():
+    """Test that an empty payload round-trips with several workers."""
+    pixels = np.zeros((64, 64, 3), dtype=np.uint8)
+    
+    stego = embed_lsb_array(pixels, b'', 1, workers=4)
+    
+    assert extract_lsb_array(stego, 1, workers=4) == b''
+
+def test_embed_preserves_alpha(tmp_path):
+    """Test that RGBA carriers keep their alpha channel untouched."""
+    rng = np.random.default_rng(3)
+    pixels = rng.integers(0, 256, (20, 20, 4), dtype=np.uint8)
+    carrier = tmp_path / "rgba.png"
+    Image.fromarray(pixels, 'RGBA').save(carrier)
+    output = tmp_path / "stego.png"
+    
+    embed_lsb(str(carrier), b"keep alpha", str(output), 2)
+    
+    stego = np.array(Image.open(output))
+    assert stego.shape == pixels.shape
+    assert np.array_equal(stego[..., 3], pixels[..., 3])
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_in_place_rgba_matches_copy(monkeypatch, workers):
+    """Test that in-place embedding into a strided RGBA view matches the copying path."""
+    monkeypatch.setattr(image_stego, '_MIN_STRIPE_SIZE', 64)
+    rng = np.random.default_rng(4)
+    pixels = rng.integers(0, 256, (32, 32, 4), dtype=np.uint8)
+    data = rng.bytes(700)
+    
+    copied = embed_lsb_array(pixels, data, 3, workers)
+    in_place = pixels.copy()
+    result = embed_lsb_array(in_place, data, 3, workers, in_place=True)
+    
+    assert result is in_place
+    assert np.array_equal(copied, in_place)
+    assert extract_lsb_array(in_place, 3, workers) == data
+
+def test_use_alpha_roundtrip():
+    """Test that the alpha channel can carry data when requested."""
+    rng = np.random.default_rng(5)
+    pixels = rng.integers(0, 256, (16, 16, 4), dtype=np.uint8)
+    data = rng.bytes(120)  # Needs more than the RGB samples at 1 LSB
+    
+    with pytest.raises(ValueError, match="Data too large"):
+        embed_lsb_array(pixels, data, 1)
+    stego = embed_lsb_array(pixels, data, 1, use_alpha=True)
+    
+    assert extract_lsb_array(stego, 1, use_alpha=True) == data
+    assert calculate_capacity(pixels, 1, use_alpha=True)['channels'] == 4
+
+def test_scatter_positions_are_a_permutation_prefix():
+    """Test that scatter positions are distinct, in range and prefix-consistent."""
+    image_stego.clear_scatter_cache()
+    full = image_stego._scatter_positions(b'key', 1000, 1000)
+    
+    assert sorted(full.tolist()) == list(range(1000))
+    image_stego.clear_scatter_cache()
+    assert np.array_equal(image_stego._scatter_positions(b'key', 1000, 300), full[:300])
+    assert np.array_equal(image_stego._scatter_positions(b'key', 1000, 700), full[:700])
+    assert not np.array_equal(image_stego._scatter_positions(b'other', 1000, 300), full[:300])
+
+@pytest.mark.parametrize("channels", [3, 4])
+def test_scatter_roundtrip(channels):
+    """Test keyed scatter embedding, including RGBA carriers with untouched alpha."""
+    pixels = np.random.default_rng(0).integers(0, 256, (40, 50, channels), dtype=np.uint8)
+    data = b"scattered secret" * 10
+    
+    stego = embed_lsb_array(pixels, data, 2, scatter_key=b'key')
+    
+    assert extract_lsb_array(stego, 2, scatter_key=b'key') == data
+    assert np.array_equal(stego[..., 3:], pixels[..., 3:])
+    # Changes are spread over the image instead of filling the top rows
+    changed_rows = np.flatnonzero((stego != pixels).any(axis=(1, 2)))
+    assert changed_rows.max() > 30
+    with pytest.raises(ValueError):
+        extract_lsb_array(stego, 2)
+
+def reference_security_score(pixels):
+    """The original histogram(density=True) based score on PIL's grayscale conversion."""
+    gray = np.array(Image.fromarray(pixels).convert('L'))
+    
+    def entropy(values, bins):
+        density = np.histogram(values, bins=bins, density=True)[0]
+        probabilities = density[density > 0] / density.sum()
+        return -(probabilities * np.log(probabilities)).sum()
+    
+    return min(0.3 * min(np.std(gray) / 50, 1.0) + 0.3 * entropy(gray, 256) / 8 + 0.4 * entropy(gray & 1, 2), 1.0)
+
+@pytest.mark.parametrize("shape", [(30, 40), (30, 40, 3), (30, 40, 4)])
+def test_analyze_security_matches_reference(shape):
+    """Test that the bincount implementation reproduces the original score."""
+    pixels = np.random.default_rng(0).integers(40, 120, shape, dtype=np.uint8)
+    
+    assert analyze_security(pixels) == pytest.approx(reference_security_score(pixels), abs=1e-12)
+
+def test_analyze_security_sampling():
+    """Test that strided sampling stays close to the full-image score."""
+    pixels = np.random.default_rng(0).integers(0, 256, (400, 300, 3), dtype=np.uint8)
+    
+    assert analyze_security(pixels, max_samples=5000) == pytest.approx(analyze_security(pixels), abs=0.01)
+
+@pytest.mark.parametrize("suffix", [".png", ".bmp", ".tif", ".npy"])
+def test_lossless_output_formats_roundtrip(carrier, tmp_path, suffix):
+    """Test that every lossless output format is chosen by extension and preserves the payload."""
+    data = b"format check" * 10
+    output = tmp_path / f"stego{suffix}"
+    
+    embed_lsb(str(carrier), data, str(output), 2, write_profile='fast')
+    
+    if suffix == ".npy":
+        assert np.load(output).shape == (40, 50, 3)
+    else:
+        assert Image.open(output).format == {".png": "PNG", ".bmp": "BMP", ".tif": "TIFF"}[suffix]
+    if suffix == ".tif":
+        assert Image.open(output).info["compression"] == "raw"
+    assert calculate_capacity(str(output))['width'] == 50
+    assert extract_lsb(str(output), 2) == data
+
+@pytest.mark.parametrize("channels", [2, 4])
+def test_alpha_images_are_not_written_as_bmp(tmp_path, channels):
+    """Test that LA/RGBA pixels are refused as BMP and survive a TIFF roundtrip."""
+    pixels = np.random.default_rng(0).integers(0, 256, (20, 30, channels), dtype=np.uint8)
+    
+    with pytest.raises(ValueError, match="alpha"):
+        image_stego.save_image_array(pixels, str(tmp_path / "stego.bmp"))
+    image_stego.save_image_array(pixels, str(tmp_path / "stego.tif"))
+    assert np.array_equal(np.array(Image.open(tmp_path / "stego.tif")), pixels)
+
+def test_write_profiles_only_change_size(carrier, tmp_path):
+    """Test that PNG write profiles produce identical pixels."""
+    pixels = np.array(Image.open(carrier))
+    sizes = {}
+    for profile in ("fast", "balanced", "smallest"):
+        encoded = image_stego.image_to_bytes(pixels, profile)
+        assert np.array_equal(np.array(Image.open(io.BytesIO(encoded))), pixels)
+        sizes[profile] = len(encoded)
+    
+    assert sizes["smallest"] <= sizes["fast"]
+    with pytest.raises(ValueError, match="write_profile"):
+        image_stego.image_to_bytes(pixels, "tiny")
+
+def half_textured(shape):
+    """A carrier whose left half is flat and right half is noise."""
+    pixels = np.full(shape, 128, dtype=np.uint8)
+    pixels[:, shape[1] // 2:] = np.random.default_rng(0).integers(0, 256, pixels[:, shape[1] // 2:].shape)
+    return pixels
+
+@pytest.mark.parametrize("shape", [(60, 80), (60, 80, 3), (60, 80, 4)])
+def test_adaptive_embeds_in_textured_region(shape):
+    """Test that adaptive mode roundtrips and only touches the busy half."""
+    pixels = half_textured(shape)
+    data = b"adaptive payload" * 20
+    
+    stego = embed_lsb_array(pixels, data, 2, adaptive=True)
+    
+    assert extract_lsb_array(stego, 2, adaptive=True) == data
+    assert np.array_equal(stego[:, :38], pixels[:, :38])
+    if len(shape) == 3 and shape[2] == 4:
+        assert np.array_equal(stego[..., 3], pixels[..., 3])
+
+def test_texture_map_is_shared_by_carrier_and_stego():
+    """Test that the map only depends on the high bits, and is cached per carrier."""
+    image_stego.clear_adaptive_cache()
+    pixels = half_textured((60, 80, 3))
+    stego = embed_lsb_array(pixels, b"x" * 200, 1, adaptive=True)
+    
+    assert texture_map(stego, 1) is texture_map(pixels, 1)
+    assert texture_map(pixels, 2) is not texture_map(pixels, 1)
+
+def test_adaptive_positions_are_prefix_consistent():
+    """Test that shorter prefixes of the adaptive order agree with longer ones."""
+    texture = texture_map(np.random.default_rng(1).integers(0, 256, (50, 50, 3), dtype=np.uint8))
+    full = image_stego._adaptive_positions(texture, 3000, 3, reserved_pixels=10)
+    
+    assert np.array_equal(image_stego._adaptive_positions(texture, 1001, 3, reserved_pixels=10), full[:1001])
+    assert len(np.unique(full)) == 3000 and full.min() >= 30
@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.advanced_stego import decode_data_from_jpeg, encode_data_into_jpeg
+from stego.jpeg_stego import JpegCoefficients, embed_jpeg, extract_jpeg, jpeg_capacity
+
+def make_jpeg(channels=3, **options):
+    """A textured JPEG carrier as bytes."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:120, 0:160]
+    base = (x * 1.5 + y) % 256
+    pixels = np.stack([base, (y * 2) % 256, (x * y / 50) % 256], axis=-1)[..., :channels].squeeze()
+    pixels = np.clip(pixels + rng.integers(-20, 20, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', **options)
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("channels, options", [
+    (3, {'quality': 85}),
+    (3, {'quality': 75, 'subsampling': 2}),
+    (3, {'quality': 90, 'restart_marker_blocks': 3}),
+    (1, {'quality': 80}),
+])
+def test_jpeg_roundtrip(tmp_path, channels, options):
+    """Test that JSteg embedding roundtrips and keeps the file a JPEG of about the same size."""
+    carrier = tmp_path / "carrier.jpg"
+    carrier.write_bytes(make_jpeg(channels, **options))
+    data = np.random.default_rng(1).bytes(jpeg_capacity(str(carrier))['capacity_bytes'])
+    
+    result = embed_jpeg(str(carrier), data, str(tmp_path / "stego.jpg"))
+    
+    assert extract_jpeg(str(tmp_path / "stego.jpg")) == data
+    assert abs(result['output_size'] - result['original_size']) < result['original_size'] * 0.01
+    assert Image.open(tmp_path / "stego.jpg").size == (160, 120)
+
+def test_unchanged_coefficients_rewrite_identically():
+    """Test that decoding and re-encoding without embedding reproduces the file."""
+    carrier = make_jpeg(restart_marker_blocks=2)
+    
+    assert JpegCoefficients.load(carrier).to_bytes() == carrier
+
+def test_only_large_ac_coefficients_change():
+    """Test that DC coefficients, zeros and +-1 are never modified."""
+    carrier = JpegCoefficients.load(make_jpeg())
+    stego = JpegCoefficients.load(make_jpeg())
+    stego.embed(b"\xff" * 150)
+    stego = JpegCoefficients.load(stego.to_bytes())
+    
+    changed = carrier.coefficients != stego.coefficients
+    assert changed.any()
+    assert not changed[:, 0].any()
+    assert np.all(np.abs(carrier.coefficients[changed]) >= 2)
+    assert np.all(np.abs(carrier.coefficients - stego.coefficients) <= 1)
+
+def test_progressive_jpeg_is_rejected():
+    """Test that non-baseline JPEGs raise a clear error."""
+    with pytest.raises(ValueError, match="baseline"):
+        JpegCoefficients.load(make_jpeg(progressive=True))
+
+def test_jpeg_pipeline_roundtrip(tmp_path):
+    """Test the encrypted pipeline with a JPEG carrier and a wrong password."""
+    output = tmp_path / "stego.jpg"
+    result = encode_data_into_jpeg(make_jpeg(), b"Secret data", "password", str(output))
+    
+    assert result['success']
+    assert decode_data_from_jpeg(str(output), "password")['data'] == b"Secret data"
+    assert not decode_data_from_jpeg(str(output), "wrong")['success']
+    assert decode_data_from_jpeg(make_jpeg(), "password")['early_rejected']
+
+def test_jpeg_header_records_jsteg_mode(tmp_path):
+    """Test that JPEG payloads are marked 'jsteg' and the mode is refused for pixel carriers."""
+    from stego.advanced_stego import encode_data_to_bytes
+    from stego.stego_header import unpack_header
+    
+    output = tmp_path / "stego.jpg"
+    encode_data_into_jpeg(make_jpeg(), b"Secret data", "password", str(output))
+    
+    assert unpack_header(extract_jpeg(str(output)))['embedding_mode'] == 'jsteg'
+    pixels = np.zeros((32, 32, 3), dtype=np.uint8)
+    with pytest.raises(ValueError, match="JPEG carriers"):
+        encode_data_to_bytes(pixels, b"x", "password", embedding_mode='jsteg')
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from stego.advanced_stego import decode_data_from_bytes, encode_data_to_bytes
+from stego.image_stego import embed_lsb_array
+from stego.matrix_stego import (MATRIX_MAX_K, choose_matrix_k, embed_matrix_array,
+                                extract_matrix_array, matrix_block_size)
+
+@pytest.fixture
+def pixels():
+    """A random RGBA carrier, so the alpha channel must be skipped."""
+    return np.random.default_rng(0).integers(0, 256, (120, 100, 4), dtype=np.uint8)
+
+@pytest.mark.parametrize("k", [1, 2, 3, 5, 8])
+def test_matrix_roundtrip(pixels, k):
+    """Test that every code parameter recovers the payload and leaves alpha alone."""
+    data = bytes(range(256))[:3000 * k // matrix_block_size(k) // 8]
+    stego = embed_matrix_array(pixels, data, k)
+    
+    assert extract_matrix_array(stego, k) == data
+    assert np.array_equal(stego[..., 3], pixels[..., 3])
+    # At most one LSB flip per block, and nothing but LSBs changes
+    assert np.all((stego ^ pixels) <= 1)
+    assert np.count_nonzero(stego != pixels) <= -(-(len(data) + 4) * 8 // k)
+
+def test_matrix_changes_fewer_samples_than_lsb(pixels):
+    """Test that matrix embedding beats LSB replacement on changes per payload bit."""
+    data = np.random.default_rng(1).bytes(400)
+    k = choose_matrix_k((len(data) + 4) * 8, 120 * 100 * 3)
+    
+    matrix_changes = np.count_nonzero(embed_matrix_array(pixels, data, k) != pixels)
+    lsb_changes = np.count_nonzero(embed_lsb_array(pixels, data) != pixels)
+    
+    assert k == 6
+    assert matrix_changes < lsb_changes / 2
+
+def test_choose_matrix_k():
+    """Test that k is the largest code the payload fits into."""
+    assert choose_matrix_k(100, 100) == 1
+    assert choose_matrix_k(100, 150) == 2
+    assert choose_matrix_k(8, 10 ** 9) == MATRIX_MAX_K
+    with pytest.raises(ValueError, match="Data too large"):
+        choose_matrix_k(101, 100)
+
+def test_matrix_pipeline_roundtrip():
+    """Test that the pipeline records k in the header and decodes without being told."""
+    carrier = np.random.default_rng(2).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    result = encode_data_to_bytes(carrier, b"Secret data", "password", embedding_mode='matrix',
+                                  analysis='skip')
+    decoded = decode_data_from_bytes(result['stego_image'], "password")
+    
+    assert result['matrix_k'] > 1
+    assert decoded['embedding_mode'] == 'matrix'
+    assert decoded['data'] == b"Secret data"
+    with pytest.raises(ValueError, match="lsb_bits=1"):
+        encode_data_to_bytes(carrier, b"Secret data", "password", lsb_bits=2, embedding_mode='matrix')
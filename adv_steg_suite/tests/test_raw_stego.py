@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.advanced_stego import decode_data_from_image, encode_data_into_image
+from stego.image_stego import embed_lsb_array, extract_lsb, load_image_array
+from stego.raw_stego import embed_lsb_mapped, extract_lsb_mapped, map_image_pixels
+
+@pytest.fixture(params=["rgb.bmp", "rgba.bmp", "gray.bmp", "rgb.ppm", "gray.pgm", "rgb.npy"])
+def carrier(request, tmp_path):
+    """Write a small carrier with an odd width so BMP rows need padding."""
+    rng = np.random.default_rng(0)
+    name = request.param
+    mode = {'rgb': 'RGB', 'rgba': 'RGBA', 'gray': 'L'}[name.split('.')[0]]
+    shape = (59, 61) if mode == 'L' else (59, 61, len(mode))
+    pixels = rng.integers(0, 256, shape, dtype=np.uint8)
+    path = tmp_path / name
+    if name.endswith('.npy'):
+        np.save(path, pixels)
+    else:
+        Image.fromarray(pixels, mode).save(path)
+    return path
+
+def test_mapped_view_matches_pil(carrier):
+    """Test that the mapped pixels are in the order PIL decodes them."""
+    if carrier.suffix == '.npy':
+        expected = np.load(carrier)
+    else:
+        expected = np.array(Image.open(carrier))
+    mapped = map_image_pixels(carrier)
+    assert np.array_equal(mapped, expected[..., :mapped.shape[-1]] if mapped.ndim == 3 else expected)
+
+@pytest.mark.parametrize("lsb_bits", [1, 3])
+def test_mapped_embed_matches_array_embed(carrier, tmp_path, lsb_bits):
+    """Test that mapped embedding changes the same samples as embed_lsb_array."""
+    data = np.random.default_rng(1).bytes(120)
+    output = tmp_path / ("stego" + carrier.suffix)
+    
+    result = embed_lsb_mapped(str(carrier), data, str(output), lsb_bits)
+    
+    assert result['rows_touched'] < result['total_rows']
+    assert extract_lsb_mapped(str(output), lsb_bits) == data
+    if carrier.suffix == '.npy':
+        expected = embed_lsb_array(np.load(carrier), data, lsb_bits)
+        assert np.array_equal(np.load(output), expected)
+    else:
+        expected = embed_lsb_array(load_image_array(str(carrier)), data, lsb_bits)
+        assert np.array_equal(load_image_array(str(output)), expected)
+        assert extract_lsb(str(output), lsb_bits) == data
+
+def test_pipeline_encodes_mapped_carriers_in_place(carrier, tmp_path):
+    """Test that same-format uncompressed outputs skip the codecs and decode end to end."""
+    output = tmp_path / ("stego" + carrier.suffix)
+    
+    result = encode_data_into_image(str(carrier), b"Secret data", "password", str(output), lsb_bits=2)
+    
+    assert (result['image_decodes'], result['image_encodes']) == (0, 0)
+    decoded = decode_data_from_image(str(output), "password")
+    assert decoded['success'] and decoded['data'] == b"Secret data"
+    # Rows past the header and payload are left as they were
+    assert np.array_equal(load_image_array(str(output))[20:], load_image_array(str(carrier))[20:])
+
+def test_pipeline_leaves_no_copy_when_payload_does_not_fit(carrier, tmp_path):
+    """Test that a failed mapped encode removes the copied output."""
+    output = tmp_path / ("stego" + carrier.suffix)
+    
+    with pytest.raises(ValueError, match="Data too large"):
+        encode_data_into_image(str(carrier), bytes(20000), "password", str(output),
+                               use_compression=False)
+    assert not output.exists()
+
+def test_mapped_rejects_png(tmp_path):
+    """Test that compressed carriers are refused."""
+    path = tmp_path / "carrier.png"
+    Image.new('RGB', (8, 8)).save(path)
+    with pytest.raises(ValueError):
+        embed_lsb_mapped(str(path), b'data', str(tmp_path / "out.png"))
@@ -0,0 +1,89 @@
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.advanced_stego import encode_data_into_image, encode_data_into_jpeg
+from stego.scanner import scan_directory, scan_to_jsonl
+
+pytest.importorskip("scipy")
+
+@pytest.fixture
+def image_tree(tmp_path):
+    """A carrier, a stego copy in a subdirectory and an unrelated file."""
+    rng = np.random.default_rng(0)
+    root = tmp_path / "images"
+    (root / "sub").mkdir(parents=True)
+    Image.fromarray(rng.integers(0, 256, (32, 48, 3), dtype=np.uint8)).save(root / "carrier.png")
+    encode_data_into_image(str(root / "carrier.png"), b"Secret data", "password",
+                           str(root / "sub" / "stego.png"))
+    (root / "notes.txt").write_text("not an image")
+    return root
+
+def test_scan_reports_every_image(image_tree):
+    """Test that every image is analyzed and the stego header is detected."""
+    results = {os.path.basename(r['path']): r for r in scan_directory(str(image_tree), workers=1)}
+    
+    assert set(results) == {"carrier.png", "stego.png"}
+    assert results["carrier.png"]['stego_header'] is None
+    assert results["stego.png"]['stego_header']['lsb_bits'] == 1
+    assert {'capacity_bytes', 'security_score', 'chi_square_rate', 'rs_rate'} <= set(results["stego.png"])
+
+def test_scan_reads_jpeg_headers_from_coefficients(tmp_path):
+    """Test that JPEG stego files report the header stored in their DCT coefficients."""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(tmp_path / "carrier.jpg", quality=90)
+    encode_data_into_jpeg(str(tmp_path / "carrier.jpg"), b"Secret data", "password",
+                          str(tmp_path / "stego.jpg"))
+    
+    results = {os.path.basename(r['path']): r for r in scan_directory(str(tmp_path), workers=1)}
+    
+    assert results["carrier.jpg"]['stego_header'] is None
+    assert results["stego.jpg"]['stego_header']['embedding_mode'] == 'jsteg'
+
+def test_rescan_uses_cache(image_tree, tmp_path):
+    """Test that unchanged files come from the cache and changed ones are redone."""
+    cache = str(tmp_path / "scan.sqlite")
+    first = io.StringIO()
+    scan_to_jsonl(str(image_tree), first, cache, workers=1)
+    
+    counts = scan_to_jsonl(str(image_tree), io.StringIO(), cache, workers=2)
+    assert counts == {'scanned': 2, 'cached': 2, 'errors': 0}
+    
+    Image.new('RGB', (16, 16)).save(image_tree / "carrier.png")
+    output = io.StringIO()
+    scan_to_jsonl(str(image_tree), output, cache, workers=1)
+    results = {os.path.basename(r['path']): r for r in map(json.loads, output.getvalue().splitlines())}
+    assert not results["carrier.png"]['cached'] and results["carrier.png"]['width'] == 16
+    assert results["stego.png"]['cached']
+
+def test_scan_compares_against_reference(image_tree, tmp_path):
+    """Test that files with an original under the reference tree are compared."""
+    reference = tmp_path / "originals" / "sub"
+    reference.mkdir(parents=True)
+    Image.open(image_tree / "carrier.png").save(reference / "stego.png")
+    
+    results = {os.path.basename(r['path']): r
+               for r in scan_directory(str(image_tree), workers=1, reference_root=str(tmp_path / "originals"))}
+    
+    assert 'comparison' not in results["carrier.png"]
+    assert results["stego.png"]['comparison']['max_pixel_difference'] == 1
+
+def test_workers_read_the_cache_once_per_process(image_tree, tmp_path):
+    """Test that pool workers answer reference comparisons from the cache on a re-scan."""
+    reference = tmp_path / "originals" / "sub"
+    reference.mkdir(parents=True)
+    Image.open(image_tree / "carrier.png").save(reference / "stego.png")
+    cache = str(tmp_path / "scan.sqlite")
+    
+    scan = lambda: list(scan_directory(str(image_tree), cache, workers=2,
+                                       reference_root=str(tmp_path / "originals")))
+    first, second = scan(), scan()
+    
+    assert not any(r['cached'] for r in first) and all(r['cached'] for r in second)
+    assert [r['comparison'] for r in second if 'comparison' in r] == \
+        [r['comparison'] for r in first if 'comparison' in r]
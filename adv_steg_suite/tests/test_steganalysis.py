@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.image_stego import embed_lsb_array
+from stego.steganalysis import analyze_stack, chi_square_attack, rs_analysis
+
+pytest.importorskip("scipy")
+
+def smooth_cover(seed, lsb_bias=None):
+    """Upscaled noise with mild grain; optionally with LSBs biased toward 0."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(30, 220, (8, 8, 3), dtype=np.uint8)
+    base = np.array(Image.fromarray(small).resize((128, 128), Image.BICUBIC))
+    if lsb_bias is not None:
+        return ((base & 0xFE) | (rng.random(base.shape) < lsb_bias)).astype(np.uint8)
+    return np.clip(base + rng.normal(0, 2, base.shape), 0, 255).astype(np.uint8)
+
+def embedded_stack(cover):
+    """The cover plus half, full and scattered quarter capacity embeddings."""
+    rng = np.random.default_rng(1)
+    capacity = cover.size // 8 - 4
+    return np.stack([
+        cover,
+        embed_lsb_array(cover, rng.bytes(capacity // 2)),
+        embed_lsb_array(cover, rng.bytes(capacity)),
+        embed_lsb_array(cover, rng.bytes(capacity // 4), scatter_key=b'key'),
+    ])
+
+def test_chi_square_estimates_sequential_rate():
+    """Test that the chi-square attack finds the length of a sequential payload."""
+    result = chi_square_attack(embedded_stack(smooth_cover(0, lsb_bias=0.3)))
+    
+    assert result['p_values'].shape == (4, 100)
+    assert result['embedding_rate'] == pytest.approx([0.0, 0.5, 1.0, 0.0], abs=0.1)
+
+def test_rs_estimates_rate_in_any_order():
+    """Test that RS analysis estimates sequential and scattered payloads."""
+    rates = rs_analysis(embedded_stack(smooth_cover(0)))['embedding_rate']
+    
+    assert rates[0] < 0.05
+    assert rates[1] == pytest.approx(0.5, abs=0.1)
+    assert rates[2] > 0.75
+    assert rates[3] == pytest.approx(0.25, abs=0.1)
+
+def test_analyze_stack_accepts_lists_of_grayscale_images():
+    """Test one result per image for a list of grayscale images."""
+    images = [smooth_cover(seed)[..., 0] for seed in range(3)]
+    
+    results = analyze_stack(images)
+    
+    assert len(results) == 3
+    assert set(results[0]) == {'chi_square_rate', 'rs_rate'}
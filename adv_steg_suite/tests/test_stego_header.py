@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.stego_header import (HEADER_SIZE, embed_with_header, extract_with_header, pack_header,
+                                probe_header, read_header, unpack_header)
+
+def test_header_roundtrip():
+    """Test that every header field survives packing and parsing."""
+    header = unpack_header(pack_header(3, 'scatter', 'zlib'))
+    
+    assert header['lsb_bits'] == 3
+    assert header['embedding_mode'] == 'scatter'
+    assert header['compressed'] and header['codec'] == 'zlib'
+    assert 'kdf' not in header  # The envelope records its own scrypt parameters
+
+def test_header_checksum_rejects_corruption():
+    """Test that a flipped bit invalidates the header."""
+    raw = bytearray(pack_header(2))
+    raw[6] ^= 1
+    
+    assert len(raw) == HEADER_SIZE
+    assert unpack_header(bytes(raw)) is None
+
+@pytest.mark.parametrize("shape", [(30, 40), (30, 40, 3), (30, 40, 4)])
+def test_embed_with_header(shape, tmp_path):
+    """Test header and payload extraction, and probing the header from a PNG."""
+    pixels = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    stego = embed_with_header(pixels, pack_header(2), b"payload" * 20, 2)
+    path = tmp_path / "stego.png"
+    Image.fromarray(stego).save(path)
+    
+    header = read_header(stego)
+    assert header['lsb_bits'] == 2
+    assert extract_with_header(stego, header) == b"payload" * 20
+    assert probe_header(str(path)) == header
+    assert read_header(pixels) is None
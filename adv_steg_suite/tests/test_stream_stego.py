@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from stego.image_stego import embed_lsb, extract_lsb
+from stego.stream_stego import PngBandReader, embed_lsb_stream, extract_lsb_stream
+
+@pytest.fixture
+def carrier(tmp_path):
+    """Create a smooth RGBA carrier so the PNG encoder uses several row filters."""
+    rng = np.random.default_rng(0)
+    pixels = (np.cumsum(rng.integers(0, 256, (45, 37, 4)), axis=0) // 40).astype(np.uint8)
+    path = tmp_path / "carrier.png"
+    Image.fromarray(pixels, 'RGBA').save(path, optimize=True)
+    return path
+
+def test_band_reader_matches_pil(carrier):
+    """Test that band-by-band decoding reproduces the full PIL decode."""
+    with PngBandReader(str(carrier)) as reader:
+        bands = list(reader.iter_bands(band_height=4))
+    
+    assert len(bands) == 12
+    assert np.array_equal(np.concatenate(bands), np.array(Image.open(carrier)))
+
+@pytest.mark.parametrize("lsb_bits", [1, 3])
+def test_stream_matches_embed_lsb(carrier, tmp_path, lsb_bits):
+    """Test that streamed embedding writes the same pixels as embed_lsb."""
+    data = np.random.default_rng(1).bytes(300)
+    chunks = [data[i:i + 23] for i in range(0, len(data), 23)]
+    streamed = tmp_path / "streamed.png"
+    reference = tmp_path / "reference.png"
+    
+    embed_lsb_stream(str(carrier), iter(chunks), len(data), str(streamed), lsb_bits, band_height=5)
+    embed_lsb(str(carrier), data, str(reference), lsb_bits)
+    
+    assert np.array_equal(np.array(Image.open(streamed)), np.array(Image.open(reference)))
+    assert b''.join(extract_lsb_stream(str(streamed), lsb_bits, band_height=3)) == data
+    assert extract_lsb(str(streamed), lsb_bits) == data
+
+def test_stream_header_matches_embed_with_header(carrier, tmp_path):
+    """Test that a streamed header and payload use the same layout as embed_with_header."""
+    from stego.stego_header import embed_with_header, pack_header, read_header
+    
+    data = np.random.default_rng(1).bytes(300)
+    header = pack_header(2, payload_crc=None)
+    streamed = tmp_path / "streamed.png"
+    
+    embed_lsb_stream(str(carrier), [data], len(data), str(streamed), 2, band_height=1, header=header)
+    reference = embed_with_header(np.array(Image.open(carrier)), header, data, 2)
+    
+    assert np.array_equal(np.array(Image.open(streamed)), reference)
+    assert read_header(reference)['payload_crc'] is None
+    assert b''.join(extract_lsb_stream(str(streamed), 2, band_height=2, header_size=len(header))) == data
+
+def test_stream_rejects_short_payload(carrier, tmp_path):
+    """Test that an iterable yielding fewer bytes than declared is an error."""
+    with pytest.raises(ValueError, match="expected 100"):
+        embed_lsb_stream(str(carrier), [b"x" * 50], 100, str(tmp_path / "stego.png"))